@@ -1,3 +1,13 @@
 import usb_cdc
+import usb_hid
+import nkro_keyboard
 
-usb_cdc.enable(console=True, data=True)    # Enable console and data
\ No newline at end of file
+usb_cdc.enable(console=True, data=True)    # Enable console and data
+
+# 6KRO boot keyboard first (fallback, and what adafruit_hid.Keyboard finds), then the NKRO bitmap keyboard
+usb_hid.enable((
+    usb_hid.Device.KEYBOARD,
+    nkro_keyboard.device(),
+    usb_hid.Device.MOUSE,
+    usb_hid.Device.CONSUMER_CONTROL,
+))
\ No newline at end of file
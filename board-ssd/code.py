@@ -14,9 +14,22 @@ import usb_hid
 import usb_cdc
 from adafruit_hid.keyboard import Keyboard
 from adafruit_hid.keycode import Keycode
-from framework_is31fl3743 import IS31FL3743
+from adafruit_hid.keyboard_layout_us import KeyboardLayoutUS
+from keyboard_layout_win_es import KeyboardLayoutWinES
+from text_typer import TextTyper
+from hid_reports import ReportWriter, compile_strokes
+import nkro_keyboard
+from framework_is31fl3743 import IS31FL3743, PREFER_BUFFER
+import led_matrix
+import led_animation
 import json
+import os
 import traceback
+from micropython import const
+
+# Debug output, compiled out when 0: `if _LOG_DEBUG:` blocks are dropped by
+# the bytecode compiler, so disabled messages cost nothing in the scan loop
+_LOG_DEBUG = const(0)
 
 # === Matrix and Threshold Configuration ===
 MATRIX_COLS = 8
@@ -37,25 +50,37 @@ MATRIX = [
     [None, None, None, None, "a3", None, None, None]
 ]
 
-# Mapping LEDs
-MATRIX_LED_MAP = {
-    "a1" : 40,  "a2" : 37,  "a3" : 52,  "a4" : 49,
-    "b1" : 4,   "b2" : 1,   "b3" : 16,  "b4" : 13,
-    "c1" : 22,  "c2" : 19,  "c3" : 34,  "c4" : 31, # c4 tiene LED map, faltaba en MATRIX
-    "d1" : 58,  "d2" : 55,  "d3" : 70,  "d4" : 67,
-    "e1" : 25,  "e2" : 61,  "e3" : 64,  "e4" : 28,
-    "f1" : 7,   "f2" : 43,  "f3" : 46,  "f4" : 10
-}
+# Mapping LEDs (see led_matrix.py)
+MATRIX_LED_MAP = led_matrix.MATRIX_LED_MAP
 
 SYMBOLS = {}
 MATRIX_COLORS = {}
+MATRIX_PULSE = []
 MATRIX_COMMANDS = {}
 
+# Pause between HID reports when typing TYPE: payloads (config "type_pacing")
+TYPE_PACING = 0.001
+# How long stroke taps stay down (config "tap_hold"), 0 = next USB poll
+TAP_HOLD = 0
+latest_uuid = None
+
+# Stroke code -> key operations, for press (True) and release (False)
+COMPILED_STROKES = {}
+
 # Init Keyboard
 try:
     keyboard = Keyboard(usb_hid.devices)
+    ## Prefer the NKRO bitmap keyboard from boot.py, 6KRO if it is not enabled
+    nkro_device = nkro_keyboard.find_device(usb_hid.devices)
+    if nkro_device:
+        keyboard = nkro_keyboard.NKROKeyboard(nkro_device, keyboard._keyboard_device)
+    print(f"Keyboard reports: {'NKRO' if nkro_device else '6KRO'}")
+    writer = ReportWriter(keyboard)
+    typer = TextTyper(writer, {"EN": KeyboardLayoutUS, "ES": KeyboardLayoutWinES}, TYPE_PACING)
 except:
     keyboard = None
+    writer = None
+    typer = None
 
 # === Hardware Setup ===
 gp6 = digitalio.DigitalInOut(board.GP6)
@@ -121,81 +146,70 @@ def to_voltage(adc_sample):
 sdb = digitalio.DigitalInOut(board.GP29)
 sdb.direction = digitalio.Direction.OUTPUT
 sdb.value = True
-i2c = busio.I2C(board.SCL, board.SDA)
+# 400 kHz: the animation frame budget assumes fast-mode I2C
+i2c = busio.I2C(board.SCL, board.SDA, frequency=400_000)
 i2c.try_lock()
 i2c.scan()
 i2c.unlock()
-is31 = IS31FL3743(i2c)
+# Buffered: painting fills RAM and show() sends the frame in one block write
+is31 = IS31FL3743(i2c, allocate=PREFER_BUFFER)
 is31.set_led_scaling(0x20)
 is31.global_current = 0x20
 is31.enable = True
+leds = led_matrix.LedMatrix(is31, MATRIX_LED_MAP)
+animator = led_animation.Animator(leds)
 
 sleep_pin = digitalio.DigitalInOut(board.GP0)
 sleep_pin.direction = digitalio.Direction.INPUT
 
 def matrix_paint():
-    global MATRIX_LED_MAP, MATRIX_COLORS
-    for key in MATRIX_LED_MAP.keys():
-        value = MATRIX_COLORS.get(key,None)
-        if value:
-            try:
-                r = int(value[:2], 16)
-                g = int(value[2:4], 16)
-                b = int(value[-2:], 16)
-                idx = MATRIX_LED_MAP[key]
-                is31[idx + 2] = r
-                is31[idx + 1] = g
-                is31[idx + 0] = b
-            except: pass
-        else:
-            idx = MATRIX_LED_MAP[key]
-            is31[idx + 2] = 0; is31[idx + 1] = 0; is31[idx + 0] = 0
+    global MATRIX_COLORS, MATRIX_PULSE
+    ## Rendered and flushed by animator.tick() in the main loop
+    animator.set_target(MATRIX_COLORS, MATRIX_PULSE)
 
 
 def process_strokes(code,press):
-    global keyboard, SYMBOLS
+    global writer, SYMBOLS
 
-    if not keyboard:
+    if not writer:
         return
 
-    escaped = False
-    for key_char in code:
-        release = True
-        if escaped:
-            escaped = False
-            if key_char == key_char.upper(): 
-                ## Make it release within sequence only if we are in release mode
-                release = not press
-            else:
-                ## Make it release within sequence only if we are in press mode
-                release = press
-            if key_char.upper() =='P': 
-                time.sleep(0.15)
-            else:  
-                key_char = "\\" + key_char
-        else:
-            if key_char == '\\': 
-                escaped = True
-            else: 
-                escaped = False
-        if key_char:
-            symbol = SYMBOLS.get(key_char.upper(), None)
-            if symbol:
-                key_code = getattr(Keycode, symbol, None)
-                if key_code:
-                    if press and not release:
-                        keyboard.press(key_code)
-                    elif press and release:
-                        keyboard.press(key_code)
-                        time.sleep(0.05)
-                        keyboard.release(key_code)
-                    elif not press and release:
-                        keyboard.release(key_code)
+    ops = COMPILED_STROKES.get((code, press), None)
+    if ops is None:
+        ops = compile_strokes(code, press, SYMBOLS, Keycode, TAP_HOLD)
+        COMPILED_STROKES[(code, press)] = ops
+    writer.run(ops)
+
+
+def new_uuid():
+    data = bytearray(os.urandom(16))
+    data[6] = (data[6] & 0x0F) | 0x40   # version 4
+    data[8] = (data[8] & 0x3F) | 0x80   # RFC 4122 variant
+    h = "".join("{:02x}".format(b) for b in data)
+    return "-".join((h[:8], h[8:12], h[12:16], h[16:20], h[20:]))
+
+
+def type_text(text):
+    global latest_uuid
+
+    if not typer:
+        return
+
+    if '#NEW_UUID#' in text:
+        latest_uuid = new_uuid()
+        text = text.replace('#NEW_UUID#', '')
+    if '#UUID#' in text:
+        if not latest_uuid:
+            latest_uuid = new_uuid()
+        text = text.replace('#UUID#', latest_uuid)
+    typer.write(text)
 
 
 def process_key(pressed, released):
     global MATRIX_COMMANDS, SYMBOLS, usb_serial
     sorted_pressed = sorted(pressed)
+    for key in pressed:
+        animator.flash(key)
     sorted_released = sorted(released)
 
     ## Pressed part
@@ -204,22 +218,25 @@ def process_key(pressed, released):
     if code:
         if code.startswith("MSG:"):
             to_send = {"key": lookup_key, "code": code[4:], "pressed": True}
-            print (f"Sending message: {to_send}")
+            if _LOG_DEBUG:
+                print (f"Sending message: {to_send}")
             if usb_serial:
                 usb_serial.write((json.dumps(to_send) + '\n').encode())
                 usb_serial.flush()
+        elif code.startswith("TYPE:"):
+            type_text(code[5:])
         else:
             process_strokes(code, True)
     
     ## Released part
     lookup_key = "-".join(sorted_released)
     code = MATRIX_COMMANDS.get(lookup_key,None)
-    if code and not code.startswith("MSG:"):
+    if code and not code.startswith("MSG:") and not code.startswith("TYPE:"):
         process_strokes(code, False)
 
     ## Release all if nothing is pressed
-    if not pressed:
-        keyboard.release_all()
+    if not pressed and writer:
+        writer.release_all()
 
 def get_raw_matrix_state():
     current_state = []
@@ -236,10 +253,27 @@ def get_raw_matrix_state():
     return current_state
 
 def load_config(config):
-    global MATRIX_COLORS, MATRIX_COMMANDS, SYMBOLS
+    global MATRIX_COLORS, MATRIX_COMMANDS, SYMBOLS, TAP_HOLD, MATRIX_PULSE
     MATRIX_COLORS = config.get('colors', {})
+    MATRIX_PULSE = config.get('pulse', [])
+    animator.fade_ns = int(config.get('fade', 0.25) * 1_000_000_000)
     MATRIX_COMMANDS = config.get('keys', {})
     if config.get('symbols', None): SYMBOLS = config['symbols']
+    TAP_HOLD = config.get('tap_hold', 0)
+    COMPILED_STROKES.clear()
+    for code in MATRIX_COMMANDS.values():
+        if code and not code.startswith("MSG:") and not code.startswith("TYPE:"):
+            for press in (True, False):
+                COMPILED_STROKES[(code, press)] = compile_strokes(code, press, SYMBOLS, Keycode, TAP_HOLD)
+    if typer:
+        typer.select(config.get('layout', typer.layout_name))
+        typer.pacing = config.get('type_pacing', TYPE_PACING)
+        ## Build the HID reports now rather than on the first key press
+        for code in MATRIX_COMMANDS.values():
+            if code and code.startswith("TYPE:"):
+                typer.prepare(code[5:])
+                if '#UUID#' in code:
+                    typer.prepare("0123456789abcdef-")
     matrix_paint()
 
 # === Main Loop ===
@@ -262,7 +296,14 @@ while True:
             if usb_serial and usb_serial.in_waiting:
                 try:
                     data = usb_serial.readline().decode().strip()
-                    if data: load_config(json.loads(data))
+                    if data:
+                        config = json.loads(data)
+                        started = time.monotonic_ns()
+                        load_config(config)
+                        ## The host times the round trip and the apply from this
+                        if 'seq' in config:
+                            ack = {"code": f"ACK:{config['seq']}", "apply_us": (time.monotonic_ns() - started) // 1000}
+                            usb_serial.write((json.dumps(ack) + '\n').encode())
                 except: pass
 
             raw_state = get_raw_matrix_state()
@@ -281,10 +322,17 @@ while True:
                 to_release = stable_set - raw_set
                 process_key(to_press, to_release)
                 
-            time.sleep(0.01)
+            ## Animation time comes out of the scan idle time, not on top of it
+            idle_until = time.monotonic_ns() + 10_000_000
+            animator.tick()
+            time.sleep(max(0, idle_until - time.monotonic_ns()) / 1_000_000_000)
 
         except Exception as e:
             print(f"Error: {e}")
-            try: keyboard.release_all()
+            try: writer.release_all()
+            except: pass
+            ## A failed transfer leaves the LED driver registers unknown
+            try: is31.resync()
             except: pass
+            animator.resync()
             time.sleep(1)
\ No newline at end of file
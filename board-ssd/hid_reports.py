@@ -0,0 +1,220 @@
+# SPDX-FileCopyrightText: Raul Martinez Zabala 2025
+# SPDX-License-Identifier: MIT
+#
+# Coalescing keyboard report writer.
+#
+# Strokes from config.json are compiled once into key operations
+# (down/up/sleep). Running them goes through a plan that tracks the report
+# state and only emits the states the host has to see:
+#   - operations that leave the report unchanged send nothing,
+#   - modifiers pressed before a key ride in the same report as the key,
+#   - a key release and the modifier releases after it go out together.
+# A report never mixes presses and releases, so every key edge survives and
+# order-sensitive chords (a modifier pressed after a key) stay split.
+#
+import time
+
+import nkro_keyboard
+
+MODIFIER_FIRST = 0xE0     # LEFT_CONTROL
+MODIFIER_LAST = 0xE7      # RIGHT_GUI
+KEY_SLOTS = 6             # boot keyboard report; NKRO has no limit
+
+EMPTY = (0, ())
+
+
+def modifier_bit(keycode):
+    if MODIFIER_FIRST <= keycode <= MODIFIER_LAST:
+        return 1 << (keycode - MODIFIER_FIRST)
+    return 0
+
+
+def apply_op(state, op, keycode, slots=KEY_SLOTS):
+    modifiers, keys = state
+    bit = modifier_bit(keycode)
+    if op == "down":
+        if bit:
+            return (modifiers | bit, keys)
+        if keycode in keys or (slots and len(keys) >= slots):
+            return state
+        return (modifiers, keys + (keycode,))
+    if bit:
+        return (modifiers & ~bit, keys)
+    if keycode not in keys:
+        return state
+    return (modifiers, tuple(k for k in keys if k != keycode))
+
+
+def _contains(outer, inner):
+    return (outer[0] & inner[0]) == inner[0] and all(k in outer[1] for k in inner[1])
+
+
+def _mergeable(emitted, pending, new):
+    """Can `pending` be skipped, sending `new` straight after `emitted`?"""
+    if _contains(pending, emitted) and _contains(new, pending):
+        ## Presses: modifiers may join a key, never follow one
+        return not (pending[1] != emitted[1] and new[0] != pending[0])
+    if _contains(emitted, pending) and _contains(pending, new):
+        ## Releases: keys go with or before modifiers, never after them
+        return not (pending[0] != emitted[0] and new[1] != pending[1])
+    return False
+
+
+def plan(ops, state=EMPTY, slots=KEY_SLOTS):
+    """Minimal [(state, delay after)] to run `ops` from `state`."""
+    steps = []
+    emitted = state
+    current = state
+    pending = None
+    for op, arg in ops:
+        if op == "sleep":
+            if pending is not None:
+                steps.append([pending, 0])
+                emitted = pending
+                pending = None
+            if steps:
+                steps[-1][1] += arg
+            else:
+                steps.append([None, arg])
+            continue
+        new = apply_op(current, op, arg, slots)
+        if new == current:
+            continue
+        current = new
+        if pending is not None and not _mergeable(emitted, pending, new):
+            steps.append([pending, 0])
+            emitted = pending
+        pending = new
+    if pending is not None:
+        steps.append([pending, 0])
+    return steps
+
+
+def compile_strokes(code, press, symbols, keycodes, tap_hold=0):
+    """
+    Key operations for a stroke string on key press (`press`) or release.
+
+    `\\X` holds X on press and releases it on release, `\\x` taps x on press,
+    `\\p` / `\\P` pause 0.15 s before their key, anything else is tapped.
+    """
+    ops = []
+
+    def keycode(key_char):
+        symbol = symbols.get(key_char.upper(), None)
+        return getattr(keycodes, symbol, None) if symbol else None
+
+    escaped = False
+    for key_char in code:
+        release = True
+        if escaped:
+            escaped = False
+            if key_char == key_char.upper():
+                ## Make it release within sequence only if we are in release mode
+                release = not press
+            else:
+                ## Make it release within sequence only if we are in press mode
+                release = press
+            if key_char.upper() == 'P':
+                ops.append(("sleep", 0.15))
+            else:
+                key_char = "\\" + key_char
+        else:
+            escaped = key_char == '\\'
+        key_code = keycode(key_char)
+        if not key_code:
+            continue
+        if press and not release:
+            ops.append(("down", key_code))
+        elif press and release:
+            ops.append(("down", key_code))
+            if tap_hold:
+                ops.append(("sleep", tap_hold))
+            ops.append(("up", key_code))
+        elif not press and release:
+            ops.append(("up", key_code))
+    return ops
+
+
+def boot_report(modifiers, keys):
+    keys = keys[:KEY_SLOTS]
+    return bytes((modifiers, 0) + keys + (0,) * (KEY_SLOTS - len(keys)))
+
+
+EMPTY_BOOT_REPORT = boot_report(0, ())
+
+
+class ReportWriter:
+    """
+    Sends keyboard reports (6KRO or NKRO bitmap), skipping states already sent.
+
+    In NKRO mode keycodes past the bitmap are sent on the boot keyboard
+    (modifiers stay on the bitmap keyboard); with no boot keyboard they are
+    reported once and dropped.
+    """
+
+    def __init__(self, keyboard):
+        self.device = keyboard._keyboard_device
+        self.nkro = isinstance(keyboard, nkro_keyboard.NKROKeyboard)
+        self.boot_device = keyboard.boot_device if self.nkro else None
+        self.slots = None if self.nkro else KEY_SLOTS
+        self.state = EMPTY
+        self.boot_sent = EMPTY_BOOT_REPORT
+        self.sent = 0
+        self._encoded = {}
+        self._dropped = set()
+
+    def encode(self, state):
+        """The report for `state`; in NKRO mode (bitmap report, boot report or None)."""
+        report = self._encoded.get(state)
+        if report is None:
+            modifiers, keys = state
+            if self.nkro:
+                high = nkro_keyboard.overflow(keys)
+                if high and self.boot_device is None:
+                    self._drop(high)
+                report = (bytes(nkro_keyboard.encode(modifiers, keys)),
+                          boot_report(0, high) if self.boot_device is not None else None)
+            else:
+                report = boot_report(modifiers, keys)
+            if len(self._encoded) >= 256:
+                self._encoded = {}
+            self._encoded[state] = report
+        return report
+
+    def _drop(self, keycodes):
+        new = [keycode for keycode in keycodes if keycode not in self._dropped]
+        if new:
+            self._dropped.update(new)
+            print(f"Keycodes {', '.join(hex(k) for k in new)} don't fit the NKRO report and there is no boot keyboard")
+
+    def _send(self, report):
+        if not self.nkro:
+            self.device.send_report(report)
+            return
+        bitmap, boot = report
+        self.device.send_report(bitmap)
+        if boot is not None and boot != self.boot_sent:
+            self.boot_device.send_report(boot)
+            self.boot_sent = boot
+
+    def send(self, state):
+        if state == self.state:
+            return
+        self._send(self.encode(state))
+        self.state = state
+        self.sent += 1
+
+    def run(self, ops):
+        for state, delay in plan(ops, self.state, self.slots):
+            if state is not None:
+                self.send(state)
+            if delay:
+                time.sleep(delay)
+
+    def release_all(self):
+        if self.boot_device is not None:
+            ## Force the boot keyboard too, its last report may not have gone out
+            self.boot_sent = None
+        self._send(self.encode(EMPTY))
+        self.state = EMPTY
+        self.sent += 1
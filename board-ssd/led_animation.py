@@ -0,0 +1,150 @@
+# SPDX-FileCopyrightText: Raul Martinez Zabala 2025
+# SPDX-License-Identifier: MIT
+#
+# LED animations: cross-fades between profiles, pulsing keys (active toggles)
+# and a short flash on key presses.
+#
+# Frames are rendered into a bytearray at a fixed rate and flushed through
+# LedMatrix as block writes. tick() is called from the main loop between
+# matrix scans and never works longer than its budget: rendering stops
+# between keys when time is up (the frame is finished on the next tick) and
+# only the writes that fit are flushed (LedMatrix keeps the rest pending).
+# Writes are capped to what fits the budget, so a pending flush always
+# sends something on the next tick.
+# With nothing animating tick() returns straight away.
+#
+import time
+
+FPS = 30
+FRAME_BUDGET_NS = 4_000_000
+FADE_NS = 250_000_000
+PULSE_NS = 1_200_000_000
+PULSE_FLOOR = 48          # brightness at the bottom of a pulse, out of 256
+FLASH_NS = 200_000_000
+
+FULL = 256                # fixed point 1.0 for blend factors
+
+
+class Animator:
+    def __init__(self, leds, fps=FPS, budget_ns=FRAME_BUDGET_NS, fade_ns=FADE_NS,
+                 pulse_ns=PULSE_NS, flash_ns=FLASH_NS):
+        self.leds = leds
+        self.period_ns = 1_000_000_000 // fps
+        ## A budget below one single-channel write could never flush anything
+        self.budget_ns = max(budget_ns, leds.cost_ns(0, 1))
+        self.max_run = leds.run_limit(self.budget_ns)
+        self.fade_ns = fade_ns
+        self.pulse_ns = pulse_ns
+        self.flash_ns = flash_ns
+        self.keys = list(leds.led_map.items())
+        self.target = bytearray(leds.frame)
+        self.fade_from = bytearray(leds.frame)
+        self.fade_start = None
+        self.pulse = set()
+        self.flashes = {}                   # key -> press time
+        self.frame = bytearray(leds.frame)  # last rendered frame
+        self.next_frame = 0
+        self.frame_now = None               # time of the frame being rendered
+        self.render_index = 0
+        self.flush_pending = False
+        ## Stats for the simulator / metrics
+        self.frames = 0
+        self.deferred = 0
+        self.last_tick_ns = 0
+        self.max_tick_ns = 0
+
+    def set_target(self, colors, pulse=(), now=None):
+        """Cross-fade from what is showing to `colors`; `pulse` keys breathe."""
+        now = time.monotonic_ns() if now is None else now
+        self.fade_from[:] = self.frame
+        self.target = self.leds.build(colors)
+        self.fade_start = now
+        self.pulse = set(key for key in pulse if key in self.leds.led_map)
+        self.render_index = 0
+
+    def resync(self):
+        """The chip lost its state: repaint the current frame within the budget."""
+        self.leds.resync()
+        self.flush_pending = True
+
+    def flash(self, key, now=None):
+        if key in self.leds.led_map:
+            self.flashes[key] = time.monotonic_ns() if now is None else now
+
+    def animating(self):
+        return self.fade_start is not None or bool(self.pulse) or bool(self.flashes)
+
+    def _blend_factors(self, now):
+        fade = FULL
+        if self.fade_start is not None and self.fade_ns > 0:
+            fade = min(FULL, (now - self.fade_start) * FULL // self.fade_ns)
+        pulse = FULL
+        if self.pulse:
+            ## Triangle wave between PULSE_FLOOR and FULL
+            phase = (now % self.pulse_ns) * 2 * FULL // self.pulse_ns
+            if phase > FULL:
+                phase = 2 * FULL - phase
+            pulse = PULSE_FLOOR + (FULL - PULSE_FLOOR) * (FULL - phase) // FULL
+        return fade, pulse
+
+    def _render(self, start_ns):
+        now = self.frame_now
+        fade, pulse = self._blend_factors(now)
+        target, source, frame = self.target, self.fade_from, self.frame
+        keys = self.keys
+        deadline = start_ns + self.budget_ns
+        while self.render_index < len(keys):
+            key, idx = keys[self.render_index]
+            flash = 0
+            pressed = self.flashes.get(key)
+            if pressed is not None:
+                left = self.flash_ns - (now - pressed)
+                if left > 0:
+                    flash = left * FULL // self.flash_ns
+                else:
+                    del self.flashes[key]
+            pulsing = key in self.pulse
+            for channel in (idx, idx + 1, idx + 2):
+                value = target[channel]
+                if fade < FULL:
+                    old = source[channel]
+                    value = old + (value - old) * fade // FULL
+                if pulsing:
+                    value = value * pulse // FULL
+                if flash:
+                    value += (255 - value) * flash // FULL
+                frame[channel] = value
+            self.render_index += 1
+            if time.monotonic_ns() >= deadline:
+                break
+        if self.render_index < len(keys):
+            return False
+        self.render_index = 0
+        if fade >= FULL:
+            self.fade_start = None
+        return True
+
+    def tick(self):
+        """Advance animations within the frame budget; True if anything was sent."""
+        start = time.monotonic_ns()
+        sent = False
+        if self.flush_pending:
+            self.flush_pending = not self.leds.show(self.frame, self.budget_ns, self.max_run)
+            sent = True
+        elif self.render_index or (self.animating() and start >= self.next_frame):
+            if not self.render_index:
+                self.frame_now = start
+                ## Fixed rate; after a stall skip ahead instead of bursting
+                self.next_frame = max(self.next_frame + self.period_ns, start)
+            if self._render(start):
+                left = self.budget_ns - (time.monotonic_ns() - start)
+                self.flush_pending = not self.leds.show(self.frame, max(0, left), self.max_run)
+                self.frames += 1
+                sent = True
+            else:
+                self.deferred += 1
+        elapsed = time.monotonic_ns() - start
+        self.last_tick_ns = elapsed
+        if elapsed > self.max_tick_ns:
+            self.max_tick_ns = elapsed
+        return sent
@@ -0,0 +1,150 @@
+# SPDX-FileCopyrightText: Raul Martinez Zabala 2025
+# SPDX-License-Identifier: MIT
+#
+# Key backlight painting on the IS31FL3743.
+#
+# Colors are parsed once into a frame (one byte per PWM register) when a
+# config is loaded. LedMatrix remembers the frame on the chip and only sends
+# the channels that changed, merging nearby changes into one block write
+# through the driver buffer (show_range), so a toggle rewrites one key and a
+# profile switch only the keys whose color differs.
+#
+# show() can be given a time budget: writes are costed with the I2C model
+# below and the ones that don't fit are left for the next call. Callers with
+# a budget also cap the write length (run_limit) so that one write always
+# fits and a flush cannot stall on a write bigger than the whole budget.
+#
+from framework_is31fl3743 import NUM_LEDS
+
+# Key -> PWM register of its blue channel; green and red follow at +1 and +2
+MATRIX_LED_MAP = {
+    "a1" : 40,  "a2" : 37,  "a3" : 52,  "a4" : 49,
+    "b1" : 4,   "b2" : 1,   "b3" : 16,  "b4" : 13,
+    "c1" : 22,  "c2" : 19,  "c3" : 34,  "c4" : 31, # c4 tiene LED map, faltaba en MATRIX
+    "d1" : 58,  "d2" : 55,  "d3" : 70,  "d4" : 67,
+    "e1" : 25,  "e2" : 61,  "e3" : 64,  "e4" : 28,
+    "f1" : 7,   "f2" : 43,  "f3" : 46,  "f4" : 10
+}
+
+# Unchanged channels up to this far apart still go in the same block write;
+# another transaction costs more than resending a few bytes
+MERGE_GAP = 8
+# Longest block write; run_limit() shortens it for budgets it doesn't fit
+MAX_RUN = 64
+
+# Bus cost model at 400 kHz: 9 bits per byte plus per-transaction overhead
+I2C_BYTE_NS = 22_500
+I2C_XFER_NS = 60_000
+
+BLACK = (0, 0, 0)
+_parsed = {}
+
+
+def parse_color(value):
+    """(r, g, b) for "rrggbb", black if empty, None if it can't be parsed."""
+    if not value:
+        return BLACK
+    rgb = _parsed.get(value, False)
+    if rgb is False:
+        try:
+            rgb = (int(value[:2], 16), int(value[2:4], 16), int(value[-2:], 16))
+        except: rgb = None
+        _parsed[value] = rgb
+    return rgb
+
+
+class LedMatrix:
+    def __init__(self, is31, led_map, merge_gap=MERGE_GAP):
+        self.is31 = is31
+        self.led_map = led_map
+        self.merge_gap = merge_gap
+        self.channels = sorted(idx + c for idx in led_map.values() for c in range(3))
+        self.frame = bytearray(NUM_LEDS)    # what the chip is showing
+        self.synced = False
+        self.stale = None                   # channels not written yet by a budgeted first paint
+        self.writes = 0
+
+    def build(self, colors):
+        """Frame for `colors`; keys with unparseable colors keep their current one."""
+        frame = bytearray(self.frame)
+        for key, idx in self.led_map.items():
+            rgb = parse_color(colors.get(key, None))
+            if rgb is None:
+                continue
+            frame[idx + 2], frame[idx + 1], frame[idx + 0] = rgb
+        return frame
+
+    def runs(self, frame, max_run=MAX_RUN):
+        """[(start, end)] register ranges covering the changed channels."""
+        runs = []
+        start = last = None
+        old = self.frame
+        stale = self.stale
+        for channel in self.channels:
+            if old[channel] == frame[channel] and (stale is None or channel not in stale):
+                continue
+            if start is not None and channel - last <= self.merge_gap and channel - start < max_run:
+                last = channel
+                continue
+            if start is not None:
+                runs.append((start, last + 1))
+            start = last = channel
+        if start is not None:
+            runs.append((start, last + 1))
+        return runs
+
+    @staticmethod
+    def cost_ns(start, end):
+        return I2C_XFER_NS + (end - start + 2) * I2C_BYTE_NS
+
+    @staticmethod
+    def run_limit(budget_ns):
+        """Longest block write whose modelled cost fits `budget_ns` (at least 1)."""
+        return max(1, min(MAX_RUN, (budget_ns - I2C_XFER_NS) // I2C_BYTE_NS - 2))
+
+    def show(self, frame, budget_ns=None, max_run=MAX_RUN):
+        """
+        Bring the chip to `frame`. With `budget_ns`, only the block writes
+        whose modelled cost fits are sent; returns False if some are left.
+        Writes are at most `max_run` channels long.
+        """
+        is31 = self.is31
+        if not self.synced:
+            if budget_ns is None:
+                for channel in self.channels:
+                    is31[channel] = frame[channel]
+                is31.show()
+                self.frame[:] = frame
+                self.synced = True
+                self.stale = None
+                self.writes += 1
+                return True
+            ## What the chip shows is unknown: every channel is a change, spread
+            ## over as many budgets as it takes like any other flush
+            if self.stale is None:
+                self.stale = set(self.channels)
+        spent = 0
+        for start, end in self.runs(frame, max_run):
+            if budget_ns is not None:
+                spent += self.cost_ns(start, end)
+                if spent > budget_ns:
+                    return False
+            for channel in range(start, end):
+                is31[channel] = frame[channel]
+            is31.show_range(start, end)
+            self.frame[start:end] = frame[start:end]
+            self.writes += 1
+            if self.stale is not None:
+                self.stale.difference_update(range(start, end))
+        if self.stale is not None:
+            self.stale = None
+            self.synced = True
+        return True
+
+    def resync(self):
+        """Forget what the chip shows (bus error, power loss); the next show() rewrites every channel."""
+        self.synced = False
+        self.stale = None
+
+    def paint(self, colors):
+        return self.show(self.build(colors))
@@ -0,0 +1,375 @@
+# SPDX-FileCopyrightText: Raul Martinez Zabala 2025
+#
+# SPDX-License-Identifier: MIT
+# pylint: disable=too-few-public-methods
+
+"""
+`adafruit_register.i2c_prealloc`
+====================================================
+
+Allocation-free variants of the `i2c_struct`, `i2c_struct_array`, `i2c_bit`
+and `i2c_bits` registers.
+
+Each register gets one buffer per device instance, allocated on first use
+and reused afterwards, and struct sizes and byte orders are worked out when
+the descriptor is created. Accessing a register then allocates nothing but
+its value (`Struct` and `StructArray` items are still tuples), so register
+traffic in a scan loop does not feed the garbage collector.
+
+`StructArray` also reads and writes runs of consecutive elements in a single
+transaction with `readinto()` and `write()`.
+"""
+
+import struct
+
+try:
+    from typing import Optional, Type, Tuple, Any, NoReturn
+    from circuitpython_typing import WriteableBuffer, ReadableBuffer
+    from circuitpython_typing.device_drivers import I2CDeviceDriver
+except ImportError:
+    pass
+
+_BYTE_FORMATS = ("B", "<B", ">B", "=B", "!B")
+
+
+class _Register:
+    """
+    Per-instance register buffer: the register address followed by ``size`` bytes.
+
+    Registers of the same address and size share the buffer, it only holds a
+    value for the duration of one access.
+    """
+
+    def __init__(self, register_address: int, size: int) -> None:
+        self.address = register_address
+        self.size = size
+        self.buffer_id = "_register{}_{}".format(register_address, size)
+
+    def _buffer(self, obj: I2CDeviceDriver) -> bytearray:
+        buf = getattr(obj, self.buffer_id, None)
+        if buf is None:
+            buf = bytearray(1 + self.size)
+            buf[0] = self.address
+            setattr(obj, self.buffer_id, buf)
+        return buf
+
+    def _read(self, obj: I2CDeviceDriver) -> bytearray:
+        buf = self._buffer(obj)
+        with obj.i2c_device as i2c:
+            i2c.write_then_readinto(buf, buf, out_end=1, in_start=1)
+        return buf
+
+
+class Struct(_Register):
+    """
+    Arbitrary structure register that is readable and writeable.
+
+    :param int register_address: The register address to read the bit from
+    :param str struct_format: The struct format string for this register.
+    """
+
+    def __init__(self, register_address: int, struct_format: str) -> None:
+        super().__init__(register_address, struct.calcsize(struct_format))
+        self.format = struct_format
+
+    def __get__(
+        self,
+        obj: Optional[I2CDeviceDriver],
+        objtype: Optional[Type[I2CDeviceDriver]] = None,
+    ) -> Tuple:
+        return struct.unpack_from(self.format, self._read(obj), 1)
+
+    def __set__(self, obj: I2CDeviceDriver, value: Tuple) -> None:
+        buf = self._buffer(obj)
+        struct.pack_into(self.format, buf, 1, *value)
+        with obj.i2c_device as i2c:
+            i2c.write(buf)
+
+
+class UnaryStruct(_Register):
+    """
+    Arbitrary single value structure register that is readable and writeable.
+
+    :param int register_address: The register address to read the bit from
+    :param str struct_format: The struct format string for this register.
+    """
+
+    def __init__(self, register_address: int, struct_format: str) -> None:
+        super().__init__(register_address, struct.calcsize(struct_format))
+        self.format = struct_format
+        # Single unsigned bytes are read and written without struct
+        self.byte = struct_format in _BYTE_FORMATS
+
+    def __get__(
+        self,
+        obj: Optional[I2CDeviceDriver],
+        objtype: Optional[Type[I2CDeviceDriver]] = None,
+    ) -> Any:
+        buf = self._read(obj)
+        if self.byte:
+            return buf[1]
+        return struct.unpack_from(self.format, buf, 1)[0]
+
+    def __set__(self, obj: I2CDeviceDriver, value: Any) -> None:
+        buf = self._buffer(obj)
+        if self.byte:
+            buf[1] = value
+        else:
+            struct.pack_into(self.format, buf, 1, value)
+        with obj.i2c_device as i2c:
+            i2c.write(buf)
+
+
+class ROUnaryStruct(UnaryStruct):
+    """
+    Arbitrary single value structure register that is read-only.
+
+    :param int register_address: The register address to read the bit from
+    :param type struct_format: The struct format string for this register.
+    """
+
+    def __set__(self, obj: I2CDeviceDriver, value: Any) -> NoReturn:
+        raise AttributeError()
+
+
+class _BoundStructArray:
+    """
+    Array object that `StructArray` constructs on demand, with one buffer
+    for single element access.
+
+    :param object obj: The device object to bind to. It must have a `i2c_device` attribute
+    :param int register_address: The register address to read the bit from
+    :param str struct_format: The struct format string for each register element
+    :param int count: Number of elements in the array
+    """
+
+    def __init__(
+        self,
+        obj: I2CDeviceDriver,
+        register_address: int,
+        struct_format: str,
+        count: int,
+    ) -> None:
+        self.format = struct_format
+        self.first_register = register_address
+        self.obj = obj
+        self.count = count
+        self.size = struct.calcsize(struct_format)
+        self.buffer = bytearray(1 + self.size)
+
+    def _element(self, index: int) -> bytearray:
+        if not 0 <= index < self.count:
+            raise IndexError()
+        self.buffer[0] = self.first_register + self.size * index
+        return self.buffer
+
+    def _span(self, start: int, length: int) -> int:
+        """Number of whole elements in ``length`` bytes, bounds checked from ``start``."""
+        count = length // self.size
+        if length % self.size or not 0 <= start or start + count > self.count:
+            raise IndexError()
+        return count
+
+    def __getitem__(self, index: int) -> Tuple:
+        buf = self._element(index)
+        with self.obj.i2c_device as i2c:
+            i2c.write_then_readinto(buf, buf, out_end=1, in_start=1)
+        return struct.unpack_from(self.format, buf, 1)
+
+    def __setitem__(self, index: int, value: Tuple) -> None:
+        buf = self._element(index)
+        struct.pack_into(self.format, buf, 1, *value)
+        with self.obj.i2c_device as i2c:
+            i2c.write(buf)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def readinto(self, buf: WriteableBuffer, start: int = 0) -> None:
+        """
+        Read consecutive elements, from element ``start``, into ``buf`` in one
+        transaction. ``buf`` holds the packed elements (its length is a
+        multiple of the element size); unpack them with `struct.unpack_from`.
+        """
+        self._span(start, len(buf))
+        self.buffer[0] = self.first_register + self.size * start
+        with self.obj.i2c_device as i2c:
+            i2c.write_then_readinto(self.buffer, buf, out_end=1)
+
+    def write(self, buf: WriteableBuffer, start: int = 0) -> None:
+        """
+        Write consecutive elements, from element ``start``, in one transaction.
+
+        ``buf[0]`` is reserved for the register address and overwritten; the
+        packed elements follow it. Keeping that spare byte in front of the
+        caller's buffer is what lets the block go out without a copy.
+        """
+        self._span(start, len(buf) - 1)
+        buf[0] = self.first_register + self.size * start
+        with self.obj.i2c_device as i2c:
+            i2c.write(buf)
+
+
+class StructArray:
+    """
+    Repeated array of structured registers that are readable and writeable,
+    with bulk `readinto()` / `write()` of consecutive elements.
+
+    .. note:: This assumes the device addresses correspond to 8-bit bytes. This is not suitable for
+      devices with registers of other widths such as 16-bit.
+
+    :param int register_address: The register address to begin reading the array from
+    :param str struct_format: The struct format string for this register.
+    :param int count: Number of elements in the array
+    """
+
+    def __init__(self, register_address: int, struct_format: str, count: int) -> None:
+        self.format = struct_format
+        self.address = register_address
+        self.count = count
+        self.array_id = "_structarray{}".format(register_address)
+
+    def __get__(
+        self,
+        obj: Optional[I2CDeviceDriver],
+        objtype: Optional[Type[I2CDeviceDriver]] = None,
+    ) -> _BoundStructArray:
+        array = getattr(obj, self.array_id, None)
+        if array is None:
+            array = _BoundStructArray(obj, self.address, self.format, self.count)
+            setattr(obj, self.array_id, array)
+        return array
+
+
+class RWBit(_Register):
+    """
+    Single bit register that is readable and writeable.
+
+    :param int register_address: The register address to read the bit from
+    :param int bit: The bit index within the byte at ``register_address``
+    :param int register_width: The number of bytes in the register. Defaults to 1.
+    :param bool lsb_first: Is the first byte we read from I2C the LSB? Defaults to true
+    """
+
+    def __init__(
+        self,
+        register_address: int,
+        bit: int,
+        register_width: int = 1,
+        lsb_first: bool = True,
+    ) -> None:
+        super().__init__(register_address, register_width)
+        self.bit_mask = 1 << (bit % 8)  # the bitmask *within* the byte!
+        if lsb_first:
+            self.byte = bit // 8 + 1  # the byte number within the buffer
+        else:
+            self.byte = register_width - (bit // 8)  # the byte number within the buffer
+
+    def __get__(
+        self,
+        obj: Optional[I2CDeviceDriver],
+        objtype: Optional[Type[I2CDeviceDriver]] = None,
+    ) -> bool:
+        return bool(self._read(obj)[self.byte] & self.bit_mask)
+
+    def __set__(self, obj: I2CDeviceDriver, value: bool) -> None:
+        buf = self._buffer(obj)
+        with obj.i2c_device as i2c:
+            i2c.write_then_readinto(buf, buf, out_end=1, in_start=1)
+            if value:
+                buf[self.byte] |= self.bit_mask
+            else:
+                buf[self.byte] &= ~self.bit_mask
+            i2c.write(buf)
+
+
+class ROBit(RWBit):
+    """Single bit register that is read only. Subclass of `RWBit`.
+
+    :param int register_address: The register address to read the bit from
+    :param type bit: The bit index within the byte at ``register_address``
+    :param int register_width: The number of bytes in the register. Defaults to 1.
+    """
+
+    def __set__(self, obj: I2CDeviceDriver, value: bool) -> NoReturn:
+        raise AttributeError()
+
+
+class RWBits(_Register):
+    """
+    Multibit register (less than a full byte) that is readable and writeable.
+    This must be within a byte register.
+
+    :param int num_bits: The number of bits in the field.
+    :param int register_address: The register address to read the bit from
+    :param int lowest_bit: The lowest bits index within the byte at ``register_address``
+    :param int register_width: The number of bytes in the register. Defaults to 1.
+    :param bool lsb_first: Is the first byte we read from I2C the LSB? Defaults to true
+    :param bool signed: If True, the value is a "two's complement" signed value.
+                        If False, it is unsigned.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        num_bits: int,
+        register_address: int,
+        lowest_bit: int,
+        register_width: int = 1,
+        lsb_first: bool = True,
+        signed: bool = False,
+    ) -> None:
+        super().__init__(register_address, register_width)
+        self.bit_mask = ((1 << num_bits) - 1) << lowest_bit
+        if self.bit_mask >= 1 << (register_width * 8):
+            raise ValueError("Cannot have more bits than register size")
+        self.lowest_bit = lowest_bit
+        self.sign_bit = (1 << (num_bits - 1)) if signed else 0
+        # Buffer indexes from the most to the least significant byte
+        order = tuple(range(register_width, 0, -1))
+        self.order = order if lsb_first else tuple(reversed(order))
+        self.lsb_order = tuple(reversed(self.order))
+
+    def _value(self, buf: bytearray) -> int:
+        reg = 0
+        for i in self.order:
+            reg = (reg << 8) | buf[i]
+        return reg
+
+    def __get__(
+        self,
+        obj: Optional[I2CDeviceDriver],
+        objtype: Optional[Type[I2CDeviceDriver]] = None,
+    ) -> int:
+        reg = (self._value(self._read(obj)) & self.bit_mask) >> self.lowest_bit
+        # If the value is signed and negative, convert it
+        if reg & self.sign_bit:
+            reg -= 2 * self.sign_bit
+        return reg
+
+    def __set__(self, obj: I2CDeviceDriver, value: int) -> None:
+        value <<= self.lowest_bit  # shift the value over to the right spot
+        buf = self._buffer(obj)
+        with obj.i2c_device as i2c:
+            i2c.write_then_readinto(buf, buf, out_end=1, in_start=1)
+            reg = self._value(buf)
+            reg &= ~self.bit_mask  # mask off the bits we're about to change
+            reg |= value & self.bit_mask  # then or in our new value
+            for i in self.lsb_order:
+                buf[i] = reg & 0xFF
+                reg >>= 8
+            i2c.write(buf)
+
+
+class ROBits(RWBits):
+    """
+    Multibit register (less than a full byte) that is read-only. This must be
+    within a byte register.
+
+    :param int num_bits: The number of bits in the field.
+    :param int register_address: The register address to read the bit from
+    :param type lowest_bit: The lowest bits index within the byte at ``register_address``
+    :param int register_width: The number of bytes in the register. Defaults to 1.
+    """
+
+    def __set__(self, obj: I2CDeviceDriver, value: int) -> NoReturn:
+        raise AttributeError()
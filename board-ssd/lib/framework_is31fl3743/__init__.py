@@ -27,8 +27,7 @@ Implementation Notes
 
 from sys import implementation
 from adafruit_bus_device import i2c_device
-from adafruit_register.i2c_struct import ROUnaryStruct, UnaryStruct
-from adafruit_register.i2c_bit import RWBit
+from adafruit_register.i2c_prealloc import UnaryStruct
 
 try:
     # Used only for typing
@@ -61,6 +60,43 @@ MUST_BUFFER = 0x02  # MUST buffer pixel data, else throw MemoryError
 # 198
 NUM_LEDS = 18 * 11
 
+# Mapping entry for a buffer position with no LED
+UNMAPPED = 65535
+
+
+def compile_mapping(mapping: Tuple) -> Tuple:
+    """
+    Turn a pixel mapping (buffer position -> LED) into the register runs
+    ``IS31FL3743.write()`` sends, sorted by LED.
+
+    :param mapping: map the pixels in the buffer to the order addressed by the driver chip
+    :return: ``(segments, blocks)``. Each segment ``(led, position, length)``
+             copies ``buffer[position:position + length]`` to consecutive
+             LEDs; each block ``(led, length)`` is a range of consecutive
+             mapped LEDs that can go out in one block write.
+    """
+    pairs = sorted((led, pos) for pos, led in enumerate(mapping) if led != UNMAPPED)
+    segments = []
+    blocks = []
+    for led, pos in pairs:
+        if not 0 <= led < NUM_LEDS:
+            raise ValueError(f"LED must be 0 ~ {NUM_LEDS}")
+        if segments:
+            first, position, length = segments[-1]
+            if led == first + length and pos == position + length:
+                segments[-1] = (first, position, length + 1)
+            else:
+                # Also taken for an LED mapped twice: the later position wins
+                segments.append((led, pos, 1))
+        else:
+            segments.append((led, pos, 1))
+        if blocks and led <= blocks[-1][0] + blocks[-1][1]:
+            first, length = blocks[-1]
+            blocks[-1] = (first, max(length, led - first + 1))
+        else:
+            blocks.append((led, 1))
+    return tuple(segments), tuple(blocks)
+
 
 class IS31FL3743:
     """
@@ -78,16 +114,21 @@ class IS31FL3743:
                      when show() is called, but fall back on NO_BUFFER
                      behavior. MUST_BUFFER = buffer pixels in RAM, throw
                      MemoryError if allocation fails.
+
+    The page, configuration, global current and scaling registers are
+    shadowed in RAM: writing the value they already hold does nothing,
+    ``enable`` is changed from the cached configuration without reading it
+    back, and reads come from the cache once known. Call ``resync()`` if the
+    chip may have changed behind the driver (power loss, bus errors).
     """
 
     _page_reg = UnaryStruct(_IS3743_COMMANDREGISTER, "<B")
     _lock_reg = UnaryStruct(_IS3743_COMMANDREGISTERLOCK, "<B")
     _id_reg = UnaryStruct(_IS3743_IDREGISTER, "<B")
-    _config_reg = UnaryStruct(_IS3743_FUNCREG_CONFIG, "<B")
-    _gcurrent_reg = UnaryStruct(_IS3743_FUNCREG_GCURRENT, "<B")
     _reset_reg = UnaryStruct(_IS3743_FUNCREG_RESET, "<B")
-    _shutdown_bit = RWBit(_IS3743_FUNCREG_CONFIG, 0)
     _pixel_buffer = None
+    _mapping = None
+    _scratch = None
 
     def __init__(
         self,
@@ -112,12 +153,48 @@ class IS31FL3743:
             )
         self._buf = bytearray(2)
         self._page = None
+        self._shadow = {}  # (page, register) -> last known value
+        self._scaling = None
         self.reset()
 
     def reset(self) -> None:
         """Reset"""
         self.page = 2
         self._reset_reg = 0xAE
+        # Registers are back to their defaults, forget what was cached
+        self._shadow = {}
+        self._scaling = None
+
+    def resync(self) -> None:
+        """Drop the cached register state and read it back from the device."""
+        self._page = None
+        self._shadow = {}
+        self._scaling = None
+        self._read_reg(2, _IS3743_FUNCREG_CONFIG)
+        self._read_reg(2, _IS3743_FUNCREG_GCURRENT)
+
+    def _read_reg(self, page: int, register: int) -> int:
+        value = self._shadow.get((page, register))
+        if value is None:
+            self.page = page
+            self._buf[0] = register
+            with self.i2c_device as i2c:
+                i2c.write_then_readinto(
+                    self._buf, self._buf, out_start=0, out_end=1, in_start=1, in_end=2
+                )
+            value = self._buf[1]
+            self._shadow[(page, register)] = value
+        return value
+
+    def _write_reg(self, page: int, register: int, value: int) -> None:
+        if self._shadow.get((page, register)) == value:
+            return  # already set
+        self.page = page
+        self._buf[0] = register
+        self._buf[1] = value
+        with self.i2c_device as i2c:
+            i2c.write(self._buf)
+        self._shadow[(page, register)] = value
 
     def unlock(self) -> None:
         """Unlock"""
@@ -128,33 +205,33 @@ class IS31FL3743:
 
         :param scale: Scaling level from 0 (off) to 255 (brightest).
         """
+        if scale == self._scaling:
+            return  # already set
         scalebuf = bytearray([scale] * (NUM_LEDS + 1))  # LEDs + 1 for reg addr
         scalebuf[0] = 0  # Initial register address
         self.page = 1
         with self.i2c_device as i2c:
             i2c.write(scalebuf)
+        self._scaling = scale
 
     @property
     def global_current(self) -> int:
         """Global current"""
-        self.page = 2
-        return self._gcurrent_reg
+        return self._read_reg(2, _IS3743_FUNCREG_GCURRENT)
 
     @global_current.setter
     def global_current(self, current: int) -> None:
-        self.page = 2
-        self._gcurrent_reg = current
+        self._write_reg(2, _IS3743_FUNCREG_GCURRENT, current)
 
     @property
     def enable(self) -> bool:
         """Enable"""
-        self.page = 2
-        return self._shutdown_bit
+        return bool(self._read_reg(2, _IS3743_FUNCREG_CONFIG) & 0x01)
 
     @enable.setter
     def enable(self, enable: bool) -> None:
-        self.page = 2
-        self._shutdown_bit = enable
+        config = self._read_reg(2, _IS3743_FUNCREG_CONFIG)
+        self._write_reg(2, _IS3743_FUNCREG_CONFIG, (config & ~0x01) | (0x01 if enable else 0))
 
     @property
     def page(self) -> Union[int, None]:
@@ -215,18 +292,63 @@ class IS31FL3743:
                 # _pixel_buffer[0] is always 0! (First register addr)
                 i2c.write(self._pixel_buffer)
 
+    def show_range(self, start: int, end: int) -> None:
+        """Issue in-RAM pixel data for LEDs ``start`` to ``end - 1`` to the
+        device in one block write. No effect if pixels are unbuffered.
+        """
+        if self._pixel_buffer:
+            self._write_range(self._pixel_buffer, start, end)
+
+    def _write_range(self, pixels: bytearray, start: int, end: int) -> None:
+        """Block write of ``pixels[1 + start:1 + end]`` (laid out like the
+        pixel buffer) to LEDs ``start`` to ``end - 1``."""
+        self.page = 0
+        # Borrow the byte before the range for the register address
+        saved = pixels[start]
+        pixels[start] = start
+        try:
+            with self.i2c_device as i2c:
+                i2c.write(pixels, start=start, end=end + 1)
+        finally:
+            pixels[start] = saved
+
     def write(self, mapping: Tuple, buffer: ReadableBuffer) -> None:
         """
         Write buf out on the I2C bus to the IS31FL3743.
 
+        The mapping is compiled into register runs (``compile_mapping``) the
+        first time it is seen. Buffered, the runs are copied into the pixel
+        buffer and the page goes out with ``show()``; unbuffered, they are
+        assembled in a scratch buffer and each run of consecutive LEDs is one
+        block write.
+
         :param mapping: map the pixels in the buffer to the order addressed by the driver chip
         :param buffer: The bytes to clock out. No assumption is made about color order
         :return: None
         """
-        for pos, data in enumerate(buffer):
-            if mapping[pos] != 65535:
-                self[mapping[pos]] = data
-        self.show()
+        if mapping is not self._mapping:
+            self._runs = compile_mapping(mapping)
+            self._mapping = mapping
+        segments, blocks = self._runs
+        pixels = self._pixel_buffer or self._scratch
+        if pixels is None:
+            try:
+                pixels = self._scratch = bytearray(NUM_LEDS + 1)
+            except MemoryError:
+                for led, position, length in segments:
+                    for offset in range(length):
+                        self[led + offset] = buffer[position + offset]
+                return
+        for led, position, length in segments:
+            if length == 1:
+                pixels[1 + led] = buffer[position]
+            else:
+                pixels[1 + led : 1 + led + length] = buffer[position : position + length]
+        if self._pixel_buffer:
+            self.show()
+        else:
+            for led, length in blocks:
+                self._write_range(pixels, led, led + length)
 
 
 IS3743_RGB = (0 << 4) | (1 << 2) | (2)  # Encode as R,G,B
@@ -134,11 +134,10 @@ class IS31FL3743_PixelBuf(adafruit_pixelbuf.PixelBuf):
         self.is31fl3743.reset()
 
         # Set scaling for all LEDs to maximum
-        for led in range(352):
-            self.is31fl3743.set_led(led, 0xFF, 2)
+        self.is31fl3743.set_led_scaling(0xFF)
 
-        self.is31fl3743.set_global_current(0xFE)
-        self.is31fl3743.enable()
+        self.is31fl3743.global_current = 0xFE
+        self.is31fl3743.enable = True
 
     @property
     def n(self) -> int:
@@ -154,4 +153,5 @@ class IS31FL3743_PixelBuf(adafruit_pixelbuf.PixelBuf):
         self.show()
 
     def _transmit(self, buffer: bytearray) -> None:
+        # The driver compiles the mapping once and sends it in block writes
         self.is31fl3743.write(self.mapping, buffer)
@@ -0,0 +1,228 @@
+# SPDX-FileCopyrightText: Raul Martinez Zabala 2025
+#
+# SPDX-License-Identifier: MIT
+
+"""
+`keyboard_layout_win_es.KeyboardLayoutWinES`
+=======================================================
+
+Spanish (Spain) layout as configured on Windows, the "ES" layout in config.json.
+"""
+
+from adafruit_hid.keyboard_layout_base import KeyboardLayoutBase
+
+
+class KeyboardLayoutWinES(KeyboardLayoutBase):
+    """Map ASCII and Spanish characters to keypresses on a Spanish 105-key keyboard.
+
+    `^`, `` ` ``, `~`, `´` and `¨` are dead keys, typed as the dead key followed by
+    a space; accented vowels are typed as the dead key followed by the vowel.
+    """
+
+    # Same encoding as KeyboardLayoutUS: one byte per ASCII 0-127, top bit
+    # (0x80) set when shift is needed, \x00 for dead keys and unmapped codes.
+    # Characters that also need AltGr are listed in NEED_ALTGR.
+    ASCII_TO_KEYCODE = (
+        b"\x00"  # NUL
+        b"\x00"  # SOH
+        b"\x00"  # STX
+        b"\x00"  # ETX
+        b"\x00"  # EOT
+        b"\x00"  # ENQ
+        b"\x00"  # ACK
+        b"\x00"  # BEL \a
+        b"\x2a"  # BS BACKSPACE \b
+        b"\x2b"  # TAB \t
+        b"\x28"  # LF \n
+        b"\x00"  # VT \v
+        b"\x00"  # FF \f
+        b"\x00"  # CR \r
+        b"\x00"  # SO
+        b"\x00"  # SI
+        b"\x00"  # DLE
+        b"\x00"  # DC1
+        b"\x00"  # DC2
+        b"\x00"  # DC3
+        b"\x00"  # DC4
+        b"\x00"  # NAK
+        b"\x00"  # SYN
+        b"\x00"  # ETB
+        b"\x00"  # CAN
+        b"\x00"  # EM
+        b"\x00"  # SUB
+        b"\x29"  # ESC
+        b"\x00"  # FS
+        b"\x00"  # GS
+        b"\x00"  # RS
+        b"\x00"  # US
+        b"\x2c"  # SPACE
+        b"\x9e"  # ! x1e|SHIFT_FLAG (shift 1)
+        b"\x9f"  # " x1f|SHIFT_FLAG (shift 2)
+        b"\x20"  # # altgr 3
+        b"\xa1"  # $ x21|SHIFT_FLAG (shift 4)
+        b"\xa2"  # % x22|SHIFT_FLAG (shift 5)
+        b"\xa3"  # & x23|SHIFT_FLAG (shift 6)
+        b"\x2d"  # '
+        b"\xa5"  # ( x25|SHIFT_FLAG (shift 8)
+        b"\xa6"  # ) x26|SHIFT_FLAG (shift 9)
+        b"\xb0"  # * x30|SHIFT_FLAG (shift +)
+        b"\x30"  # +
+        b"\x36"  # ,
+        b"\x38"  # -
+        b"\x37"  # .
+        b"\xa4"  # / x24|SHIFT_FLAG (shift 7)
+        b"\x27"  # 0
+        b"\x1e"  # 1
+        b"\x1f"  # 2
+        b"\x20"  # 3
+        b"\x21"  # 4
+        b"\x22"  # 5
+        b"\x23"  # 6
+        b"\x24"  # 7
+        b"\x25"  # 8
+        b"\x26"  # 9
+        b"\xb7"  # : x37|SHIFT_FLAG (shift .)
+        b"\xb6"  # ; x36|SHIFT_FLAG (shift ,)
+        b"\x64"  # <
+        b"\xa7"  # = x27|SHIFT_FLAG (shift 0)
+        b"\xe4"  # > x64|SHIFT_FLAG (shift <)
+        b"\xad"  # ? x2d|SHIFT_FLAG (shift ')
+        b"\x1f"  # @ altgr 2
+        b"\x84"  # A x04|SHIFT_FLAG
+        b"\x85"  # B x05|SHIFT_FLAG
+        b"\x86"  # C x06|SHIFT_FLAG
+        b"\x87"  # D x07|SHIFT_FLAG
+        b"\x88"  # E x08|SHIFT_FLAG
+        b"\x89"  # F x09|SHIFT_FLAG
+        b"\x8a"  # G x0a|SHIFT_FLAG
+        b"\x8b"  # H x0b|SHIFT_FLAG
+        b"\x8c"  # I x0c|SHIFT_FLAG
+        b"\x8d"  # J x0d|SHIFT_FLAG
+        b"\x8e"  # K x0e|SHIFT_FLAG
+        b"\x8f"  # L x0f|SHIFT_FLAG
+        b"\x90"  # M x10|SHIFT_FLAG
+        b"\x91"  # N x11|SHIFT_FLAG
+        b"\x92"  # O x12|SHIFT_FLAG
+        b"\x93"  # P x13|SHIFT_FLAG
+        b"\x94"  # Q x14|SHIFT_FLAG
+        b"\x95"  # R x15|SHIFT_FLAG
+        b"\x96"  # S x16|SHIFT_FLAG
+        b"\x97"  # T x17|SHIFT_FLAG
+        b"\x98"  # U x18|SHIFT_FLAG
+        b"\x99"  # V x19|SHIFT_FLAG
+        b"\x9a"  # W x1a|SHIFT_FLAG
+        b"\x9b"  # X x1b|SHIFT_FLAG
+        b"\x9c"  # Y x1c|SHIFT_FLAG
+        b"\x9d"  # Z x1d|SHIFT_FLAG
+        b"\x2f"  # [ altgr `
+        b"\x35"  # \ altgr º
+        b"\x30"  # ] altgr +
+        b"\x00"  # ^ dead key
+        b"\xb8"  # _ x38|SHIFT_FLAG (shift -)
+        b"\x00"  # ` dead key
+        b"\x04"  # a
+        b"\x05"  # b
+        b"\x06"  # c
+        b"\x07"  # d
+        b"\x08"  # e
+        b"\x09"  # f
+        b"\x0a"  # g
+        b"\x0b"  # h
+        b"\x0c"  # i
+        b"\x0d"  # j
+        b"\x0e"  # k
+        b"\x0f"  # l
+        b"\x10"  # m
+        b"\x11"  # n
+        b"\x12"  # o
+        b"\x13"  # p
+        b"\x14"  # q
+        b"\x15"  # r
+        b"\x16"  # s
+        b"\x17"  # t
+        b"\x18"  # u
+        b"\x19"  # v
+        b"\x1a"  # w
+        b"\x1b"  # x
+        b"\x1c"  # y
+        b"\x1d"  # z
+        b"\x34"  # { altgr ´
+        b"\x1e"  # | altgr 1
+        b"\x31"  # } altgr ç
+        b"\x00"  # ~ dead key
+        b"\x4c"  # DEL DELETE
+    )
+    NEED_ALTGR = "#@[\\]{|}¬€"
+    HIGHER_ASCII = {
+        0xF1: 0x33,  # ñ
+        0xD1: 0xB3,  # Ñ
+        0xE7: 0x31,  # ç
+        0xC7: 0xB1,  # Ç
+        0xBA: 0x35,  # º
+        0xAA: 0xB5,  # ª
+        0xA1: 0x2E,  # ¡
+        0xBF: 0xAE,  # ¿
+        0xB7: 0xA0,  # · (shift 3)
+        0xAC: 0x23,  # ¬ (altgr 6)
+        0x20AC: 0x08,  # € (altgr e)
+    }
+    COMBINED_KEYS = {
+        # Dead keys on their own: dead key + space
+        0x60: 0x2F20,  # `
+        0x5E: 0xAF20,  # ^ (shift `)
+        0x7E: 0x21A0,  # ~ (altgr 4)
+        0xB4: 0x3420,  # ´
+        0xA8: 0xB420,  # ¨ (shift ´)
+        # ´ + vowel
+        0xE1: 0x3461,  # á
+        0xE9: 0x3465,  # é
+        0xED: 0x3469,  # í
+        0xF3: 0x346F,  # ó
+        0xFA: 0x3475,  # ú
+        0xC1: 0x3441,  # Á
+        0xC9: 0x3445,  # É
+        0xCD: 0x3449,  # Í
+        0xD3: 0x344F,  # Ó
+        0xDA: 0x3455,  # Ú
+        # ` + vowel
+        0xE0: 0x2F61,  # à
+        0xE8: 0x2F65,  # è
+        0xEC: 0x2F69,  # ì
+        0xF2: 0x2F6F,  # ò
+        0xF9: 0x2F75,  # ù
+        0xC0: 0x2F41,  # À
+        0xC8: 0x2F45,  # È
+        0xCC: 0x2F49,  # Ì
+        0xD2: 0x2F4F,  # Ò
+        0xD9: 0x2F55,  # Ù
+        # ^ + vowel
+        0xE2: 0xAF61,  # â
+        0xEA: 0xAF65,  # ê
+        0xEE: 0xAF69,  # î
+        0xF4: 0xAF6F,  # ô
+        0xFB: 0xAF75,  # û
+        0xC2: 0xAF41,  # Â
+        0xCA: 0xAF45,  # Ê
+        0xCE: 0xAF49,  # Î
+        0xD4: 0xAF4F,  # Ô
+        0xDB: 0xAF55,  # Û
+        # ¨ + vowel
+        0xE4: 0xB461,  # ä
+        0xEB: 0xB465,  # ë
+        0xEF: 0xB469,  # ï
+        0xF6: 0xB46F,  # ö
+        0xFC: 0xB475,  # ü
+        0xC4: 0xB441,  # Ä
+        0xCB: 0xB445,  # Ë
+        0xCF: 0xB449,  # Ï
+        0xD6: 0xB44F,  # Ö
+        0xDC: 0xB455,  # Ü
+        # ~ + letter
+        0xE3: 0x21E1,  # ã
+        0xF5: 0x21EF,  # õ
+        0xC3: 0x21C1,  # Ã
+        0xD5: 0x21CF,  # Õ
+    }
+
+
+KeyboardLayout = KeyboardLayoutWinES
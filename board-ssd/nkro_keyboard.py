@@ -0,0 +1,89 @@
+# SPDX-FileCopyrightText: Raul Martinez Zabala 2025
+# SPDX-License-Identifier: MIT
+#
+# N-key-rollover keyboard: a bitmap report with one bit per keycode, so any
+# number of keys can be down in the same report.
+#
+# boot.py enables `device()` after the standard 6KRO keyboard, which stays
+# first so BIOS/boot-protocol hosts and `adafruit_hid.Keyboard` keep working
+# and is used as the fallback when the bitmap keyboard is not there. Keycodes
+# past the bitmap (international and LANG keys, 0x80 and up) go out on the
+# boot keyboard, whose report takes any keycode.
+#
+REPORT_ID = 4             # KEYBOARD, MOUSE and CONSUMER_CONTROL use 1-3
+KEYCODES = 128            # bitmap covers keycodes 0x00-0x7F
+REPORT_LENGTH = 1 + KEYCODES // 8
+
+REPORT_DESCRIPTOR = bytes((
+    0x05, 0x01,           # Usage Page (Generic Desktop)
+    0x09, 0x06,           # Usage (Keyboard)
+    0xA1, 0x01,           # Collection (Application)
+    0x85, REPORT_ID,      #   Report ID
+    0x05, 0x07,           #   Usage Page (Keyboard/Keypad)
+    0x19, 0xE0,           #   Usage Minimum (Left Control)
+    0x29, 0xE7,           #   Usage Maximum (Right GUI)
+    0x15, 0x00,           #   Logical Minimum (0)
+    0x25, 0x01,           #   Logical Maximum (1)
+    0x75, 0x01,           #   Report Size (1)
+    0x95, 0x08,           #   Report Count (8)
+    0x81, 0x02,           #   Input (Data, Variable, Absolute): modifiers
+    0x19, 0x00,           #   Usage Minimum (0)
+    0x29, KEYCODES - 1,   #   Usage Maximum (0x7F)
+    0x95, KEYCODES,       #   Report Count (128)
+    0x81, 0x02,           #   Input (Data, Variable, Absolute): key bitmap
+    0xC0,                 # End Collection
+))
+
+
+def device():
+    """The usb_hid.Device to pass to usb_hid.enable() in boot.py."""
+    import usb_hid
+    return usb_hid.Device(
+        report_descriptor=REPORT_DESCRIPTOR,
+        usage_page=0x01,
+        usage=0x06,
+        report_ids=(REPORT_ID,),
+        in_report_lengths=(REPORT_LENGTH,),
+        out_report_lengths=(0,),
+    )
+
+
+def find_device(devices):
+    """The enabled bitmap keyboard, or None to fall back to 6KRO."""
+    import usb_hid
+    for dev in devices:
+        if dev.usage_page != 0x01 or dev.usage != 0x06:
+            continue
+        ## Both keyboards share the usage; the boot keyboard is the stock device
+        if dev is usb_hid.Device.KEYBOARD:
+            continue
+        return dev
+    return None
+
+
+def encode(modifiers, keycodes):
+    """Bitmap report; keycodes from KEYCODES up are left out (see `overflow`)."""
+    report = bytearray(REPORT_LENGTH)
+    report[0] = modifiers
+    for keycode in keycodes:
+        if keycode < KEYCODES:
+            report[1 + (keycode >> 3)] |= 1 << (keycode & 7)
+    return report
+
+
+def overflow(keycodes):
+    """The keycodes the bitmap can't carry."""
+    return tuple(keycode for keycode in keycodes if keycode >= KEYCODES)
+
+
+class NKROKeyboard:
+    """
+    Handle on the bitmap keyboard device. hid_reports.ReportWriter builds
+    the reports with `encode()`; this only tells it which device and
+    report format to use, and which device (`boot_device`, the 6KRO
+    keyboard) takes the keycodes past the bitmap.
+    """
+
+    def __init__(self, device, boot_device=None):
+        self._keyboard_device = device
+        self.boot_device = boot_device
@@ -0,0 +1,81 @@
+# SPDX-FileCopyrightText: Raul Martinez Zabala 2025
+# SPDX-License-Identifier: MIT
+#
+# Type text payloads straight over USB HID using adafruit_hid layout tables.
+#
+# Every character is turned once into the keyboard report states that type
+# it (key down with its modifiers, then all-up; dead keys add a second
+# pair), and cached per layout. Typing then is just sending those states
+# through the ReportWriter, optionally spaced by `pacing` seconds.
+#
+import time
+
+from hid_reports import EMPTY
+
+SHIFT_BIT = 0x02      # Left shift in the modifier byte
+ALTGR_BIT = 0x40      # Right alt in the modifier byte
+
+
+def key_state(keycode, altgr=False):
+    modifiers = ALTGR_BIT if altgr else 0
+    if keycode & 0x80:
+        modifiers |= SHIFT_BIT
+        keycode &= 0x7F
+    return (modifiers, (keycode,))
+
+
+def char_states(layout, char):
+    """Report states typing `char` on `layout`, or None if it has no keys."""
+    keycode = layout._char_to_keycode(char)
+    if keycode:
+        return (key_state(keycode, char in layout.NEED_ALTGR), EMPTY)
+    combined = layout.COMBINED_KEYS.get(ord(char))
+    if combined is None:
+        return None
+    dead = key_state(combined >> 8, bool(combined & layout.ALTGR_FLAG))
+    second = chr(combined & 0x7F)
+    keycode = layout._char_to_keycode(second)
+    if not keycode:
+        return None
+    return (dead, EMPTY, key_state(keycode), EMPTY)
+
+
+class TextTyper:
+    def __init__(self, writer, layouts, pacing=0.001):
+        self.writer = writer
+        ## Only the tables are used, the layouts never write themselves
+        self.layouts = {name: cls(None) for name, cls in layouts.items()}
+        self.layout_name = next(iter(layouts))
+        self.pacing = pacing
+        self._cache = {}
+
+    def select(self, name):
+        if name in self.layouts and name != self.layout_name:
+            self.layout_name = name
+            self._cache = {}
+
+    def states(self, char):
+        states = self._cache.get(char)
+        if states is None:
+            states = char_states(self.layouts[self.layout_name], char) or ()
+            if not states:
+                print(f"No keys for {char!r} on layout {self.layout_name}")
+            for state in states:
+                self.writer.encode(state)
+            self._cache[char] = states
+        return states
+
+    def prepare(self, text):
+        for char in text:
+            self.states(char)
+
+    def write(self, text):
+        send = self.writer.send
+        pacing = self.pacing
+        ## Start from a clean report so held modifiers don't change the text
+        send(EMPTY)
+        for char in text:
+            for state in self.states(char):
+                send(state)
+                if pacing:
+                    time.sleep(pacing)
@@ -0,0 +1,162 @@
+"""
+Local control channel of the daemon, which also keeps it single-instance.
+
+The daemon listens on a named pipe (Windows) or Unix socket (elsewhere)
+private to the user. Owning that address is the instance lock: a second
+launch finds it taken, hands its command to the running daemon and exits,
+or asks it to quit and takes the address over. Nothing scans the process
+list, so this costs the same however many processes are running.
+
+Requests are one JSON object per connection, {"command": name, "args":
+{...}}, answered with {"ok": true, "result": ...} or {"ok": false,
+"error": message}. Raw bytes frames, never pickle, so a peer cannot make
+the daemon run code.
+
+    CONTROL = ControlServer(default_address())
+    if not CONTROL.bind():
+        request(CONTROL.address, "shutdown")
+    CONTROL.handle("stats", lambda: METRICS.snapshot())
+    CONTROL.start()
+"""
+
+import errno
+import getpass
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+FAMILY = "AF_PIPE" if sys.platform == "win32" else "AF_UNIX"
+
+
+def default_address(name="macropad-daemon"):
+    """Pipe or socket path for `name`, one per user."""
+    user = getpass.getuser()
+    if FAMILY == "AF_PIPE":
+        return rf"\\.\pipe\{name}-{user}"
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(directory, f"{name}-{user}.sock")
+
+
+def request(address, command, timeout=5.0, **args):
+    """
+    Send `command` to the daemon at `address` and return its result.
+
+    Raises ConnectionError when no daemon is listening, TimeoutError when it
+    does not answer in `timeout` seconds and RuntimeError with the daemon's
+    message when the command failed.
+    """
+    try:
+        connection = Client(address, FAMILY)
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        raise ConnectionError(f"no daemon at {address}") from e
+    with connection:
+        connection.send_bytes(json.dumps({"command": command, "args": args}).encode())
+        if not connection.poll(timeout):
+            raise TimeoutError(f"{command}: no answer in {timeout:g} s")
+        reply = json.loads(connection.recv_bytes())
+    if not reply.get("ok"):
+        raise RuntimeError(reply.get("error", "failed"))
+    return reply.get("result")
+
+
+class ControlServer:
+    """
+    :param address: pipe name or socket path (`default_address()`)
+    :param log: called with a message for failed requests
+    """
+
+    def __init__(self, address, log=print):
+        self.address = address
+        self.log = log
+        self._handlers = {}
+        self._listener = None
+        self._thread = None
+        self._closed = False
+
+    def handle(self, command, callback):
+        """Answer `command` with `callback(**args)`; its return value must be JSON-able."""
+        self._handlers[command] = callback
+
+    def bind(self):
+        """Take the address; False if another instance holds it."""
+        try:
+            self._listener = Listener(self.address, FAMILY)
+        except OSError as e:
+            if FAMILY == "AF_PIPE" or e.errno != errno.EADDRINUSE:
+                return False
+            ## A socket file left by a crash: take it over if nobody answers
+            try:
+                Client(self.address, FAMILY).close()
+                return False
+            except (FileNotFoundError, ConnectionRefusedError):
+                os.unlink(self.address)
+            self._listener = Listener(self.address, FAMILY)
+        return True
+
+    def take_over(self, timeout=5.0):
+        """Ask the running instance to quit and bind once it has; False on timeout."""
+        try:
+            request(self.address, "shutdown", timeout=timeout)
+        except (ConnectionError, TimeoutError, RuntimeError):
+            pass
+        deadline = time.monotonic() + timeout
+        while not self.bind():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.02)
+        return True
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="control", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            try:
+                connection = self._listener.accept()
+            except OSError:
+                if self._closed:
+                    return
+                continue
+            if self._closed:
+                connection.close()
+                return
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection):
+        with connection:
+            try:
+                message = json.loads(connection.recv_bytes())
+                command = message["command"]
+            except (EOFError, OSError, ValueError, KeyError, TypeError):
+                return
+            handler = self._handlers.get(command)
+            if handler is None:
+                reply = {"ok": False, "error": f"unknown command {command!r}"}
+            else:
+                try:
+                    reply = {"ok": True, "result": handler(**message.get("args", {}))}
+                except Exception as e:
+                    self.log(f"Control {command} failed: {e}")
+                    reply = {"ok": False, "error": str(e)}
+            try:
+                connection.send_bytes(json.dumps(reply, default=str).encode())
+            except OSError:
+                pass
+
+    def close(self):
+        """Stop listening and free the address for the next instance."""
+        if self._closed or self._listener is None:
+            return
+        self._closed = True
+        if self._thread is not None:
+            ## accept() does not notice close() on every platform: wake it up
+            try:
+                Client(self.address, FAMILY).close()
+            except OSError:
+                pass
+        self._listener.close()
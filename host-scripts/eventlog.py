@@ -0,0 +1,200 @@
+"""
+Leveled, structured event log for the daemon.
+
+A log call checks the level and appends (time, level, event, fields) to a
+bounded ring buffer; that is all the calling thread pays. A background
+thread drains the ring every `flush_interval` seconds, writing one compact
+JSON object per line to a size-rotated file (`path`, `path.1` ...
+`path.<backups>`) and, with `echo`, a short line to the console. When the
+writer falls behind the oldest events are dropped and counted, the hot path
+never blocks on I/O.
+
+    LOG = EventLog("./daemon.log", level=INFO)
+    LOG.start()
+    LOG.debug("config.match", pattern=clave, window=title)   # ~free when disabled
+    LayoutSwitcher(backend, log=LOG.channel("layout"))       # for log=print style callers
+"""
+
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+_LETTERS = {DEBUG: "D", INFO: "I", WARNING: "W", ERROR: "E"}
+
+
+def level_of(value):
+    """Level number from a name ("info") or number."""
+    if isinstance(value, str):
+        return LEVELS[value.lower()]
+    return int(value)
+
+
+class EventLog:
+    """
+    :param path: log file, None for console only
+    :param level: lowest level recorded
+    :param capacity: events buffered between flushes before the oldest are dropped
+    :param flush_interval: seconds between background flushes
+    :param max_bytes: rotate the file when it grows past this size
+    :param backups: rotated files kept
+    :param echo: also print events to the console
+    :param history: formatted lines kept in memory for `recent()`
+    """
+
+    def __init__(self, path=None, level=INFO, capacity=4096, flush_interval=1.0,
+                 max_bytes=1_000_000, backups=3, echo=True, history=200):
+        self.path = path
+        self.level = level_of(level)
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.echo = echo
+        self.capacity = capacity
+        self.dropped = 0
+        self._ring = collections.deque(maxlen=capacity)
+        self._history = collections.deque(maxlen=history)
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = False
+        self._closed = False
+        self._thread = None
+        self._file = None
+
+    def enabled(self, level):
+        """Guard for events whose fields are expensive to build."""
+        return level >= self.level
+
+    def _append(self, level, event, fields):
+        if self._closed:
+            print(self._console(time.time(), level, event, fields))
+            return
+        if len(self._ring) >= self.capacity:
+            self.dropped += 1
+        self._ring.append((time.time(), level, event, fields))
+
+    def log(self, level, event, **fields):
+        if level >= self.level:
+            self._append(level, event, fields)
+
+    def debug(self, event, **fields):
+        if DEBUG >= self.level:
+            self._append(DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        if INFO >= self.level:
+            self._append(INFO, event, fields)
+
+    def warning(self, event, **fields):
+        if WARNING >= self.level:
+            self._append(WARNING, event, fields)
+
+    def error(self, event, **fields):
+        self._append(ERROR, event, fields)
+
+    def channel(self, source, level=INFO):
+        """A `log(message)` callable for components taking `log=print`."""
+        def log(message):
+            if level >= self.level:
+                self._append(level, source, {"msg": message})
+        return log
+
+    def recent(self, count=50):
+        """Last `count` flushed lines, oldest first."""
+        self.flush()
+        return list(self._history)[-count:]
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far."""
+        with self._write_lock:
+            records = []
+            while self._ring:
+                try:
+                    records.append(self._ring.popleft())
+                except IndexError:
+                    break
+            if self.dropped:
+                records.append((time.time(), WARNING, "log.dropped", {"count": self.dropped}))
+                self.dropped = 0
+            if not records:
+                return
+            lines = [self._format(*record) for record in records]
+            self._history.extend(lines)
+            if self.echo:
+                for record in records:
+                    print(self._console(*record))
+            if self.path and not self._closed:
+                self._write(lines)
+
+    @staticmethod
+    def _format(timestamp, level, event, fields):
+        record = {"t": round(timestamp, 3), "l": _LETTERS.get(level, str(level)), "e": event}
+        record.update(fields)
+        return json.dumps(record, separators=(',', ':'), ensure_ascii=False, default=str)
+
+    @staticmethod
+    def _console(timestamp, level, event, fields):
+        clock = time.strftime("%H:%M:%S", time.localtime(timestamp))
+        details = " ".join(f"{key}={value}" for key, value in fields.items())
+        return f"{clock} {_LETTERS.get(level, level)} {event} {details}".rstrip()
+
+    def _write(self, lines):
+        try:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write('\n'.join(lines) + '\n')
+            self._file.flush()
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+        except OSError as e:
+            print(f"Error escribiendo {self.path}: {e}", file=sys.stderr)
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def close(self):
+        """
+        Stop the flush thread and write what is left. Events logged after
+        this are printed to the console straight away, echo or not, and
+        never written: the file may already belong to the next instance.
+        """
+        self._stop = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._closed = True
@@ -0,0 +1,174 @@
+"""
+Queued file renames for recordings the recorder may still be holding.
+
+Jobs are retried off the caller's thread with exponential backoff until the
+source can be moved, and every pending job is kept in a small JSON journal
+so a daemon restart picks them up again. Callers that need the source path
+free again (the next recording writes to the same file) can chain work with
+`when_released()` instead of waiting.
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+
+import jsonfile
+
+
+class FileHandoff:
+    """
+    :param journal: path of the JSON journal of pending jobs
+    :param initial_delay: seconds before the first retry
+    :param max_delay: cap for the exponential backoff
+    :param max_attempts: failed attempts before a job is given up (None to
+                         retry forever); its `when_released` callbacks still
+                         run, so the pipeline waiting on the source moves on
+    :param on_failed: called as on_failed(job) when a job is given up
+    """
+
+    def __init__(self, journal, initial_delay=0.25, max_delay=30.0, max_attempts=20, on_failed=None,
+                 log=print):
+        self.journal = journal
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.on_failed = on_failed
+        self.log = log
+        self._cond = threading.Condition()
+        self._heap = []                 # (next_attempt, seq, job id)
+        self._jobs = {}                 # job id -> job dict
+        self._waiters = {}              # source -> [callbacks]
+        self._seq = itertools.count()
+        self._thread = None
+
+    def start(self):
+        """Reload journaled jobs and start the worker thread."""
+        for job in jsonfile.read(self.journal, []) or []:
+            self._enqueue(job, persist=False)
+        if self._jobs:
+            self.log(f"Reanudando {len(self._jobs)} renombrados pendientes")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, source, target):
+        """Queue moving `source` to `target`; returns the job id."""
+        job = {
+            "id": f"{int(time.time() * 1000)}-{next(self._seq)}",
+            "source": source,
+            "target": target,
+            "attempts": 0,
+        }
+        self._enqueue(job)
+        return job["id"]
+
+    def pending(self, source=None):
+        with self._cond:
+            return [dict(job) for job in self._jobs.values() if source is None or job["source"] == source]
+
+    def when_released(self, source, callback):
+        """Run `callback` once no queued job still has to move `source`."""
+        with self._cond:
+            busy = any(job["source"] == source for job in self._jobs.values())
+            if busy:
+                self._waiters.setdefault(source, []).append(callback)
+        if not busy:
+            callback()
+
+    def _enqueue(self, job, persist=True):
+        with self._cond:
+            self._jobs[job["id"]] = job
+            heapq.heappush(self._heap, (time.monotonic(), next(self._seq), job["id"]))
+            if persist:
+                self._save()
+            self._cond.notify()
+
+    def _save(self):
+        try:
+            jsonfile.write_atomic(self.journal, list(self._jobs.values()))
+        except OSError as e:
+            self.log(f"Error guardando journal {self.journal}: {e}")
+
+    def _backoff(self, attempts):
+        return min(self.max_delay, self.initial_delay * (2 ** max(0, attempts - 1)))
+
+    @staticmethod
+    def _free_target(target):
+        if not os.path.exists(target):
+            return target
+        root, ext = os.path.splitext(target)
+        for n in itertools.count(1):
+            candidate = f"{root}_{n}{ext}"
+            if not os.path.exists(candidate):
+                return candidate
+
+    def _attempt(self, job):
+        """
+        None when the job is finished (moved or nothing left to move), else
+        the OSError that kept the source from being renamed.
+        """
+        source = job["source"]
+        if not os.path.exists(source):
+            self.log(f"Nada que renombrar: {source} ya no existe")
+            return None
+        target = self._free_target(job["target"])
+        os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+        try:
+            os.replace(source, target)
+        except OSError as e:
+            return e
+        self.log(f"Recording file renamed successfully: {target}")
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._cond.wait(timeout)
+                _, _, job_id = heapq.heappop(self._heap)
+                job = self._jobs.get(job_id)
+            if job is None:
+                continue
+
+            rename_error = None
+            try:
+                rename_error = self._attempt(job)
+                done = rename_error is None
+            except Exception as e:
+                self.log(f"Error renombrando {job['source']}: {e}")
+                done = False
+
+            ## attempts is part of the journaled job, only touch it under the lock
+            callbacks = []
+            gave_up = False
+            with self._cond:
+                if not done:
+                    job["attempts"] += 1
+                    attempts = job["attempts"]
+                    gave_up = self.max_attempts is not None and attempts >= self.max_attempts
+                if done or gave_up:
+                    del self._jobs[job_id]
+                    if not any(j["source"] == job["source"] for j in self._jobs.values()):
+                        callbacks = self._waiters.pop(job["source"], [])
+                else:
+                    retry_at = time.monotonic() + self._backoff(attempts)
+                    heapq.heappush(self._heap, (retry_at, next(self._seq), job_id))
+                self._save()
+
+            if rename_error is not None:
+                self.log(f"Could not rename ({attempts}): {rename_error}")
+            if gave_up:
+                self.log(f"Giving up on {job['source']} -> {job['target']} after {attempts} attempts")
+                if self.on_failed is not None:
+                    try:
+                        self.on_failed(dict(job))
+                    except Exception as e:
+                        self.log(f"Error tras abandonar {job['source']}: {e}")
+
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    self.log(f"Error tras renombrar {job['source']}: {e}")
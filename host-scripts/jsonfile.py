@@ -0,0 +1,33 @@
+"""
+Small JSON file helpers shared by the daemon's persistent state.
+"""
+
+import json
+import os
+import tempfile
+
+
+def write_atomic(path, data):
+    """Write `data` as compact JSON to `path` via temp file + rename."""
+    directory = os.path.dirname(os.path.abspath(path))
+    name = os.path.basename(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as file:
+            json.dump(data, file, separators=(',', ':'))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def read(path, default=None):
+    """Parsed JSON from `path`, or `default` if missing or unreadable."""
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return default
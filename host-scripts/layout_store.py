@@ -0,0 +1,178 @@
+"""
+Write-behind persistence for the per-application keyboard layouts.
+
+Reads and updates only touch memory. Changes are flushed by a debounce
+timer (and at shutdown) with an atomic temp-file + rename, in compact JSON
+with `last_used` as epoch seconds. Entries older than `drop_days` are pruned
+on every flush and ignored on lookup, so the file does not depend on a
+restart to shrink.
+"""
+
+import datetime
+import json
+import os
+import threading
+import time
+
+import jsonfile
+
+
+def _to_epoch(value):
+    """Accepts epoch numbers and the ISO strings older files used."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class LayoutStore:
+    """
+    :param path: JSON file holding {app: {"layout": hkl, "last_used": epoch}}
+    :param drop_days: forget apps not used for this many days
+    :param debounce: seconds to batch changes before writing
+    :param persist: when False nothing is ever written
+    """
+
+    def __init__(self, path, drop_days=30, debounce=5.0, persist=True, log=print):
+        self.path = path
+        self.drop_seconds = drop_days * 24 * 3600
+        self.debounce = debounce
+        self.persist = persist
+        self.log = log
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._layouts = {}
+        self._dirty = False
+        self._timer = None
+        self._closed = False
+
+    def load(self):
+        if not self.persist or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            self.log(f"Error cargando {self.path}: {e}")
+            return
+
+        layouts = {}
+        for app, entry in data.items():
+            last_used = _to_epoch(entry.get('last_used'))
+            if last_used is not None:
+                layouts[app] = {"layout": entry.get('layout'), "last_used": last_used}
+        with self._lock:
+            self._layouts = layouts
+            dropped = self._prune(time.time())
+        if dropped:
+            self._schedule()
+
+    def _prune(self, now):
+        cutoff = now - self.drop_seconds
+        expired = [app for app, entry in self._layouts.items() if entry['last_used'] < cutoff]
+        for app in expired:
+            del self._layouts[app]
+        if expired:
+            self._dirty = True
+        return len(expired)
+
+    def _expired(self, entry, now):
+        return entry['last_used'] < now - self.drop_seconds
+
+    def get(self, app):
+        """Stored layout for `app` (None if unknown or expired), bumping last_used."""
+        now = time.time()
+        with self._lock:
+            entry = self._layouts.get(app)
+            if entry is None or self._expired(entry, now):
+                return None
+            entry['last_used'] = now
+            self._dirty = True
+        self._schedule()
+        return entry['layout']
+
+    def set(self, app, layout):
+        """Store `layout` for `app`; returns True if it changed."""
+        now = time.time()
+        with self._lock:
+            entry = self._layouts.get(app)
+            changed = entry is None or entry['layout'] != layout
+            self._layouts[app] = {"layout": layout, "last_used": now}
+            self._dirty = True
+        self._schedule()
+        return changed
+
+    def setdefault(self, app, layout):
+        """Layout for `app`, storing `layout` first if there is none."""
+        current = self.get(app)
+        if current is None:
+            self.set(app, layout)
+            return layout
+        return current
+
+    def snapshot(self):
+        with self._lock:
+            return {app: dict(entry) for app, entry in self._layouts.items()}
+
+    def _schedule(self):
+        ## Batch: a pending timer already covers this change
+        if not self.persist:
+            return
+        with self._lock:
+            if self._timer is not None or self._closed:
+                return
+            self._timer = threading.Timer(self.debounce, self._timer_flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _timer_flush(self):
+        with self._lock:
+            self._timer = None
+        self.flush()
+
+    def flush(self):
+        """Write pending changes now, atomically; nothing once closed."""
+        if not self.persist:
+            return
+        with self._write_lock:
+            ## Checked under the write lock: a timer flush racing close() stands down
+            if self._closed:
+                return
+            self._flush()
+
+    def _flush(self):
+        with self._lock:
+            self._prune(time.time())
+            if not self._dirty:
+                return
+            data = {
+                app: {"layout": entry['layout'], "last_used": int(entry['last_used'])}
+                for app, entry in self._layouts.items()
+            }
+            self._dirty = False
+
+        try:
+            jsonfile.write_atomic(self.path, data)
+        except OSError as e:
+            self.log(f"Error guardando {self.path}: {e}")
+            with self._lock:
+                self._dirty = True
+
+    def close(self):
+        """
+        Cancel the debounce timer and flush whatever is pending, for the last
+        time: later changes stay in memory, the file may already belong to
+        the next instance.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        if self.persist:
+            with self._write_lock:
+                self._flush()
@@ -0,0 +1,125 @@
+"""
+Keyboard layout switching.
+
+Instead of cycling with windows+space until the right layout shows up, the
+switcher asks the foreground window for the exact HKL it needs and then
+confirms the change with a short bounded poll. The OS access lives in a
+backend object so the engine can run against `FakeLayoutBackend` off
+Windows.
+"""
+
+import time
+from collections import deque
+
+WM_INPUTLANGCHANGEREQUEST = 0x0050
+KLF_NOTELLSHELL = 0x00000080
+
+
+class Win32LayoutBackend:
+    """Reads and requests the layout of the foreground window's thread."""
+
+    def __init__(self):
+        import ctypes
+        self.ctypes = ctypes
+        self.user32 = ctypes.windll.user32
+        self._loaded = set()
+
+    def current(self):
+        hwnd = self.user32.GetForegroundWindow()
+        thread_id = self.user32.GetWindowThreadProcessId(hwnd, None)
+        return self.user32.GetKeyboardLayout(thread_id) & 0xFFFFFFFF
+
+    def _ensure_loaded(self, hkl):
+        ## Layouts from config.json are normally installed already, this
+        ## only matters the first time a layout is used after login
+        if hkl in self._loaded:
+            return
+        installed = (self.ctypes.c_void_p * 64)()
+        count = self.user32.GetKeyboardLayoutList(64, installed)
+        if hkl not in {(installed[i] or 0) & 0xFFFFFFFF for i in range(count)}:
+            layout_id = (hkl >> 16) & 0xFFFF
+            if layout_id < 0xF000:  # device-specific HKLs have no plain KLID
+                self.user32.LoadKeyboardLayoutW(f"{layout_id:08X}", KLF_NOTELLSHELL)
+        self._loaded.add(hkl)
+
+    def request(self, hkl):
+        self._ensure_loaded(hkl)
+        hwnd = self.user32.GetForegroundWindow()
+        if not hwnd:
+            return False
+        return bool(self.user32.PostMessageW(hwnd, WM_INPUTLANGCHANGEREQUEST, 0, self.ctypes.c_ssize_t(hkl)))
+
+
+class FakeLayoutBackend:
+    """
+    In-memory backend: `request()` takes effect after `apply_delay`
+    seconds, or never if `ignore` is set (like Notepad sometimes does).
+    """
+
+    def __init__(self, initial=0, apply_delay=0.0, ignore=False):
+        self.layout = initial
+        self.apply_delay = apply_delay
+        self.ignore = ignore
+        self.requests = []
+        self._pending = None
+
+    def current(self):
+        if self._pending and time.monotonic() >= self._pending[1]:
+            self.layout = self._pending[0]
+            self._pending = None
+        return self.layout
+
+    def request(self, hkl):
+        self.requests.append(hkl)
+        if not self.ignore:
+            self._pending = (hkl, time.monotonic() + self.apply_delay)
+        return True
+
+
+class LayoutSwitcher:
+    """
+    Switches to a target HKL and reports how long the change took.
+
+    :param backend: object with `current()` and `request(hkl)`
+    :param timeout: max seconds to wait for the switch to be confirmed
+    :param poll_interval: seconds between confirmation reads
+    """
+
+    def __init__(self, backend, timeout=0.25, poll_interval=0.005, log=print, history=100):
+        self.backend = backend
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.log = log
+        self.latencies = deque(maxlen=history)
+        self.misses = 0
+
+    def current(self):
+        return self.backend.current()
+
+    def switch(self, required):
+        """Activate `required`; returns True once the layout is confirmed."""
+        if required is None:
+            return True
+
+        start = time.monotonic()
+        starting = self.backend.current()
+        if starting == required:
+            return True
+
+        self.backend.request(required)
+
+        deadline = start + self.timeout
+        resulting = self.backend.current()
+        while resulting != required and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            resulting = self.backend.current()
+
+        latency = time.monotonic() - start
+        if resulting != required:
+            self.misses += 1
+            self.log(f"Layout missed from {hex(starting)} to {hex(resulting)} seeking {hex(required)} ({latency * 1000:.1f} ms)")
+            return False
+
+        self.latencies.append(latency)
+        self.log(f"Switched layout from {hex(starting)} to {hex(resulting)} in {latency * 1000:.1f} ms")
+        return True
@@ -0,0 +1,89 @@
+"""
+Command line for the running macro-daemon.py, through its control pipe.
+
+    python macro-ctl.py stats
+    python macro-ctl.py metrics [--export]
+    python macro-ctl.py reload
+    python macro-ctl.py profiles [--program "Visual Studio Code"] [--device left]
+    python macro-ctl.py message "TOGGLE:mute" [--pad left] [--field key=value ...]
+    python macro-ctl.py focus code.exe [--no-layout]
+    python macro-ctl.py bench [--count 1000] [--pad bench]
+    python macro-ctl.py restart
+
+Messages go to a virtual pad (no hardware, dropped afterwards) unless --pad
+names a connected one; bench looks profiles up for --pad's name without
+sending anything. An injected focus lasts until the real focus moves.
+The answer is printed as JSON; the exit status is 1 if the daemon is not
+running or the command failed.
+"""
+
+import argparse
+import json
+import sys
+
+import control
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Control the running macropad daemon.")
+    parser.add_argument("--address", default=control.default_address(), help="control pipe or socket")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for the answer")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("stats", help="active app, pads, metrics and startup report")
+    metrics = commands.add_parser("metrics", help="latency histograms")
+    metrics.add_argument("--export", action="store_true", help="also write metrics.json now")
+    commands.add_parser("reload", help="re-read config.json and zones.json, resend the pads")
+    profiles = commands.add_parser("profiles", help="profile table, or one app's merged config")
+    profiles.add_argument("--program")
+    profiles.add_argument("--device")
+    message = commands.add_parser("message", help="handle a pad message, e.g. TOGGLE:mute")
+    message.add_argument("code")
+    message.add_argument("--pad", default="virtual")
+    message.add_argument("--field", action="append", default=[], metavar="KEY=VALUE",
+                         help="extra message field (value parsed as JSON when it can be)")
+    focus = commands.add_parser("focus", help="switch to an app as if it had taken the focus")
+    focus.add_argument("program")
+    focus.add_argument("--no-layout", dest="layout", action="store_false", help="leave the keyboard layout alone")
+    bench = commands.add_parser("bench", help="time config lookup and serialization")
+    bench.add_argument("--count", type=int, default=200)
+    bench.add_argument("--pad", default="bench")
+    commands.add_parser("restart", help="start a fresh daemon, which takes over")
+    return parser.parse_args(argv)
+
+
+def field_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    options = {}
+    if args.command == "metrics":
+        options = {"export": args.export}
+    elif args.command == "profiles":
+        options = {"program": args.program, "device": args.device}
+    elif args.command == "message":
+        options = {"code": args.code, "pad": args.pad}
+        for field in args.field:
+            key, _, value = field.partition("=")
+            options[key] = field_value(value)
+    elif args.command == "focus":
+        options = {"program": args.program, "layout": args.layout}
+    elif args.command == "bench":
+        options = {"count": args.count, "pad": args.pad}
+
+    try:
+        result = control.request(args.address, args.command, timeout=args.timeout, **options)
+    except (ConnectionError, TimeoutError, RuntimeError) as e:
+        print(f"{args.command}: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(result, indent=2, ensure_ascii=False, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
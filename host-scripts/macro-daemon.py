@@ -1,66 +1,173 @@
-import os
-import sys
-
-import serial
-import time
-import pystray
-from pystray import MenuItem as item, Icon
-from PIL import Image
-import threading
-import pygetwindow as gw
-
-import win32api
-import win32gui
-import win32con
-import win32process
-
-import json
-import re
-from pathlib import Path
-import datetime
-import subprocess
-import keyboard
-
-import ctypes
-import psutil
-import uuid
-import traceback
-import socket
+## Startup timeline first, so the imports below are timed too. Only what the
+## first config needs is imported here: the tray (pystray, PIL) is loaded once
+## the pad is synced, and process names come from Win32 rather than psutil.
+from startup import Startup
+STARTUP = Startup()
+
+with STARTUP.importing("stdlib"):
+    import os
+    import sys
+    import time
+    import threading
+    import json
+    import re
+    from pathlib import Path
+    import datetime
+    import subprocess
+    import ctypes
+    import ctypes.wintypes
+    import uuid
+    import traceback
+    import socket
+    import atexit
+    import queue
+
+## Single instance: owning the control pipe is the lock. A second launch hands
+## its command to the running daemon and exits, or without one asks it to quit
+## and takes over; either way before the heavy imports below.
+import control
+CONTROL = control.ControlServer(control.default_address())
+CONTROL_COMMANDS = ("restart", "reload", "stats")
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in CONTROL_COMMANDS:
+        try:
+            print(json.dumps(control.request(CONTROL.address, sys.argv[1]), indent=2))
+        except (ConnectionError, TimeoutError, RuntimeError) as e:
+            print(f"{sys.argv[1]}: {e}")
+            sys.exit(1)
+        sys.exit(0)
+    if not CONTROL.bind() and not CONTROL.take_over():
+        print(f"La instancia en marcha no libera {CONTROL.address}")
+        sys.exit(1)
+    STARTUP.mark("instance")
+
+with STARTUP.importing("serial"):
+    import serial
+    import serial.tools.list_ports
+
+with STARTUP.importing("win32"):
+    import win32api
+    import win32gui
+    import win32con
+    import win32process
+
+with STARTUP.importing("daemon"):
+    from zone_engine import ZoneEngine
+    from layout_switch import LayoutSwitcher, Win32LayoutBackend
+    from layout_store import LayoutStore
+    import meeting_detector
+    from meeting_detector import MeetingDetector, chat_title
+    from file_handoff import FileHandoff
+    from sequences import SequenceRunner, KeyboardBackend
+    from text_injection import TextInjector, SendInputBackend, Win32Clipboard
+    from metrics import Metrics
+    import eventlog
+    from eventlog import EventLog
+    from pad_devices import PadManager
+    import jsonfile
+STARTUP.mark("imports")
+
 
 base_path = Path(sys.argv[0]).resolve().parent
 os.chdir(base_path)
 
 latest_uuid = None
-was_teams_running = False
-serial_port = None
-
-APP_OVERRIDES = {}
-ZONE_DEFINITIONS = {}
-MONITOR_ALIASES = {}
-BORDER_OFFSET = {}
-HARDWARE_ID_MAP = {}
+
+## Daemon settings (paths and tunables), defaults overridden by daemon.json
+DAEMON_SETTINGS_FILE = "./daemon.json"
+DAEMON_SETTINGS = {
+    "recording": {
+        "source": "c:\\Users\\raul.mzabala\\Videos\\latest.mp4",
+        "target_dir": "c:\\Users\\raul.mzabala\\Videos\\Captures",
+        "journal": "./recording_jobs.json",
+        "max_attempts": 20
+    },
+    ## Timed key sequences, see sequences.py for the step format
+    "sequences": {},
+    ## MSG:TYPE injection: strings this long or longer are pasted
+    "typing": {
+        "paste_threshold": 200,
+        "batch_size": 512
+    },
+    ## Event log: "debug" adds config matches, pad messages and process checks
+    "log": {
+        "file": "./daemon.log",
+        "level": "info",
+        "max_bytes": 1000000,
+        "backups": 3,
+        "echo": True
+    },
+    ## Macropads: USB ids to look for, names by serial number (board UID) for
+    ## config.json "device" filters, ports to open regardless (e.g. "COM4")
+    "pads": {
+        "usb_ids": ["32AC:*", "239A:*"],
+        "names": {},
+        "ports": [],
+        "baudrate": 115200,
+        "scan_interval": 2,
+        "retry_min": 0.05
+    },
+    ## Latency histograms, exported every `interval` seconds to `file`
+    "metrics": {
+        "enabled": True,
+        "file": "./metrics.json",
+        "interval": 30
+    }
+}
+for section, values in (jsonfile.read(DAEMON_SETTINGS_FILE, {}) or {}).items():
+    if isinstance(values, dict):
+        DAEMON_SETTINGS.setdefault(section, {}).update(values)
+    else:
+        DAEMON_SETTINGS[section] = values
+
+## Structured event log: ring buffer flushed to a rotating file off the hot path
+LOG_SETTINGS = DAEMON_SETTINGS["log"]
+LOG = EventLog(
+    LOG_SETTINGS["file"], level=LOG_SETTINGS["level"],
+    max_bytes=LOG_SETTINGS["max_bytes"], backups=LOG_SETTINGS["backups"], echo=LOG_SETTINGS["echo"])
+LOG.start()
+CONTROL.log = LOG.channel("control", eventlog.WARNING)
+
+ZONE_ENGINE = ZoneEngine("zones.json", socket.gethostname())
+LAYOUT_SWITCHER = LayoutSwitcher(Win32LayoutBackend(), log=LOG.channel("layout"))
 TEAMS_TOP = 0
 TEAMS_LEFT = 0
 LAYOUT_DROP_DAYS = 30
 
-## Load app layouts from json file
+## App layouts, kept in memory and written behind to json file
 PERSIST_APP_LAYOUTS = True
 APP_LAYOUTS_FILE = "./app_layouts.json"
-
-if PERSIST_APP_LAYOUTS and os.path.exists(APP_LAYOUTS_FILE):
-    with open(APP_LAYOUTS_FILE, 'r') as file:
-        APP_LAYOUTS = json.load(file)
-        ## Remove layouts not used in the last 30 days
-        cutoff_date = datetime.datetime.now() - datetime.timedelta(days=LAYOUT_DROP_DAYS)
-        APP_LAYOUTS = {app: data for app, data in APP_LAYOUTS.items() if 'last_used' in data and datetime.datetime.fromisoformat(data['last_used']) >= cutoff_date}
-else:
-    APP_LAYOUTS = {}
+APP_LAYOUTS = LayoutStore(APP_LAYOUTS_FILE, drop_days=LAYOUT_DROP_DAYS, persist=PERSIST_APP_LAYOUTS,
+                          log=LOG.channel("app_layouts", eventlog.WARNING))
+APP_LAYOUTS.load()
+
+RECORDING = DAEMON_SETTINGS["recording"]
+RECORDING_HANDOFF = FileHandoff(
+    RECORDING["journal"], max_attempts=RECORDING["max_attempts"],
+    on_failed=lambda job: LOG.error("recording.rename_abandoned", source=job["source"], target=job["target"],
+                                    attempts=job["attempts"]),
+    log=LOG.channel("recording"))
+## The keyboard and clipboard modules are loaded by startup_background, off the critical path
+SEQUENCES = SequenceRunner(KeyboardBackend(), DAEMON_SETTINGS["sequences"], log=LOG.channel("sequences"))
+TEXT_INJECTOR = TextInjector(
+    SendInputBackend(), Win32Clipboard(),
+    paste_threshold=DAEMON_SETTINGS["typing"]["paste_threshold"],
+    batch_size=DAEMON_SETTINGS["typing"]["batch_size"])
+METRICS = Metrics(enabled=DAEMON_SETTINGS["metrics"]["enabled"], log=LOG.channel("metrics", eventlog.WARNING))
+
+## Startup timeline (imports, first config on the pad...) written here once up;
+## the tray and background steps wait at most STARTUP_WAIT s for the pad
+STARTUP_FILE = "./startup.json"
+STARTUP_WAIT = 3
 
 LAST_APP_SWITCH_TIME = datetime.datetime.now()
 
+## Host side view of the current profile (programs, layouts); each pad has its own
 running_config={}
 configs={}
-toggles={}
+active_program = None
+## Pad messages run one at a time, whichever pad they come from
+ACTIONS_LOCK = threading.Lock()
 
 
 def print_monitor_ids():
@@ -94,87 +201,390 @@ def active_monitors():
             real_device_id = device.DeviceID
             active_monitors.append((real_device_id.split('\\')[1], monitor_info['Work']))
         except Exception as e:
-            print(f"Error al obtener información del monitor: {e}")
+            LOG.error("monitors.info_failed", error=str(e))
     return active_monitors
 
 
 def load_zones_config():
-    global ZONE_DEFINITIONS, HARDWARE_ID_MAP, BORDER_OFFSET, APP_OVERRIDES
     try:
-        with open("zones.json", "r") as f:
-            data = json.load(f)
-            ZONE_DEFINITIONS = data.get("areas", {})
-            HARDWARE_ID_MAP = data.get("hardware_mapping", {}) # <--- NUEVO
-            APP_OVERRIDES = data.get("app_overrides", {})
+        ZONE_ENGINE.reload()
+        LOG.info("zones.loaded", areas=len(ZONE_ENGINE.data.get('areas', {})), monitors=len(ZONE_ENGINE.data.get('hardware_mapping', {})))
+    except Exception as e:
+        LOG.error("zones.load_failed", error=str(e))
+
+
+## Monitor topology cache
+SM_XVIRTUALSCREEN = 76
+SM_YVIRTUALSCREEN = 77
+SM_CXVIRTUALSCREEN = 78
+SM_CYVIRTUALSCREEN = 79
+SM_CMONITORS = 80
+SPI_SETWORKAREA = 0x002F
+
+
+class MonitorTopology:
+    """
+    Caches the active monitor list (device id + work rect) per display
+    topology. The list is dropped on WM_DISPLAYCHANGE / work area changes,
+    and a cheap GetSystemMetrics fingerprint catches anything the listener
+    missed. The same window relays WM_DEVICECHANGE (ports coming and going)
+    to the `on_device_change` callbacks.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._monitors = None
+        self._fingerprint = None
+        self._thread = None
+        self._device_listeners = []
+
+    @staticmethod
+    def fingerprint():
+        metrics = ctypes.windll.user32.GetSystemMetrics
+        return (
+            metrics(SM_CMONITORS),
+            metrics(SM_XVIRTUALSCREEN), metrics(SM_YVIRTUALSCREEN),
+            metrics(SM_CXVIRTUALSCREEN), metrics(SM_CYVIRTUALSCREEN)
+        )
+
+    def invalidate(self):
+        with self._lock:
+            self._monitors = None
+
+    def monitors(self):
+        """Active (device id, work rect) list for the current topology."""
+        fingerprint = self.fingerprint()
+        with self._lock:
+            if self._monitors is not None and fingerprint == self._fingerprint:
+                return self._monitors
+
+        monitors = tuple((dev_id, tuple(work)) for dev_id, work in active_monitors())
+        LOG.info("monitors.topology", active=len(monitors))
+
+        with self._lock:
+            self._monitors = monitors
+            self._fingerprint = fingerprint
+        return monitors
+
+    def on_device_change(self, callback):
+        """Call `callback()` whenever Windows reports a device change."""
+        self._device_listeners.append(callback)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._listen, daemon=True)
+        self._thread.start()
+
+    def _wndproc(self, hwnd, msg, wparam, lparam):
+        if msg == win32con.WM_DISPLAYCHANGE or (msg == win32con.WM_SETTINGCHANGE and wparam == SPI_SETWORKAREA):
+            self.invalidate()
+            return 0
+        if msg == win32con.WM_DEVICECHANGE:
+            for callback in self._device_listeners:
+                callback()
+            return 1
+        return win32gui.DefWindowProc(hwnd, msg, wparam, lparam)
+
+    def _listen(self):
+        ## Hidden top-level window: message-only windows do not get the broadcasts
+        try:
+            wc = win32gui.WNDCLASS()
+            wc.lpszClassName = "MacropadDisplayListener"
+            wc.lpfnWndProc = self._wndproc
+            wc.hInstance = win32api.GetModuleHandle(None)
+            win32gui.RegisterClass(wc)
+            win32gui.CreateWindow(wc.lpszClassName, wc.lpszClassName, 0, 0, 0, 0, 0, 0, 0, wc.hInstance, None)
+            win32gui.PumpMessages()
+        except Exception as e:
+            LOG.warning("monitors.listener_failed", error=str(e))
 
-            hostname = socket.gethostname()
-            offset_key = f"offsets-{hostname}"
-            BORDER_OFFSET = data.get(offset_key, data.get("offsets-default", {}))
 
-            print(f"Cargadas {len(ZONE_DEFINITIONS)} zonas y {len(HARDWARE_ID_MAP)} monitores hardware.")
-    except Exception as e:
-        print(f"Error cargando zones.json: {e}")
-
-def get_monitor_rect_by_alias(target_alias):
-
-    # Lookup the monitor rectangle by its alias
-    global HARDWARE_ID_MAP
-    target_hw_id_part = None
-    active_monitors_list = active_monitors()
-    for hw_id, alias in HARDWARE_ID_MAP.items():
-        # Allow same monitor with multiple indices
-        hw_id = hw_id.split('_')[0]  
-
-        # Discard monitors that are not currently active
-        if hw_id not in [dev_id for dev_id, _ in active_monitors_list]:
-            continue
-        # Look for the target
-        if alias == target_alias:
-            target_hw_id_part = hw_id
-            break
-    
-    ## Try to find the monitor by its hardware ID part
-    if target_hw_id_part:
-        for dev_id, work_rect in active_monitors_list:
-            if target_hw_id_part in dev_id:
-                # ¡Encontrado el legítimo dueño!
-                return work_rect
-            
-    # If not found, try to fallback to any unknown monitor
-    if target_alias: 
-        print(f"Monitor oficial para '{target_alias}' no encontrado. Buscando monitor extraño...")
-        
-        known_ids = list(HARDWARE_ID_MAP.keys())
-        for dev_id, work_rect in active_monitors_list:
-            # ¿Es este monitor 'dev_id' uno de los míos conocidos?
-            is_known = False
-            for kid in known_ids:
-                if kid in dev_id:
-                    is_known = True
-                    break
-            
-            if not is_known:
-                print(f"FALLBACK: Asignando monitor desconocido ({dev_id}) a '{target_alias}'")
-                return work_rect
-
-    print(f"Monitor para '{target_alias}' no encontrado ni reemplazable.")
-    return None
+MONITOR_TOPOLOGY = MonitorTopology()
+
 
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+
+def process_exe(pid):
+    """Executable name of `pid` (e.g. "Teams.exe"), None if it is gone or not readable."""
+    ## Straight to the API psutil uses, so psutil stays off the startup path
+    kernel32 = ctypes.windll.kernel32
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        return None
+    try:
+        size = ctypes.wintypes.DWORD(260)
+        path = ctypes.create_unicode_buffer(size.value)
+        if not kernel32.QueryFullProcessImageNameW(handle, 0, path, ctypes.byref(size)):
+            return None
+        return os.path.basename(path.value)
+    finally:
+        kernel32.CloseHandle(handle)
 
 def get_process_name(hwnd):
     try:
         _, pid = win32process.GetWindowThreadProcessId(hwnd)
-        proc = psutil.Process(pid)
-        return proc.name().lower()
+        return (process_exe(pid) or "").lower()
     except:
         return ""
-    
+
+
+## WinEvent hooks shared by the window index and the meeting detector
+EVENT_OBJECT_CREATE = 0x8000
+EVENT_OBJECT_DESTROY = 0x8001
+EVENT_OBJECT_SHOW = 0x8002
+EVENT_OBJECT_HIDE = 0x8003
+EVENT_OBJECT_LOCATIONCHANGE = 0x800B
+EVENT_OBJECT_NAMECHANGE = 0x800C
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+CHILDID_SELF = 0
+GA_ROOT = 2
+WINDOW_RECONCILE_SECONDS = 30
+
+WIN_EVENT_KINDS = {
+    EVENT_OBJECT_CREATE: meeting_detector.CREATE,
+    EVENT_OBJECT_DESTROY: meeting_detector.DESTROY,
+    EVENT_OBJECT_SHOW: meeting_detector.SHOW,
+    EVENT_OBJECT_HIDE: meeting_detector.HIDE,
+    EVENT_OBJECT_LOCATIONCHANGE: meeting_detector.LOCATION,
+    EVENT_OBJECT_NAMECHANGE: meeting_detector.NAME,
+}
+
+WinEventProc = ctypes.WINFUNCTYPE(
+    None,
+    ctypes.c_void_p,   # hWinEventHook
+    ctypes.c_ulong,    # event
+    ctypes.c_void_p,   # hwnd
+    ctypes.c_long,     # idObject
+    ctypes.c_long,     # idChild
+    ctypes.c_ulong,    # dwEventThread
+    ctypes.c_ulong     # dwmsEventTime
+)
+
+
+class WinEventSource:
+    """
+    One thread owning the out-of-context WinEvent hooks for top-level
+    windows. Subscribers get (kind, hwnd, monotonic timestamp); sweep
+    subscribers run every `sweep_seconds` on the same thread.
+    """
+
+    def __init__(self, sweep_seconds=WINDOW_RECONCILE_SECONDS):
+        self.sweep_seconds = sweep_seconds
+        self._subscribers = []
+        self._sweepers = []
+        self._hooks = []
+        self._thread = None
+        self._callback = WinEventProc(self._on_event)
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def on_sweep(self, callback):
+        self._sweepers.append(callback)
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _on_event(self, hook, event, hwnd, id_object, id_child, thread, event_time):
+        if not hwnd or id_object != OBJID_WINDOW or id_child != CHILDID_SELF:
+            return
+        kind = WIN_EVENT_KINDS.get(event)
+        if kind is None:
+            return
+        timestamp = time.monotonic()
+        for callback in self._subscribers:
+            try:
+                callback(kind, hwnd, timestamp)
+            except Exception as e:
+                LOG.error("window.event_error", error=str(e))
+
+    def _sweep(self):
+        for callback in self._sweepers:
+            try:
+                callback()
+            except Exception as e:
+                LOG.error("window.sweep_failed", error=str(e))
+
+    def _run(self):
+        user32 = ctypes.windll.user32
+        self._sweep()
+
+        ## CREATE..HIDE and LOCATIONCHANGE..NAMECHANGE are contiguous ranges
+        for first, last in ((EVENT_OBJECT_CREATE, EVENT_OBJECT_HIDE),
+                            (EVENT_OBJECT_LOCATIONCHANGE, EVENT_OBJECT_NAMECHANGE)):
+            hook = user32.SetWinEventHook(
+                first, last, 0, self._callback, 0, 0,
+                WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS
+            )
+            if hook:
+                self._hooks.append(hook)
+            else:
+                LOG.warning("window.hook_failed", first=hex(first), last=hex(last))
+
+        timer_id = user32.SetTimer(None, 0, int(self.sweep_seconds * 1000), None)
+        msg = ctypes.wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+            if msg.message == win32con.WM_TIMER and msg.wParam == timer_id:
+                self._sweep()
+                continue
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+
+        for hook in self._hooks:
+            user32.UnhookWinEvent(hook)
+
+
+WIN_EVENTS = WinEventSource()
+
+
+## Live index of visible top-level windows by executable name
+class WindowIndex:
+    """
+    Keeps executable -> visible top-level hwnds current from WinEvent
+    create/destroy/show/hide notifications, so launch-or-focus lookups do
+    not need an EnumWindows scan. The event source's periodic sweep
+    reconciles anything the hooks missed.
+    """
+
+    def __init__(self, events):
+        self._lock = threading.Lock()
+        self._by_exe = {}       # exe (lower) -> set(hwnd)
+        self._exe_of = {}       # hwnd -> exe (lower)
+        self._pid_of = {}       # hwnd -> pid
+        self._pid_exe = {}      # pid -> exe (lower), avoids a process lookup per event
+        self._pid_windows = {}  # pid -> number of indexed hwnds
+        self._pattern_exes = {} # regex -> set(exe) matching it
+        self._ready = False
+        events.subscribe(self._on_event)
+        events.on_sweep(self.reconcile)
+
+    def windows_for(self, pattern):
+        """Visible top-level hwnds whose executable matches `pattern`."""
+        if not self._ready:
+            self.reconcile()
+        with self._lock:
+            exes = self._pattern_exes.get(pattern)
+            if exes is None:
+                exes = {exe for exe in self._by_exe if re.search(pattern, exe, re.IGNORECASE)}
+                self._pattern_exes[pattern] = exes
+            ventanas = []
+            for exe in exes:
+                ventanas.extend(self._by_exe.get(exe, ()))
+            return ventanas
+
+    def exe_of(self, hwnd):
+        with self._lock:
+            return self._exe_of.get(hwnd)
+
+    def reconcile(self):
+        """Full EnumWindows sweep, replacing the current index."""
+        found = []
+
+        def callback(hwnd, lista):
+            if win32gui.IsWindowVisible(hwnd):
+                lista.append(hwnd)
+
+        win32gui.EnumWindows(callback, found)
+
+        by_exe, exe_of, pid_of, pid_exe, pid_windows = {}, {}, {}, {}, {}
+        for hwnd in found:
+            pid, exe = self._resolve(hwnd, pid_exe)
+            if not exe:
+                continue
+            by_exe.setdefault(exe, set()).add(hwnd)
+            exe_of[hwnd] = exe
+            pid_of[hwnd] = pid
+            pid_windows[pid] = pid_windows.get(pid, 0) + 1
+
+        with self._lock:
+            self._by_exe, self._exe_of, self._pid_of, self._pid_exe = by_exe, exe_of, pid_of, pid_exe
+            self._pid_windows = pid_windows
+            self._pattern_exes = {}
+            self._ready = True
+
+    def _resolve(self, hwnd, pid_exe):
+        try:
+            _, pid = win32process.GetWindowThreadProcessId(hwnd)
+        except Exception:
+            return None, None
+        exe = pid_exe.get(pid)
+        if exe is None:
+            exe = process_exe(pid)
+            if exe is None:
+                return pid, None
+            exe = pid_exe[pid] = exe.lower()
+        return pid, exe
+
+    def _add(self, hwnd):
+        if not win32gui.IsWindowVisible(hwnd):
+            return
+        if ctypes.windll.user32.GetAncestor(hwnd, GA_ROOT) != hwnd:
+            return
+        with self._lock:
+            pid_exe = dict(self._pid_exe)
+        pid, exe = self._resolve(hwnd, pid_exe)
+        if not exe:
+            return
+        with self._lock:
+            self._pid_exe[pid] = exe
+            self._by_exe.setdefault(exe, set()).add(hwnd)
+            self._exe_of[hwnd] = exe
+            if self._pid_of.get(hwnd) != pid:
+                self._forget_pid(self._pid_of.get(hwnd))
+                self._pid_of[hwnd] = pid
+                self._pid_windows[pid] = self._pid_windows.get(pid, 0) + 1
+            for pattern, exes in self._pattern_exes.items():
+                if exe not in exes and re.search(pattern, exe, re.IGNORECASE):
+                    exes.add(exe)
+
+    def _remove(self, hwnd):
+        with self._lock:
+            exe = self._exe_of.pop(hwnd, None)
+            pid = self._pid_of.pop(hwnd, None)
+            if exe is None:
+                return
+            hwnds = self._by_exe.get(exe)
+            if hwnds is not None:
+                hwnds.discard(hwnd)
+                if not hwnds:
+                    del self._by_exe[exe]
+            self._forget_pid(pid)
+
+    def _forget_pid(self, pid):
+        """Drop one window of `pid`; forget the pid with its last one, pids get reused. Caller holds the lock."""
+        if pid is None:
+            return
+        left = self._pid_windows.get(pid, 0) - 1
+        if left > 0:
+            self._pid_windows[pid] = left
+        else:
+            self._pid_windows.pop(pid, None)
+            self._pid_exe.pop(pid, None)
+
+    def _on_event(self, kind, hwnd, timestamp):
+        if kind in (meeting_detector.CREATE, meeting_detector.SHOW):
+            self._add(hwnd)
+        elif kind in meeting_detector.GONE:
+            self._remove(hwnd)
+
+WINDOW_INDEX = WindowIndex(WIN_EVENTS)
+
+
 def move_window_to_zone(zone_key):
-    global TEAMS_TOP, TEAMS_LEFT, BORDER_OFFSET
+    global TEAMS_TOP, TEAMS_LEFT
+
+    try:
+        table = ZONE_ENGINE.table(MONITOR_TOPOLOGY.monitors())
+    except Exception as e:
+        LOG.error("zone.resolve_failed", error=str(e))
+        return
 
-    zone = ZONE_DEFINITIONS.get(zone_key)
-    if not zone:
-        print(f"Zona {zone_key} no existe")
+    if zone_key not in table.areas:
+        LOG.warning("zone.unknown", zone=zone_key)
         return
 
     hwnd = win32gui.GetForegroundWindow()
@@ -188,99 +598,41 @@ def move_window_to_zone(zone_key):
     if is_maximized or is_minimized:
         win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
 
-    # --- 1. OBTENER MONITOR DE INICIO (OBLIGATORIO) ---
-    start_rect = get_monitor_rect_by_alias(zone['monitor'])
-    if not start_rect: 
-        print(f"Monitor de inicio '{zone['monitor']}' no encontrado.")
+    # --- RECTANGULO PRECALCULADO + OVERRIDE DE LA APP ---
+    app_name = WINDOW_INDEX.exe_of(hwnd) or get_process_name(hwnd)
+    rect = table.lookup(zone_key, app_name)
+    if not rect:
+        LOG.warning("zone.monitor_missing", zone=zone_key, monitor=table.areas[zone_key]['monitor'])
         return
-    
-    # --- 2. OBTENER MONITOR DE FIN (OPCIONAL / FALLBACK) ---
-    end_alias = zone.get('monitor_end', zone['monitor'])
-    end_rect = get_monitor_rect_by_alias(end_alias)
-
-    # AQUÍ ESTÁ LA MAGIA DEL FALLBACK:
-    if end_rect:
-        # Escenario Casa: Ambos monitores existen
-        # Calculamos la unión de ambos
-        s_left, s_top, s_right, s_bottom = start_rect
-        e_left, e_top, e_right, e_bottom = end_rect
-        
-        canvas_left = min(s_left, e_left)
-        canvas_top = min(s_top, e_top)
-        canvas_right = max(s_right, e_right)
-        canvas_bottom = max(s_bottom, e_bottom)
-        # print(f"Dual Monitor Mode: {zone['monitor']} -> {end_alias}")
-    else:
-        # Escenario Trabajo: El monitor final no está conectado
-        # Degradamos suavemente: El lienzo total es SOLO el monitor de inicio
-        canvas_left, canvas_top, canvas_right, canvas_bottom = start_rect
-        print(f"Single Monitor Fallback: '{end_alias}' no detectado. Usando solo '{zone['monitor']}'.")
-
-    canvas_width = canvas_right - canvas_left
-    canvas_height = canvas_bottom - canvas_top
-
-    # --- 3. CALCULAR COORDENADAS ---
-    # Los porcentajes se aplican sobre el canvas calculado (sea doble o simple)
-    
-    raw_x = canvas_left + int(canvas_width * (zone['min_x'] / 100))
-    raw_y = canvas_top + int(canvas_height * (zone['min_y'] / 100))
-    
-    raw_x2 = canvas_left + int(canvas_width * (zone['max_x'] / 100))
-    raw_y2 = canvas_top + int(canvas_height * (zone['max_y'] / 100))
+    final_x, final_y, final_w, final_h = rect
 
-    raw_w = raw_x2 - raw_x
-    raw_h = raw_y2 - raw_y
-
-    # --- 4. APLICAR CORRECCIÓN DE BORDES Y OVERRIDES ---
-    app_name = get_process_name(hwnd)
-    app_adj = APP_OVERRIDES.get(app_name, {})
-
-    final_x = raw_x + BORDER_OFFSET["x"] + app_adj.get("x",0)
-    final_y = raw_y + BORDER_OFFSET["y"] + app_adj.get("y",0)
-    final_w = raw_w + BORDER_OFFSET["w"] + app_adj.get("w",0)
-    final_h = raw_h + BORDER_OFFSET["h"] + app_adj.get("h",0)
-
-    # --- 5. EJECUTAR ---
+    # --- EJECUTAR ---
     try:
-        win32gui.MoveWindow(hwnd, final_x, final_y, final_w, final_h, True)
-        win32gui.SetForegroundWindow(hwnd)
-        
-        if zone.get("is_teams_zone", False):
+        ## Zone first, so the detector sees the LOCATIONCHANGE of this move
+        if zone_key in table.teams_zones:
             TEAMS_LEFT = final_x
             TEAMS_TOP = final_y
+
+        ## hwnd is already the foreground window, a single MoveWindow is enough
+        win32gui.MoveWindow(hwnd, final_x, final_y, final_w, final_h, True)
+
+        if zone_key in table.teams_zones:
+            MEETING_DETECTOR.rescan(WINDOW_INDEX.windows_for(MEETING_PROCESS))
         
     except Exception as e:
-        print(f"Error: {e}")
+        LOG.error("zone.move_failed", zone=zone_key, error=str(e))
 
 def get_running_layout():
-    hWnd = ctypes.windll.user32.GetForegroundWindow()
-    threadID = ctypes.windll.user32.GetWindowThreadProcessId(hWnd, None)
-    hkl = ctypes.windll.user32.GetKeyboardLayout(threadID)
-    layout_id = hkl & 0xFFFFFFFF
-    return layout_id
+    return LAYOUT_SWITCHER.current()
 
 
-def switch_layout(delay = 0.05, tries=2):
-    if tries <=0:
+def switch_layout(program=None):
+    required_layout = get_app_layout(program)
+    with METRICS.span("layout.switch"):
+        switched = LAYOUT_SWITCHER.switch(required_layout)
+    if not switched:
         ## For some reason, Microsoft Notepad does not switch layout properly
-        print ("Max tries exceeded for layout switch")
-        return
-
-    required_layout = get_app_layout()
-    starting_layout = get_running_layout()
-    if starting_layout != required_layout:
-        keyboard.press('windows+space')
-        time.sleep(delay)
-        keyboard.release('windows+space')
-        time.sleep(delay)
-        print (f"Switched layout from {hex(starting_layout)} to {hex(get_running_layout())} seeking {hex(required_layout)}")
-
-    ## If not correct (fast windows switch or other issues), try again
-    required_layout = get_app_layout()
-    resulting_layout = get_running_layout()
-    if resulting_layout != required_layout:
-        print (f"Layout missed from {hex(starting_layout)} to {hex(resulting_layout)} seeking {hex(required_layout)}")
-        switch_layout(delay= 2*delay, tries=tries-1)
+        LOG.warning("layout.not_confirmed", layout=required_layout)
 
 
 
@@ -292,44 +644,32 @@ def open_window(filtro_regex):
 
     programs = running_config.get('programs', {})
     if filtro_regex not in programs:
-        print (f"Program {filtro_regex} was not recognized")
+        LOG.warning("open.unknown_program", program=filtro_regex)
         return 
     
     program_name = programs[filtro_regex]['program']
     window_name = programs[filtro_regex]['window']
     multiple_instances = programs[filtro_regex].get('multiple_instances',False)
 
-    def callback(hwnd, lista):
-        if win32gui.IsWindowVisible(hwnd):
-            _, pid = win32process.GetWindowThreadProcessId(hwnd)
-            try:
-                proceso = psutil.Process(pid)
-                nombre_ejecutable = proceso.name()
-                if re.search(window_name, nombre_ejecutable, re.IGNORECASE):
-                    lista.append(hwnd)
-            except psutil.NoSuchProcess:
-                pass
-
-    ventanas=[]
-    win32gui.EnumWindows(callback, ventanas)
+    ventanas = WINDOW_INDEX.windows_for(window_name)
 
     if len(ventanas)==0:
-        print (f"Launching program {program_name}")
+        LOG.info("open.launch", program=program_name)
         subprocess.Popen(f"start {program_name}", shell=True)
     elif win32gui.GetForegroundWindow() in ventanas:
-        print (f"Window for {filtro_regex} is already active")
+        LOG.debug("open.already_active", program=filtro_regex)
         if multiple_instances:
-            print (f"Launching another instance of {program_name}")
+            LOG.info("open.launch_another", program=program_name)
             subprocess.Popen(f"start {program_name}", shell=True)
     else:
-        print (f"Found existing window(s) for {filtro_regex}, bringing to front")
+        LOG.debug("open.bring_to_front", program=filtro_regex, windows=len(ventanas))
         for hwnd in ventanas:
             if win32gui.IsIconic(hwnd):  
-                print (f"Restoring minimized window for {filtro_regex}")
+                LOG.debug("open.restore", program=filtro_regex, hwnd=hwnd)
                 win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
                 continue
             else:
-                print (f"Bringing to front window for {filtro_regex}")
+                LOG.debug("open.front", program=filtro_regex, hwnd=hwnd)
                 win32gui.ShowWindow(hwnd, win32con.SW_MINIMIZE)
                 time.sleep(0.05)
                 win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
@@ -338,22 +678,18 @@ def open_window(filtro_regex):
     ## Cambiar layout si es necesario 
     switch_layout()
 
-def get_app_layout():
-    global APP_LAYOUTS
-    active_program = active_program_name()
-
-    if active_program in APP_LAYOUTS:
-        APP_LAYOUTS[active_program]['last_used'] = datetime.datetime.now().isoformat()
-    else:
-        APP_LAYOUTS[active_program]= {
-            "layout": running_config.get('layouts', {}).get(running_config['layout'],None),
-            "last_used": datetime.datetime.now().isoformat()
-        }   
-
-    return APP_LAYOUTS.get(
-        active_program,
-        None
-    )['layout']
+def get_app_layout(program=None):
+    """Keyboard layout for `program`, by default the app in the foreground."""
+    if program is None:
+        program = active_program_name()
+    default_layout = running_config.get('layouts', {}).get(running_config.get('layout'), None)
+    return APP_LAYOUTS.setdefault(program, default_layout)
+
+def layout_name(layout_id):
+    for name, value in running_config.get('layouts', {}).items():
+        if value == layout_id:
+            return name
+    return None
 
 # Función para obtener el nombre de la ventana activa
 def get_active_window():
@@ -363,17 +699,25 @@ def get_active_window():
 
     window_title = win32gui.GetWindowText(window)
     _, pid = win32process.GetWindowThreadProcessId(window)
-    try:
-        proc = psutil.Process(pid)
-        exe = proc.name()  # Nombre del ejecutable, por ejemplo: Teams.exe
-        window_title = win32gui.GetWindowText(window)
-    except psutil.NoSuchProcess:
+    exe = process_exe(pid)  # Nombre del ejecutable, por ejemplo: Teams.exe
+    if exe is None:
         return None,None
     return exe,window_title
 
-def lookup_config(window_title):
+def device_matches(profile, device):
+    """Profiles with a "device" pattern only apply to pads whose name matches it."""
+    pattern = profile.get('device')
+    if pattern is None:
+        return True
+    return device is not None and re.fullmatch(pattern, device, re.IGNORECASE) is not None
+
+def lookup_config(window_title, device=None, toggles=None):
+    """
+    Merged profile for `window_title` as seen by pad `device` (None: the
+    host's own view, device-specific profiles left out). Toggle definitions
+    are collected into `toggles` when given.
+    """
     global configs
-    global toggles
 
     try:
         config_version = datetime.datetime.fromtimestamp(Path("./config.json").stat().st_mtime)
@@ -390,10 +734,13 @@ def lookup_config(window_title):
             "colors": {},
             "keys": {}  
         }
+        matched_toggles = []
         for clave in claves_ordenadas:
             #print (f"Procesando {clave} para {window_title}")
+            if clave == 'version' or not device_matches(configs[clave], device):
+                continue
             if re.search(clave, window_title,re.IGNORECASE) or clave=='.':
-                print(f"{clave} matched for {window_title}")  
+                LOG.debug("config.match", pattern=clave, window=window_title)
                 if not new_config['window']:
                     new_config['window'] = clave
 
@@ -404,9 +751,12 @@ def lookup_config(window_title):
                     new_config['colors'][key]=value
 
                 for key, value in configs[clave].get('toggles',{}).items():
+                    if toggles is None:
+                        break
                     toggle = toggles.setdefault(key, {})
                     toggle['config'] = value
                     toggle.setdefault('pos', 0)
+                    matched_toggles.append(key)
 
                 if (configs[clave]).get('symbols',None):
                     new_config['symbols'] = configs[clave]['symbols'] 
@@ -420,13 +770,28 @@ def lookup_config(window_title):
                 if (configs[clave]).get('layouts',None):
                     new_config['layouts']=configs[clave]['layouts']
 
+                for setting in ('type_pacing', 'tap_hold', 'fade'):
+                    if (configs[clave]).get(setting,None) is not None:
+                        new_config[setting]=configs[clave][setting]
+
+        ## Toggles keep their position across rebuilds, and so does the
+        ## breathing of an active "pulse" option
+        pulse = set()
+        for key in matched_toggles:
+            options = toggles[key]['config']
+            if options:
+                option = options[toggles[key].get('pos', 0) % len(options)]
+                if option.get('pulse') and option.get('key'):
+                    pulse.add(option['key'])
+        if pulse:
+            new_config['pulse'] = sorted(pulse)
+
         # prettyprint new_config
         #print (f"Configuración compuesta: {new_config}") # en prettyprint
 
         return new_config
     except Exception as e:
-        print(f"Error loading json: {e}")
-        traceback.print_exc()
+        LOG.error("config.load_failed", error=str(e), trace=traceback.format_exc())
         
     
     return {
@@ -445,15 +810,18 @@ def type_chars(cadena):
         if not latest_uuid:
             latest_uuid=str(uuid.uuid4())
         cadena = cadena.replace("#UUID#",latest_uuid)
-    keyboard.write(cadena)
-
-def toggle_key(toggle_name):
-    global toggles
-    global running_config
-    global serial_port 
-
-    print ("toggle key called for "+toggle_name)
-
+    TEXT_INJECTOR.inject(cadena)
+
+def toggle_key(pad, toggle_name):
+    LOG.debug("toggle.called", toggle=toggle_name, pad=pad.name)
+    ## Same lock as pad_config: a focus change can't slip in between
+    ## reading the profile and sending it back
+    with pad.lock:
+        _toggle_key(pad, toggle_name)
+
+def _toggle_key(pad, toggle_name):
+    toggles = pad.toggles
+    config = pad.config
     cur_pos = toggles[toggle_name].get('pos',0)
     options = toggles[toggle_name]['config']
     num_options = len(options)
@@ -463,14 +831,52 @@ def toggle_key(toggle_name):
     next_strokes = toggles[toggle_name]['config'][next_pos]['strokes']
     next_key = toggles[toggle_name]['config'][next_pos]['key']
 
-    running_config['colors'][next_key]=next_leds
-    for stroke in next_strokes:
-        print (f"Pressing {stroke}")
-        keyboard.press(stroke)
-        time.sleep(0.05)
-        keyboard.release(stroke)
-    command = json.dumps(running_config) + '\n'
-    serial_port.write(command.encode())  # Enviar el comando al puerto (debe ser codificado en bytes)
+    config['colors'][next_key]=next_leds
+    ## Options marked "pulse" make the pad breathe the key while active
+    pulse = set(config.get('pulse', []))
+    if toggles[toggle_name]['config'][next_pos].get('pulse'):
+        pulse.add(next_key)
+    else:
+        pulse.discard(next_key)
+    config['pulse'] = sorted(pulse)
+    ## Strokes run on the sequence scheduler, the LED update does not wait
+    LOG.info("toggle.strokes", toggle=toggle_name, pos=next_pos, strokes=next_strokes)
+    SEQUENCES.run(next_strokes, name=f"toggle:{toggle_name}")
+    pad.send(config)
+
+def pad_config(pad, program, app_layout=None):
+    """Look up `program`'s profile for `pad` and queue it; `app_layout` names its keyboard layout."""
+    ## The pad types TYPE: payloads itself, tell it the layout the app will get
+    if app_layout is None:
+        app_layout = layout_name(get_app_layout(program))
+    with pad.lock:
+        with METRICS.span("config.lookup"):
+            config = lookup_config(program, pad.name, pad.toggles)
+        if app_layout:
+            config['layout'] = app_layout
+        pad.config = config
+        pad.program = program
+        pad.send(config)
+    STARTUP.mark("config.queued")
+
+def pad_connected(pad):
+    STARTUP.mark("pad.opened")
+    LOG.info("pad.connected", pad=pad.name, port=pad.device, serial_number=pad.serial_number,
+             replayed=pad.program)
+    ## A reconnected pad already got its cached config replayed, only look up
+    ## again if the focus moved while it was away
+    if active_program is not None and pad.program != active_program:
+        pad_config(pad, active_program)
+
+def pad_acked(pad, seq):
+    if STARTUP.mark("config.acked"):
+        LOG.info("startup.first_config", pad=pad.name, ms=round(STARTUP.elapsed_ms(), 1))
+
+def pad_message(pad, data):
+    LOG.debug("pad.message", pad=pad.name, message=data)
+    action = "action." + data['code'].split(':')[0].lower()
+    with ACTIONS_LOCK, METRICS.span(action):
+        dispatch(pad, data)
 
 def active_program_name():
     try:
@@ -486,11 +892,11 @@ def active_program_name():
     return active_program
 
 def save_running_layout(prev_program=None):
-    global APP_LAYOUTS, LAST_APP_SWITCH_TIME
+    global LAST_APP_SWITCH_TIME
 
     ## Prevent fast switch wrong saves
     if LAST_APP_SWITCH_TIME + datetime.timedelta(seconds=2) > datetime.datetime.now():
-        print ("Skipping save due to fast switch")
+        LOG.debug("layout.save_skipped", reason="fast switch")
         return
     
     LAST_APP_SWITCH_TIME = datetime.datetime.now()
@@ -501,296 +907,244 @@ def save_running_layout(prev_program=None):
     if not prev_program:
         return 
 
-    ## Save layout for previous program
-    if APP_LAYOUTS.get(prev_program,None)!=running_layout:
-        print (f"Saving layout {running_layout} for {prev_program}")
-        APP_LAYOUTS[prev_program] = {
-            "layout": running_layout,
-            "last_used": datetime.datetime.now().isoformat()
-        }
-        if PERSIST_APP_LAYOUTS:
-            with open(APP_LAYOUTS_FILE, 'w') as file:
-                json.dump(APP_LAYOUTS, file, indent=4)
+    ## Save layout for previous program (written to disk later, off this thread)
+    if APP_LAYOUTS.set(prev_program, running_layout):
+        LOG.info("layout.saved", layout=running_layout, app=prev_program)
 
     return
 
 
+def dispatch(pad, data):
+    """Run a message from `pad`."""
+    if data['code'][:5]=='OPEN:':
+        app = data['code'][5:]
+        LOG.debug("pad.open", app=app)
+        open_window(app)
+    elif data['code'][:5]=='TYPE:':
+        to_type = data['code'][5:]
+        LOG.debug("pad.type", chars=len(to_type))
+        type_chars(to_type)
+    elif data['code'][:7]=='TOGGLE:':
+        toggle_name = data['code'][7:]
+        toggle_key(pad, toggle_name)
+    elif data['code'][:7]=='SCREEN:':
+        screen_code = data['code'][7:]
+        move_window_to_zone(screen_code)
+    elif data['code'][:6]=='SLEEP:':
+        code_hibernate = data['code'][6]
+        code_critical = data['code'][7]
+        code_wakeup = data['code'][8]
+
+        if code_hibernate=='0' and code_critical=='1' and code_wakeup=='0':
+            ## Sleep monitor
+            ctypes.windll.user32.SendMessageW(
+                0xFFFF,  # HWND_BROADCAST
+                0x0112,  # WM_SYSCOMMAND
+                0xF170,  # SC_MONITORPOWER
+                2        # monitor off
+            )
+        else:
+            ## Sleep system
+            ctypes.windll.powrprof.SetSuspendState(int(code_hibernate), int(code_critical), int(code_wakeup))
+
+
+## Focus changes, detected or injected through the control pipe, one at a time
+FOCUS_LOCK = threading.Lock()
+
+def apply_focus(program, prev_program, focus_start, layout=True):
+    """Make `program` the active app and send every pad its config."""
+    global running_config, active_program
+
+    with FOCUS_LOCK:
+        ## Save layout for previous program
+        save_running_layout(prev_program)
+
+        # Switch to new program
+        active_program = program
+
+        # Load new config and send it to every pad, each looks up its own profiles
+        running_config = lookup_config(program)
+        ## `program`'s layout, which for an injected focus is not the foreground app's
+        app_layout = layout_name(get_app_layout(program))
+        for pad in PADS.pads():
+            pad_config(pad, program, app_layout)
+        METRICS.record("focus.to_pad", time.perf_counter_ns() - focus_start)
+
+        # Change keyboard layout if needed
+        if layout and program!= 'explorer.exe':
+            switch_layout(program)
+
 # Función principal que monitorea el cambio de ventana 
 def monitor_window_focus():
-    global configs, serial_port, splits, running_config, APP_LAYOUTS
-
+    prev_program = ''
     while True:
         try:
-            configs = {}
-            prev_program = ''
-
-            if serial_port:
-                serial_port.close()
-                serial_port = None
-
-            serial_port = serial.Serial('COM4', 115200, timeout=1)  
-            while True:
-                if serial_port.in_waiting:
-                    data = json.loads(serial_port.readline().decode('utf-8').strip())
-                    print(f"{data} received")
-                    if data['code'][:5]=='OPEN:':
-                        app = data['code'][5:]
-                        print(f"Told to open [{app}]")
-                        open_window(app)
-                    elif data['code'][:5]=='TYPE:':
-                        to_type = data['code'][5:]
-                        print(f"Told to type {to_type}")
-                        type_chars(to_type)
-                    elif data['code'][:7]=='TOGGLE:':
-                        toggle_name = data['code'][7:]
-                        toggle_key(toggle_name)
-                    elif data['code'][:7]=='SCREEN:':
-                        screen_code = data['code'][7:]
-                        move_window_to_zone(screen_code)
-                    elif data['code'][:6]=='SLEEP:':
-                        code_hibernate = data['code'][6]
-                        code_critical = data['code'][7]
-                        code_wakeup = data['code'][8]
-
-                        if code_hibernate=='0' and code_critical=='1' and code_wakeup=='0':
-                            ## Sleep monitor
-                            ctypes.windll.user32.SendMessageW(
-                                0xFFFF,  # HWND_BROADCAST
-                                0x0112,  # WM_SYSCOMMAND
-                                0xF170,  # SC_MONITORPOWER
-                                2        # monitor off
-                            )
-                        else:
-                            ## Sleep system
-                            ctypes.windll.powrprof.SetSuspendState(int(code_hibernate), int(code_critical), int(code_wakeup))
-
-                active_program = active_program_name()
-                if  active_program != prev_program:
-
-                    ## Save layout for previous program
-                    save_running_layout(prev_program)
-
-                    # Switch to new program
-                    prev_program = active_program
-
-                    # Load new config and send to pad
-                    running_config = lookup_config(active_program)
-                    command = json.dumps(running_config) + '\n'
-                    serial_port.write(command.encode())  # Enviar el comando al puerto (debe ser codificado en bytes)
-
-                    # Change keyboard layout if needed
-                    if active_program!= 'explorer.exe':
-                        switch_layout()
-
-                # Wait for a while before checking again
-                time.sleep(0.5)  
+            focus_start = time.perf_counter_ns()
+            with METRICS.span("focus.detect"):
+                program = active_program_name()
+            STARTUP.mark("focus.first")
+            if  program != prev_program:
+                apply_focus(program, prev_program, focus_start)
+                prev_program = program
 
         except Exception as ex:
-            print(f"Process failed {ex}")
-            time.sleep(5)
+            LOG.error("focus.failed", error=str(ex), trace=traceback.format_exc())
+
+        # Wait for a while before checking again
+        time.sleep(0.5)
 
 # Función para salir del programa
 def salir(icon, item):
-    icon.stop()
-    sys.exit()
-
-def chat_title(texto):
-    partes = [parte.strip() for parte in texto.split("|")]
-    for i, parte in enumerate(partes):
-        if parte == "Bosonit" and i > 0:
-            return partes[i - 1]
-    return None
+    ## Same order as a takeover: another instance may be starting
+    quit_daemon()
 
-def check_teams_window():
-    global was_teams_running, TEAMS_TOP, TEAMS_LEFT
-    print ("Starting Teams window monitor")
-    while True:
-        is_teams_running = False
-        for ventana in gw.getAllWindows():
-            titulo = ventana.title or ""
-            titulo_minus = titulo.lower()
-            if "teams" in titulo_minus and ventana.top == TEAMS_TOP and ventana.left == TEAMS_LEFT:
-                print (f"All ventana info: {ventana}")
-                teams_app = f"{datetime.datetime.now().strftime('%Y%m%d_%H%M')}_{chat_title(titulo) or 'Meeting'}"
-                print (f"Found Teams window: {teams_app}")
-                is_teams_running = True
-        if is_teams_running and not was_teams_running:
-            print ("Teams started running")
-
-            # Switch to scene to record
-            keyboard.press('control+windows+shift+f1')
-            time.sleep(0.1)
-            keyboard.release('control+windows+shift+f1')
-
-            # Switch to scene with camera
-            keyboard.press('control+windows+shift+f8')
-            time.sleep(0.1)
-            keyboard.release('control+windows+shift+f8')
-
-            # Start virtual camera
-            keyboard.press('control+windows+shift+f11')
-            time.sleep(0.1)
-            keyboard.release('control+windows+shift+f11')
-
-            # Switch camera off
-            keyboard.press('control+windows+shift+f10')
-            time.sleep(0.1)
-            keyboard.release('control+windows+shift+f10')
-
-            # Stop recording (just in case)
-            keyboard.press('control+windows+shift+f7')
-            time.sleep(0.1)
-            keyboard.release('control+windows+shift+f7')
-
-            if os.path.exists("c:\\Users\\raul.mzabala\\Videos\\latest.mp4"):
-                print ("Stopping recording...")
-                keyboard.press('control+windows+shift+f7')
-                time.sleep(0.1)
-                keyboard.release('control+windows+shift+f7')
-
-                print ("Waiting for previous recording to be released...")
-                moved = not os.path.exists("c:\\Users\\raul.mzabala\\Videos\\latest.mp4")
-                while not moved:
-                    print ("Trying to rename the previous recording...")
-                    try:
-                        os.replace(
-                            "c:\\Users\\raul.mzabala\\Videos\\latest.mp4",
-                            f"c:\\Users\\raul.mzabala\\Videos\\Captures\\{teams_app}_orphan_prev_meeting.mp4"
-                        )
-                        moved = True
-                    except Exception as e:
-                        print (f"Could not rename: {e}") 
-                        time.sleep(1) 
-
-            print ("Recording file renamed successfully.")
-
-            # Start recording
-            keyboard.press('control+windows+shift+f6')
-            time.sleep(0.1)
-            keyboard.release('control+windows+shift+f6')
-
-        elif not is_teams_running and was_teams_running:
-            print ("Teams stopped running")
-
-            # Switch camera off
-            keyboard.press('control+windows+shift+f10')
-            time.sleep(0.1)
-            keyboard.release('control+windows+shift+f10')
-
-            # Stop virtual camera
-            keyboard.press('control+windows+shift+f2')
-            time.sleep(0.1)
-            keyboard.release('control+windows+shift+f2')
-
-            # Stop recording
-            keyboard.press('control+windows+shift+f7')
-            time.sleep(0.1)
-            keyboard.release('control+windows+shift+f7')
-
-            print ("Waiting for previous recording to be released...")
-            moved = not os.path.exists("c:\\Users\\raul.mzabala\\Videos\\latest.mp4")
-            while not moved:
-                print ("Trying to rename the previous recording...")
-                try:
-                    os.replace(
-                        "c:\\Users\\raul.mzabala\\Videos\\latest.mp4",
-                        f"c:\\Users\\raul.mzabala\\Videos\\Captures\\{teams_app}.mp4"
-                    )
-                    moved = True
-                except Exception as e:
-                    print (f"Could not rename: {e}") 
-                    time.sleep(1) 
-            print ("Recording file renamed successfully.")
-
-            # Switch to scene to record
-            keyboard.press('control+windows+shift+alt+f1')
-            time.sleep(0.1)
-            keyboard.release('control+windows+shift+alt+f1')
-
-        was_teams_running = is_teams_running
-        time.sleep(3)   
 
-# Cargar una imagen para el icono
-def crear_icono():
-    image = Image.open("icono.png")  # Reemplaza con tu icono
-    menu = (item('Salir', salir),)
-    icon = Icon("MiApp", image, menu=menu)
+class Win32WindowInspector:
+    """Window details for the meeting detector, read only when needed."""
+
+    def exe(self, hwnd):
+        ## Index lookup only: LOCATIONCHANGE fires for every window on screen
+        return WINDOW_INDEX.exe_of(hwnd)
 
-    # Iniciar el proceso en segundo plano
-    hilo = threading.Thread(target=monitor_window_focus, daemon=True)
-    hilo_teams = threading.Thread(target=check_teams_window, daemon=True)
+    def title(self, hwnd):
+        return win32gui.GetWindowText(hwnd)
 
-    hilo.start()
-    hilo_teams.start()
+    def position(self, hwnd):
+        left, top, _, _ = win32gui.GetWindowRect(hwnd)
+        return (left, top)
 
-    icon.run()
 
-def kill_other_instances_same_script():
-    me = os.getpid()
+def run_sequence(name, wait=True):
+    try:
+        run = SEQUENCES.run(name)
+    except KeyError:
+        LOG.warning("sequence.undefined", sequence=name, settings=DAEMON_SETTINGS_FILE)
+        return None
+    if wait:
+        run.wait()
+        LOG.info("sequence.done", sequence=name, runtime_ms=round(run.runtime * 1000, 1), declared_ms=round(run.declared * 1000, 1))
+    return run
+
+
+def meeting_started(teams_app):
+    # Record scene, camera scene, virtual camera on, camera off, stop recording (just in case)
+    run_sequence("meeting-start")
+
+    ## A file still queued from the last meeting is not an orphan
+    if os.path.exists(RECORDING["source"]) and not RECORDING_HANDOFF.pending(RECORDING["source"]):
+        LOG.info("recording.stop_orphan")
+        run_sequence("recording-stop")
+
+        LOG.info("recording.rename_queued", orphan=True)
+        RECORDING_HANDOFF.submit(
+            RECORDING["source"],
+            os.path.join(RECORDING["target_dir"], f"{teams_app}_orphan_prev_meeting.mp4")
+        )
+
+    ## The new recording reuses the source path: start it once it is free
+    RECORDING_HANDOFF.when_released(RECORDING["source"], lambda: run_sequence("recording-start", wait=False))
+
+
+def meeting_stopped(teams_app):
+    # Camera off, virtual camera off, stop recording
+    run_sequence("meeting-stop")
+
+    LOG.info("recording.rename_queued", orphan=False)
+    RECORDING_HANDOFF.submit(
+        RECORDING["source"],
+        os.path.join(RECORDING["target_dir"], f"{teams_app}.mp4")
+    )
+
+    # Switch to scene to record
+    run_sequence("meeting-stop-scene", wait=False)
 
-    target = os.path.abspath(sys.argv[0]).lower()
-    target_script = target.split(os.sep)[-1]
 
-    for p in psutil.process_iter(["pid", "cmdline"]):
+def recording_pipeline():
+    ## Meeting transitions run here, never on the WinEvent hook thread
+    while True:
+        action, teams_app = RECORDING_QUEUE.get()
         try:
+            if action == "start":
+                meeting_started(teams_app)
+            else:
+                meeting_stopped(teams_app)
+        except Exception as e:
+            LOG.error("recording.pipeline_failed", error=str(e), trace=traceback.format_exc())
 
-            ## Ignore myself
-            pid = p.info["pid"]
-            if pid == me:
-                continue
 
-            ## Get command line
-            cmdline = p.info["cmdline"] or []
+def meeting_name(titulo):
+    return f"{datetime.datetime.now().strftime('%Y%m%d_%H%M')}_{chat_title(titulo or '') or 'Meeting'}"
 
-            if len(cmdline) < 2:
-                continue
 
-            print (f"checking target {target_script} against cmdline: {cmdline}")
+def on_meeting_start(titulo, latency):
+    LOG.info("meeting.start", latency_ms=round(latency * 1000, 1))
+    RECORDING_QUEUE.put(("start", meeting_name(titulo)))
 
-            if "python" in cmdline[0].lower() and target_script in cmdline[1].lower():
-                print (f"Will kill PID {pid} with cmdline: {cmdline} for target {target}")
 
-                # Mata árbol (hijos) primero
-                for child in p.children(recursive=True):
-                    try:
-                        child.terminate()
-                    except psutil.Error:
-                        pass
+def on_meeting_stop(titulo, latency):
+    LOG.info("meeting.stop", latency_ms=round(latency * 1000, 1))
+    RECORDING_QUEUE.put(("stop", meeting_name(titulo)))
 
-                try:
-                    p.terminate()  # educado
-                except psutil.Error:
-                    continue
 
-                # Si no muere rápido, kill
-                try:
-                    p.wait(timeout=2)
-                except psutil.TimeoutExpired:
-                    try:
-                        p.kill()
-                    except psutil.Error:
-                        pass
+MEETING_PROCESS = "teams"
+RECORDING_QUEUE = queue.Queue()
+MEETING_DETECTOR = MeetingDetector(
+    Win32WindowInspector(),
+    lambda: (TEAMS_LEFT, TEAMS_TOP),
+    on_meeting_start,
+    on_meeting_stop,
+    process=MEETING_PROCESS,
+    log=LOG.channel("meeting")
+)
+WIN_EVENTS.subscribe(MEETING_DETECTOR.handle)
 
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            pass
+PADS = PadManager(
+    DAEMON_SETTINGS["pads"],
+    lambda device, baudrate: serial.Serial(device, baudrate, timeout=0.5),
+    serial.tools.list_ports.comports,
+    pad_message,
+    pad_connected,
+    METRICS,
+    log=LOG.channel("pads"),
+    on_ack=pad_acked
+)
+MONITOR_TOPOLOGY.on_device_change(PADS.notify)
+WIN_EVENTS.on_sweep(lambda: MEETING_DETECTOR.rescan(WINDOW_INDEX.windows_for(MEETING_PROCESS)))
 
-def respawn():
-    # Flags para Windows: Proceso separado, nueva consola, sin heredar del padre
-    DETACHED_PROCESS = 0x00000008
-    CREATE_NEW_PROCESS_GROUP = 0x00000200
-    
-    subprocess.Popen(
-        [sys.executable] + sys.argv,
-        creationflags=DETACHED_PROCESS | CREATE_NEW_PROCESS_GROUP,
-        close_fds=True
-    )
-    sys.exit()
+def metrics_menu():
+    from pystray import MenuItem as item
 
-if __name__ == "__main__":
-    kill_other_instances_same_script()
-    print_monitor_ids()
-    load_zones_config()
+    ## Rebuilt on every update_menu(), which the metrics export triggers
+    lines = METRICS.summary_lines() or ["Sin datos"]
+    entries = [item(line, lambda icon, it: None, enabled=False) for line in lines]
+    entries.append(item('Guardar métricas', lambda icon, it: METRICS.export()))
+    return entries
+
+TRAY = None
 
+def tray_ready(icon):
+    icon.visible = True
+    STARTUP.mark("tray.ready")
+
+# Cargar una imagen para el icono
+def crear_icono():
+    global TRAY
+
+    ## Imported here, once the pad has its config: the tray is not on the critical path
+    with STARTUP.importing("tray"):
+        import pystray
+        from pystray import MenuItem as item, Icon
+        from PIL import Image
+
+    image = Image.open("icono.png")  # Reemplaza con tu icono
+    menu = (item('Métricas', pystray.Menu(metrics_menu)), item('Salir', salir))
+    icon = TRAY = Icon("MiApp", image, menu=menu)
+    METRICS.on_export(icon.update_menu)
+    METRICS.start_export(DAEMON_SETTINGS["metrics"]["file"], DAEMON_SETTINGS["metrics"]["interval"])
+
+    icon.run(tray_ready)
+
+def launch_wsl():
     # Flags de Windows para lanzar el proceso sin ventana y desacoplado
     DETACHED_PROCESS         = 0x00000008
     CREATE_NEW_PROCESS_GROUP = 0x00000200
@@ -807,8 +1161,197 @@ if __name__ == "__main__":
         stderr=subprocess.DEVNULL,
         creationflags=DETACHED_PROCESS | CREATE_NEW_PROCESS_GROUP | CREATE_NO_WINDOW
     )
+    LOG.info("wsl.launched", pid=p.pid)
+
+def startup_report():
+    report = STARTUP.report()
+    report["importtime"] = STARTUP.import_lines()
+    LOG.info("startup.report", interpreter_ms=report["interpreter_ms"], imports_ms=report["imports_ms"],
+             steps_ms=report["steps_ms"])
+    try:
+        jsonfile.write_atomic(STARTUP_FILE, report)
+    except OSError as e:
+        LOG.warning("startup.report_failed", error=str(e))
+
+def startup_background():
+    """Everything the first config does not need, off the critical path."""
+    try:
+        STARTUP.wait("config.queued", timeout=STARTUP_WAIT)
+        with STARTUP.importing("input"):
+            SEQUENCES.backend.load()
+            TEXT_INJECTOR.clipboard.load()
+        load_zones_config()
+        RECORDING_HANDOFF.start()
+        WIN_EVENTS.start()
+        threading.Thread(target=recording_pipeline, daemon=True).start()
+        print_monitor_ids()
+        launch_wsl()
+        STARTUP.mark("background")
+
+        STARTUP.wait("config.acked", timeout=STARTUP_WAIT)
+        STARTUP.wait("tray.ready", timeout=STARTUP_WAIT)
+        startup_report()
+    except Exception as e:
+        LOG.error("startup.background_failed", error=str(e), trace=traceback.format_exc())
+
+def respawn():
+    """Start a fresh instance; taking the control pipe over stops this one."""
+    # Flags para Windows: Proceso separado, nueva consola, sin heredar del padre
+    DETACHED_PROCESS = 0x00000008
+    CREATE_NEW_PROCESS_GROUP = 0x00000200
+    
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(sys.argv[0])],
+        creationflags=DETACHED_PROCESS | CREATE_NEW_PROCESS_GROUP,
+        close_fds=True
+    )
+
+def quit_daemon():
+    """
+    Hand over to the next instance: free the pads, write app_layouts.json and
+    close the log, and only then the control pipe. The new instance binds
+    the pipe and loads the layouts straight away.
+    """
+    PADS.close()
+    APP_LAYOUTS.close()
+    METRICS.close()
+    LOG.close()
+    CONTROL.close()
+    if TRAY is not None:
+        TRAY.stop()     # icon.run() returns, atexit has nothing left to flush
+        return
+    os._exit(0)
+
+def control_reload():
+    """Re-read config.json and zones.json and resend every pad its config."""
+    global configs, running_config
+    configs = {}
+    load_zones_config()
+    program = active_program
+    if program is not None:
+        running_config = lookup_config(program)
+        for pad in PADS.pads():
+            pad_config(pad, program)
+    return {"program": program, "pads": [pad.name for pad in PADS.pads()]}
+
+def control_stats():
+    return {
+        "program": active_program,
+        "pads": [{"name": pad.name, "port": pad.device, "window": pad.config.get("window")} for pad in PADS.pads()],
+        "metrics": METRICS.snapshot(),
+        "startup": STARTUP.report(),
+    }
+
+def control_metrics(export=False):
+    if export:
+        METRICS.export()
+    return METRICS.snapshot()
+
+def control_message(code, pad="virtual", **fields):
+    """
+    Handle `code` as if `pad` had sent it; returns the handling time. With no
+    pad by that name open, a virtual one with the active app's profile
+    handles it and is dropped afterwards.
+    """
+    target = PADS.pad(pad)
+    virtual = target is None
+    if virtual:
+        target = PADS.virtual(pad)
+        if active_program is not None:
+            pad_config(target, active_program)
+    try:
+        start = time.perf_counter_ns()
+        pad_message(target, dict(fields, code=code))
+        return {"pad": target.name, "virtual": virtual, "ms": (time.perf_counter_ns() - start) / 1e6}
+    finally:
+        if virtual:
+            target.close()
+
+def control_focus(program, layout=True):
+    """Switch to `program` as if it had taken the focus, until the real focus moves."""
+    start = time.perf_counter_ns()
+    apply_focus(program, active_program, start, layout)
+    return {"program": program, "pads": [pad.name for pad in PADS.pads()],
+            "ms": (time.perf_counter_ns() - start) / 1e6}
+
+def control_profiles(program=None, device=None):
+    """The profile table in the order lookup_config merges it, or `program`'s merged config."""
+    if program is not None:
+        toggles = {}
+        config = lookup_config(program, device, toggles)
+        return {"program": program, "device": device, "config": config, "toggles": toggles}
+    lookup_config(active_program or '')     ## loads config.json if it changed
+    profiles = sorted((clave for clave in configs if clave != 'version'), key=len)
+    return {
+        "version": configs.get('version'),
+        "profiles": [{
+            "pattern": clave,
+            "device": configs[clave].get('device'),
+            "keys": len(configs[clave].get('keys', {})),
+            "colors": len(configs[clave].get('colors', {})),
+            "toggles": sorted(configs[clave].get('toggles', {})),
+        } for clave in profiles],
+        "pads": {pad.name: pad.config for pad in PADS.pads()},
+    }
 
+def control_bench(count=200, pad="bench"):
+    """
+    Time lookup and serialization of every profile for a pad called `pad`,
+    `count` times. Runs inline with its own Metrics: no pad is written to and
+    the daemon's metrics are left alone.
+    """
+    lookup_config(active_program or '')
+    programs = [clave for clave in configs if clave != 'version']
+    if not programs:
+        raise ValueError("config.json has no profiles")
+    toggles = {}
+    bench = Metrics(window=3600, windows=1, log=LOG.channel("bench"))
+    for index in range(count):
+        program = programs[index % len(programs)]
+        with bench.span("config.lookup"):
+            config = lookup_config(program, pad, toggles)
+        ## Same encoding as the pad writer thread
+        with bench.span("config.serialize"):
+            (json.dumps(config) + '\n').encode()
+    return {"count": count, "profiles": len(programs), "pad": pad, "metrics": bench.snapshot()}
+
+def control_restart():
+    respawn()
+    return "restarting"
+
+def control_shutdown():
+    LOG.info("instance.takeover")
+    threading.Thread(target=quit_daemon, daemon=True).start()
+    return "bye"
+
+CONTROL.handle("reload", control_reload)
+CONTROL.handle("stats", control_stats)
+CONTROL.handle("metrics", control_metrics)
+CONTROL.handle("message", control_message)
+CONTROL.handle("focus", control_focus)
+CONTROL.handle("profiles", control_profiles)
+CONTROL.handle("bench", control_bench)
+CONTROL.handle("restart", control_restart)
+CONTROL.handle("shutdown", control_shutdown)
 
-    print(f"WSL lanzado con PID {p.pid}, ejecutando sleep infinity")
+if __name__ == "__main__":
+    ## atexit runs last-registered first: the log closes after everything that logs
+    atexit.register(LOG.close)
+    atexit.register(APP_LAYOUTS.close)
+    atexit.register(METRICS.close)
+    ## 1 ms timer resolution so sequence deadlines are not rounded to 15.6 ms
+    ctypes.windll.winmm.timeBeginPeriod(1)
+    STARTUP.mark("components")
+
+    CONTROL.start()
+
+    ## The pad first: open it and sync the current app's profile
+    MONITOR_TOPOLOGY.start()
+    PADS.start()
+    threading.Thread(target=monitor_window_focus, daemon=True).start()
+
+    ## Then the rest, in the background; the tray once the pad has its config
+    threading.Thread(target=startup_background, daemon=True).start()
+    STARTUP.wait("config.queued", timeout=STARTUP_WAIT)
     crear_icono()
 
@@ -0,0 +1,151 @@
+"""
+Meeting detection from window events.
+
+A meeting is "on" while some window of the meeting process sits at the
+meeting zone position (the Teams zone from zones.json). The detector is fed
+create/destroy/show/hide/name/location events for single windows and only
+inspects the window the event is about, so nothing scans the desktop.
+
+Window details come from an inspector with `exe(hwnd)` (None for windows
+that are not visible top-level ones), `title(hwnd)` and `position(hwnd)`
+-> (left, top). `FakeWindowSource` provides both the events
+and the inspector so detection latency can be exercised off Windows.
+"""
+
+import re
+import threading
+import time
+
+CREATE = "create"
+DESTROY = "destroy"
+SHOW = "show"
+HIDE = "hide"
+NAME = "name"
+LOCATION = "location"
+
+GONE = (DESTROY, HIDE)
+
+
+def chat_title(texto):
+    partes = [parte.strip() for parte in texto.split("|")]
+    for i, parte in enumerate(partes):
+        if parte == "Bosonit" and i > 0:
+            return partes[i - 1]
+    return None
+
+
+class MeetingDetector:
+    """
+    :param inspector: object with exe(hwnd), title(hwnd), position(hwnd)
+    :param zone: callable returning the (left, top) meeting windows snap to
+    :param on_start: called with (title, latency) when a meeting appears
+    :param on_stop: called with (title, latency) when the last one goes
+    :param process: regex for the meeting executable
+    """
+
+    def __init__(self, inspector, zone, on_start, on_stop, process="teams", log=print):
+        self.inspector = inspector
+        self.zone = zone
+        self.on_start = on_start
+        self.on_stop = on_stop
+        self.process = re.compile(process, re.IGNORECASE)
+        self.log = log
+        self._lock = threading.Lock()
+        self._meetings = {}     # hwnd -> title of windows currently in the zone
+        self._last_title = None
+
+    @property
+    def active(self):
+        return bool(self._meetings)
+
+    def _matches(self, hwnd):
+        ## Cheapest check first: most events are for unrelated processes
+        exe = self.inspector.exe(hwnd)
+        if not exe or not self.process.search(exe):
+            return None
+        if self.inspector.position(hwnd) != tuple(self.zone()):
+            return None
+        return self.inspector.title(hwnd) or ""
+
+    def handle(self, kind, hwnd, timestamp=None):
+        """Process one window event; `timestamp` is its monotonic time."""
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        title = None
+        if kind not in GONE:
+            try:
+                title = self._matches(hwnd)
+            except Exception:
+                title = None
+
+        with self._lock:
+            was_active = bool(self._meetings)
+            if title is None:
+                self._meetings.pop(hwnd, None)
+            else:
+                self._meetings[hwnd] = title
+                self._last_title = title
+            is_active = bool(self._meetings)
+            last_title = self._last_title
+
+        if is_active and not was_active:
+            self.log(f"Found Teams window: {title}")
+            self.on_start(title, time.monotonic() - timestamp)
+        elif was_active and not is_active:
+            self.on_stop(last_title, time.monotonic() - timestamp)
+
+    def rescan(self, hwnds):
+        """Re-evaluate known windows, e.g. after the meeting zone moved."""
+        with self._lock:
+            candidates = set(self._meetings) | set(hwnds)
+        for hwnd in candidates:
+            self.handle(LOCATION, hwnd)
+
+
+class FakeWindowSource:
+    """In-memory windows that emit the same events as the Win32 hooks."""
+
+    def __init__(self):
+        self.windows = {}
+        self._subscribers = []
+        self._next_hwnd = 1
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def _emit(self, kind, hwnd):
+        timestamp = time.monotonic()
+        for callback in self._subscribers:
+            callback(kind, hwnd, timestamp)
+
+    def exe(self, hwnd):
+        return self.windows.get(hwnd, {}).get("exe")
+
+    def title(self, hwnd):
+        return self.windows.get(hwnd, {}).get("title")
+
+    def position(self, hwnd):
+        window = self.windows.get(hwnd)
+        return (window["left"], window["top"]) if window else None
+
+    def open(self, exe, title, left=0, top=0):
+        hwnd = self._next_hwnd
+        self._next_hwnd += 1
+        self.windows[hwnd] = {"exe": exe, "title": title, "left": left, "top": top}
+        self._emit(CREATE, hwnd)
+        self._emit(SHOW, hwnd)
+        return hwnd
+
+    def move(self, hwnd, left, top):
+        self.windows[hwnd].update(left=left, top=top)
+        self._emit(LOCATION, hwnd)
+
+    def rename(self, hwnd, title):
+        self.windows[hwnd]["title"] = title
+        self._emit(NAME, hwnd)
+
+    def close(self, hwnd):
+        self._emit(HIDE, hwnd)
+        self.windows.pop(hwnd, None)
+        self._emit(DESTROY, hwnd)
@@ -0,0 +1,251 @@
+"""
+Latency metrics for the daemon.
+
+Spans are timed with the monotonic `perf_counter_ns` clock and recorded into
+log-linear (HDR style) histograms: values below 2**SUB_BITS nanoseconds get
+their own bucket, larger values keep SUB_BITS significant bits, so every
+percentile is within 1/2**(SUB_BITS-1) (1.6 %) of the true value whatever
+the magnitude. Recording is a bit_length, a shift and a dict increment under
+an uncontended lock, cheap enough to leave on.
+
+Each metric keeps `windows` rolling windows of `window` seconds, so the
+percentiles reflect the last few minutes rather than the whole uptime;
+counts since start are kept separately.
+
+    METRICS = Metrics()
+    with METRICS.span("config.lookup"):
+        ...
+    METRICS.record("device.apply", apply_us * 1000)
+    METRICS.start_export("./metrics.json", interval=30)
+"""
+
+import collections
+import threading
+import time
+
+import jsonfile
+
+SUB_BITS = 7
+_HALF = 1 << (SUB_BITS - 1)
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def bucket_of(value):
+    """Bucket index of a non-negative integer value."""
+    if value < (1 << SUB_BITS):
+        return value
+    shift = value.bit_length() - SUB_BITS
+    return shift * _HALF + (value >> shift)
+
+
+def bucket_range(index):
+    """[low, high) of the values falling in bucket `index`."""
+    if index < (1 << SUB_BITS):
+        return index, index + 1
+    shift = index // _HALF - 1
+    mantissa = index - shift * _HALF
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class Histogram:
+    """Sparse log-linear histogram of integer values (nanoseconds here)."""
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        index = bucket_of(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent):
+        """Upper bound of the bucket holding the `percent` percentile (capped at max)."""
+        if not self.count:
+            return 0
+        rank = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(bucket_range(index)[1] - 1, self.max)
+        return self.max
+
+
+class RollingHistogram:
+    """Histogram over the last `windows` windows of `window` seconds."""
+
+    def __init__(self, window=60, windows=5, clock=time.monotonic):
+        self.window = window
+        self.clock = clock
+        self._windows = collections.deque(maxlen=windows)
+        self._current = None
+        self._current_start = None
+        self.lifetime_count = 0
+
+    def record(self, value):
+        now = self.clock()
+        if self._current is None or now - self._current_start >= self.window:
+            self._current = Histogram()
+            self._current_start = now
+            self._windows.append((now, self._current))
+        self._current.record(value)
+        self.lifetime_count += 1
+
+    def merged(self):
+        cutoff = self.clock() - self.window * self._windows.maxlen
+        merged = Histogram()
+        for start, histogram in self._windows:
+            if start >= cutoff:
+                merged.merge(histogram)
+        return merged
+
+
+class _Span:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, time.perf_counter_ns() - self.start)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Metrics:
+    """
+    Named rolling latency histograms.
+
+    :param window: seconds per rolling window
+    :param windows: windows kept (percentiles cover window * windows seconds)
+    :param enabled: when False spans and records do nothing
+    """
+
+    def __init__(self, window=60, windows=5, enabled=True, log=print):
+        self.window = window
+        self.windows = windows
+        self.enabled = enabled
+        self.log = log
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._export_timer = None
+        self._export_path = None
+        self._export_interval = None
+        self._listeners = []
+
+    def span(self, name):
+        """Context manager timing its body into `name`."""
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name)
+
+    def record(self, name, nanoseconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = RollingHistogram(self.window, self.windows)
+            histogram.record(max(0, int(nanoseconds)))
+
+    def snapshot(self):
+        """{name: {count, total, mean/max/pNN in ms}} over the rolling windows."""
+        with self._lock:
+            merged = {name: (rolling.merged(), rolling.lifetime_count)
+                      for name, rolling in self._histograms.items()}
+        result = {}
+        for name, (histogram, lifetime) in sorted(merged.items()):
+            entry = {"count": histogram.count, "total": lifetime}
+            if histogram.count:
+                entry["mean_ms"] = round(histogram.total / histogram.count / 1e6, 3)
+                for percent in PERCENTILES:
+                    entry[f"p{percent:g}_ms"] = round(histogram.percentile(percent) / 1e6, 3)
+                entry["max_ms"] = round(histogram.max / 1e6, 3)
+            result[name] = entry
+        return result
+
+    def summary_lines(self):
+        """One line per metric, for the tray menu."""
+        lines = []
+        for name, entry in self.snapshot().items():
+            if entry["count"]:
+                lines.append(f"{name}: p50 {entry['p50_ms']:.1f} / p99 {entry['p99_ms']:.1f} ms ({entry['count']})")
+        return lines
+
+    def on_export(self, callback):
+        """Call `callback()` after every periodic export (tray refresh)."""
+        self._listeners.append(callback)
+
+    def export(self, path=None):
+        """Write the snapshot as JSON to `path` (default: the export path)."""
+        path = path or self._export_path
+        if not path:
+            return
+        data = {
+            "generated": int(time.time()),
+            "uptime_s": int(time.time() - self.started),
+            "window_s": self.window * self.windows,
+            "metrics": self.snapshot(),
+        }
+        try:
+            jsonfile.write_atomic(path, data)
+        except OSError as e:
+            self.log(f"Error guardando {path}: {e}")
+
+    def start_export(self, path, interval=30.0):
+        """Export to `path` every `interval` seconds on a daemon timer."""
+        self._export_path = path
+        self._export_interval = interval
+        self._schedule_export()
+
+    def _schedule_export(self):
+        self._export_timer = threading.Timer(self._export_interval, self._timer_export)
+        self._export_timer.daemon = True
+        self._export_timer.start()
+
+    def _timer_export(self):
+        self.export()
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                self.log(f"Metrics listener failed: {e}")
+        self._schedule_export()
+
+    def close(self):
+        """Stop the export timer and write a last snapshot."""
+        if self._export_timer is not None:
+            self._export_timer.cancel()
+            self._export_timer = None
+        self.export()
@@ -0,0 +1,354 @@
+"""
+Macropad discovery and per-pad serial I/O.
+
+Pads are found by USB VID/PID among the serial ports. CircuitPython exposes
+two CDC ports per board (boot.py enables console and data) that share its
+USB serial number, the board UID printed in boot_out.txt. The data port is
+the one whose interface name says so where the OS reports it, otherwise the
+one with the higher USB interface number (`:x.N` in the port location).
+`names` in the settings gives pads a stable name by serial number (or port),
+which config.json profiles can target with `"device"`.
+
+Every pad has its own reader and writer threads, so a slow or stuck pad
+never holds up the focus loop or the other pads. Sending a config only
+replaces the pad's pending config: a pad that falls behind skips straight
+to the latest one. Configs carry a sequence number the firmware answers
+with ACK:<seq>, which times the round trip.
+
+Reconnects: ports are rescanned every `scan_interval` seconds while nothing
+happens. A port-change notification (`notify()`, WM_DEVICECHANGE on
+Windows) or a pad dropping starts a hunt instead, rescanning after
+`retry_min` seconds and doubling up to `scan_interval`, since the port
+shows up some time after the device node. The last config and toggle state
+of every pad are kept by name and replayed as soon as it is reopened, so
+it comes back as it was without waiting for a focus change.
+"""
+
+import json
+import re
+import threading
+import time
+
+DEFAULT_USB_IDS = ("32AC:*", "239A:*")   # Framework, Adafruit (CircuitPython)
+
+
+def parse_usb_id(text):
+    """(vid, pid or None) from "VID:PID" hex, "*" as PID matching any."""
+    vid, _, pid = text.partition(':')
+    return int(vid, 16), None if pid in ('', '*') else int(pid, 16)
+
+
+def interface_number(port):
+    match = re.search(r':x\.(\d+)', port.location or '')
+    return int(match.group(1)) if match else -1
+
+
+def data_ports(ports, usb_ids):
+    """The CDC data port of every macropad in `ports` (list_ports.comports() entries)."""
+    boards = {}
+    for port in ports:
+        if port.vid is None:
+            continue
+        if not any(port.vid == vid and pid in (None, port.pid) for vid, pid in usb_ids):
+            continue
+        boards.setdefault(port.serial_number or port.device, []).append(port)
+
+    found = []
+    for candidates in boards.values():
+        named = [port for port in candidates if re.search(r'CDC2|data', port.interface or '', re.IGNORECASE)]
+        if named:
+            found.append(named[0])
+        elif len(candidates) > 1:
+            ## A lone port is the console: the data port is not enabled
+            found.append(max(candidates, key=interface_number))
+    return sorted(found, key=lambda port: port.device)
+
+
+class NullConnection:
+    """Connection of a virtual pad: writes are dropped and nothing is ever read."""
+
+    def __init__(self, timeout=0.5):
+        self.timeout = timeout
+        self._closed = threading.Event()
+
+    def write(self, data):
+        if self._closed.is_set():
+            raise OSError("closed")
+        return len(data)
+
+    def readline(self):
+        if self._closed.wait(self.timeout):
+            raise OSError("closed")
+        return b''
+
+    def close(self):
+        self._closed.set()
+
+
+class Pad:
+    """
+    One connected macropad.
+
+    :param on_message: called as on_message(pad, data) for every message
+                       but ACKs, on the pad's reader thread
+    :param on_closed: called as on_closed(pad, error) once, when I/O fails
+                      or the pad is closed
+    :param on_ack: called as on_ack(pad, seq) when the pad confirms a config
+
+    Code that reads `config`/`toggles`, changes them and sends the result
+    holds `lock` throughout, so a later send can't carry an older profile.
+    """
+
+    def __init__(self, name, device, serial_number, connection, on_message, on_closed, log, metrics,
+                 on_ack=None):
+        self.name = name
+        self.device = device
+        self.serial_number = serial_number
+        self.connection = connection
+        self.on_message = on_message
+        self.on_closed = on_closed
+        self.log = log
+        self.metrics = metrics
+        self.on_ack = on_ack
+        self.config = {}
+        self.toggles = {}
+        self.program = None      # app `config` was looked up for
+        self.lock = threading.Lock()
+        self.closed = False
+        self._seq = 0
+        self._pending_acks = {}  # seq -> send time, written by the writer, popped by the reader
+        self._acks_lock = threading.Lock()
+        self._outgoing = None
+        self._cond = threading.Condition()
+        self._threads = ()
+
+    def start(self):
+        self._threads = (
+            threading.Thread(target=self._read_loop, name=f"pad-read-{self.name}", daemon=True),
+            threading.Thread(target=self._write_loop, name=f"pad-write-{self.name}", daemon=True),
+        )
+        for thread in self._threads:
+            thread.start()
+
+    def send(self, config):
+        """Queue `config` for the pad, replacing any config not yet written."""
+        with self._cond:
+            self._outgoing = config
+            self._cond.notify()
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while self._outgoing is None and not self.closed:
+                    self._cond.wait()
+                if self.closed:
+                    return
+                config, self._outgoing = self._outgoing, None
+            self._seq += 1
+            ## `config` is the pad's current profile: don't add to it, and read
+            ## it under `lock` so a toggle can't change it mid-serialization
+            with self.lock, self.metrics.span("config.serialize"):
+                command = (json.dumps(dict(config, seq=self._seq)) + '\n').encode()
+            ## Stamped before the write, the fastest ACKs can beat write() back
+            with self._acks_lock:
+                if len(self._pending_acks) > 16:
+                    self._pending_acks.clear()
+                self._pending_acks[self._seq] = time.perf_counter_ns()
+            try:
+                with self.metrics.span("serial.write"):
+                    self.connection.write(command)
+            except Exception as e:
+                self.close(e)
+                return
+
+    def _read_loop(self):
+        partial = b''
+        while not self.closed:
+            try:
+                chunk = self.connection.readline()
+            except Exception as e:
+                self.close(e)
+                return
+            if not chunk:
+                continue
+            partial += chunk
+            ## readline() gives back what it has on timeout, wait for the rest
+            if not partial.endswith(b'\n'):
+                continue
+            line, partial = partial, b''
+            try:
+                data = json.loads(line.decode('utf-8').strip())
+            except ValueError:
+                self.log(f"Linea no valida de {self.name}: {line[:80]!r}")
+                continue
+            if str(data.get('code', '')).startswith('ACK:'):
+                self._acked(data)
+                continue
+            try:
+                self.on_message(self, data)
+            except Exception as e:
+                self.log(f"Error procesando {data} de {self.name}: {e}")
+
+    def _acked(self, data):
+        seq = int(data['code'][4:])
+        with self._acks_lock:
+            sent = self._pending_acks.pop(seq, None)
+        if sent is not None:
+            self.metrics.record("device.ack", time.perf_counter_ns() - sent)
+        if 'apply_us' in data:
+            self.metrics.record("device.apply", data['apply_us'] * 1000)
+        if self.on_ack is not None:
+            self.on_ack(self, seq)
+
+    def close(self, error=None):
+        with self._cond:
+            if self.closed:
+                return
+            self.closed = True
+            self._cond.notify_all()
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+        self.on_closed(self, error)
+
+
+class PadManager:
+    """
+    Finds macropads and keeps a `Pad` open for each.
+
+    :param settings: "usb_ids" (["VID:PID", "VID:*"]), "names" ({serial
+                     number or port: name}), "ports" (ports opened as-is,
+                     e.g. ["COM4"]), "baudrate", "scan_interval" (seconds
+                     between idle scans), "retry_min" (first rescan after a
+                     change, None to only scan every scan_interval)
+    :param open_port: open_port(device, baudrate) -> serial connection
+    :param list_ports: () -> list_ports.comports() style entries
+    :param on_connect: called as on_connect(pad) once the pad is running,
+                       after its cached config (if any) has been queued
+    :param on_ack: passed on to every `Pad`
+    """
+
+    def __init__(self, settings, open_port, list_ports, on_message, on_connect, metrics, log=print,
+                 on_ack=None):
+        self.usb_ids = [parse_usb_id(usb_id) for usb_id in settings.get("usb_ids", DEFAULT_USB_IDS)]
+        self.names = settings.get("names", {})
+        self.ports = settings.get("ports", [])
+        self.baudrate = settings.get("baudrate", 115200)
+        self.scan_interval = settings.get("scan_interval", 2.0)
+        self.retry_min = settings.get("retry_min", 0.05)
+        self.open_port = open_port
+        self.list_ports = list_ports
+        self.on_message = on_message
+        self.on_connect = on_connect
+        self.metrics = metrics
+        self.log = log
+        self.on_ack = on_ack
+        self._lock = threading.Lock()
+        self._pads = {}      # device -> Pad
+        self._cache = {}     # name -> (config, toggles, program) of the last pad by that name
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def pads(self):
+        with self._lock:
+            return list(self._pads.values())
+
+    def pad(self, name):
+        """The open pad called `name`, None if there is none."""
+        for pad in self.pads():
+            if pad.name == name:
+                return pad
+        return None
+
+    def virtual(self, name):
+        """
+        A pad with no hardware behind it, for injected messages. It is not
+        started and not listed in pads(), so focus changes and stats never
+        see it; the caller closes it when done.
+        """
+        return Pad(name, f"virtual:{name}", None, NullConnection(), self.on_message,
+                   lambda pad, error: None, self.log, self.metrics, self.on_ack)
+
+    def candidates(self):
+        """[(device, serial number)] of the pads currently plugged in."""
+        found = [(port.device, port.serial_number) for port in data_ports(self.list_ports(), self.usb_ids)]
+        known = {device for device, _ in found}
+        found.extend((device, None) for device in self.ports if device not in known)
+        return found
+
+    def scan(self):
+        """Open the pads that are plugged in and not open yet; returns the new ones."""
+        opened = []
+        for device, serial_number in self.candidates():
+            with self._lock:
+                if device in self._pads:
+                    continue
+            try:
+                connection = self.open_port(device, self.baudrate)
+            except Exception as e:
+                self.log(f"No se pudo abrir {device}: {e}")
+                continue
+            name = self.names.get(serial_number) or self.names.get(device) or serial_number or device
+            pad = Pad(name, device, serial_number, connection, self.on_message, self._closed,
+                      self.log, self.metrics, self.on_ack)
+            with self._lock:
+                self._pads[device] = pad
+                cached = self._cache.get(name)
+            pad.start()
+            if cached:
+                ## Replay first: the pad shows what it showed before it dropped
+                with pad.lock:
+                    pad.config, pad.toggles, pad.program = cached
+                    pad.send(pad.config)
+            self.log(f"Macropad {name} conectado en {device}")
+            opened.append(pad)
+            self.on_connect(pad)
+        return opened
+
+    def _closed(self, pad, error):
+        with self._lock:
+            if self._pads.get(pad.device) is pad:
+                del self._pads[pad.device]
+            if pad.config:
+                self._cache[pad.name] = (pad.config, pad.toggles, pad.program)
+        if error is not None:
+            self.log(f"Macropad {pad.name} desconectado de {pad.device}: {error}")
+            ## It may be back any moment (replug, reset): hunt for it
+            self.notify()
+
+    def notify(self):
+        """Ports changed (device arrival or removal): rescan now and keep retrying."""
+        self._wake.set()
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name="pad-scan", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        retry = None
+        while not self._stop.is_set():
+            if self._wake.is_set():
+                self._wake.clear()
+                retry = self.retry_min
+            try:
+                opened = self.scan()
+            except Exception as e:
+                self.log(f"Error buscando macropads: {e}")
+                opened = ()
+            if opened or retry is None or retry >= self.scan_interval:
+                retry = None
+                delay = self.scan_interval
+            else:
+                delay = retry
+                retry *= 2
+            self._wake.wait(delay)
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        for pad in self.pads():
+            pad.close()
@@ -0,0 +1,235 @@
+"""
+Timed key sequences.
+
+A sequence is a list of steps declared in daemon.json (or a toggle's
+`strokes` in config.json):
+
+    {"keys": "control+windows+shift+f1", "hold": 0.1, "delay": 0}
+
+`keys` is pressed, released `hold` seconds later, and the next step starts
+`delay` seconds after the release. Every action is scheduled on an absolute
+monotonic deadline measured from the start of the run, so a sequence takes
+the sum of its declared holds and delays regardless of how long each
+individual key event takes. One scheduler thread serves every running
+sequence, so sequences run in parallel with each other and with the caller.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+DEFAULT_HOLD = 0.05
+
+
+def compile_steps(steps, default_hold=DEFAULT_HOLD):
+    """
+    Normalize steps into [(offset, "press"|"release"|"end", keys)] plus the
+    declared total runtime. Plain strings are taken as keys with the
+    default hold.
+    """
+    actions = []
+    offset = 0.0
+    for step in steps:
+        if isinstance(step, str):
+            step = {"keys": step}
+        keys = step.get("keys")
+        hold = float(step.get("hold", default_hold))
+        delay = float(step.get("delay", 0))
+        if keys:
+            actions.append((offset, "press", keys))
+            offset += hold
+            actions.append((offset, "release", keys))
+        else:
+            offset += hold
+        offset += delay
+    ## Trailing delays still count: close the run on its declared end
+    if actions and offset > actions[-1][0]:
+        actions.append((offset, "end", None))
+    return actions, offset
+
+
+class KeyboardBackend:
+    """Sends the actions through the `keyboard` module, imported on first use or `load()`."""
+
+    def __init__(self):
+        self.keyboard = None
+
+    def load(self):
+        if self.keyboard is None:
+            import keyboard
+            self.keyboard = keyboard
+        return self.keyboard
+
+    def press(self, keys):
+        self.load().press(keys)
+
+    def release(self, keys):
+        self.load().release(keys)
+
+
+class RecordingBackend:
+    """Stand-in backend that records (monotonic time, action, keys)."""
+
+    def __init__(self):
+        self.events = []
+
+    def press(self, keys):
+        self.events.append((time.monotonic(), "press", keys))
+
+    def release(self, keys):
+        self.events.append((time.monotonic(), "release", keys))
+
+
+class SequenceRun:
+    """Handle of one running sequence."""
+
+    def __init__(self, name, actions, declared, on_done=None):
+        self.name = name
+        self.on_done = on_done
+        self.actions = actions
+        self.declared = declared
+        self.started = None
+        self.finished = None
+        self.cancelled = False
+        self.held = set()
+        self._done = threading.Event()
+
+    @property
+    def runtime(self):
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+    @property
+    def overrun(self):
+        runtime = self.runtime
+        return None if runtime is None else runtime - self.declared
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def done(self):
+        return self._done.is_set()
+
+
+class SequenceRunner:
+    """
+    Monotonic-clock scheduler for key sequences.
+
+    :param backend: object with press(keys) / release(keys)
+    :param spin: seconds before a deadline to stop sleeping and spin, to
+                 get under the OS timer resolution
+    """
+
+    def __init__(self, backend, sequences=None, spin=0.002, log=print):
+        self.backend = backend
+        self.sequences = dict(sequences or {})
+        self.spin = spin
+        self.log = log
+        self.history = []
+        self._cond = threading.Condition()
+        self._heap = []             # (deadline, seq, run, action index)
+        self._cancelled = []        # runs to pull out of the heap
+        self._seq = itertools.count()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def define(self, name, steps):
+        self.sequences[name] = steps
+
+    def run(self, name_or_steps, name=None, on_done=None):
+        """Start a sequence (by name or as a step list) and return its handle."""
+        if isinstance(name_or_steps, str):
+            name = name_or_steps
+            steps = self.sequences.get(name)
+            if steps is None:
+                raise KeyError(f"Secuencia {name} no definida")
+        else:
+            steps = name_or_steps
+            name = name or "inline"
+
+        actions, declared = compile_steps(steps)
+        run = SequenceRun(name, actions, declared, on_done)
+        run.started = time.monotonic()
+        with self._cond:
+            if actions:
+                heapq.heappush(self._heap, (run.started + actions[0][0], next(self._seq), run, 0))
+                self._cond.notify()
+        if not actions:
+            self._finish(run)
+        return run
+
+    def cancel(self, run):
+        """Stop `run` and release whatever it is holding."""
+        with self._cond:
+            if run.done():
+                return
+            run.cancelled = True
+            self._cancelled.append(run)
+            self._cond.notify()
+
+    def _finish(self, run):
+        run.finished = time.monotonic()
+        if run.cancelled:
+            for keys in list(run.held):
+                try:
+                    self.backend.release(keys)
+                except Exception as e:
+                    self.log(f"Error liberando {keys}: {e}")
+            run.held.clear()
+        else:
+            self.history.append((run.name, run.declared, run.runtime))
+            del self.history[:-100]
+        run._done.set()
+        if run.on_done:
+            try:
+                run.on_done(run)
+            except Exception as e:
+                self.log(f"Error tras secuencia {run.name}: {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    ## Cancels wake the scheduler at once, not at the run's next deadline
+                    if self._cancelled:
+                        run = self._cancelled.pop(0)
+                        self._heap = [entry for entry in self._heap if entry[2] is not run]
+                        heapq.heapify(self._heap)
+                        break
+                    now = time.monotonic()
+                    if self._heap and self._heap[0][0] - now <= self.spin:
+                        deadline, _, run, index = heapq.heappop(self._heap)
+                        break
+                    timeout = (self._heap[0][0] - now - self.spin) if self._heap else None
+                    self._cond.wait(timeout)
+
+            if run.cancelled:
+                if not run.done():
+                    self._finish(run)
+                continue
+
+            while time.monotonic() < deadline and not run.cancelled:
+                pass
+            if run.cancelled:
+                ## Finished when its entry comes off the cancel list
+                continue
+
+            offset, action, keys = run.actions[index]
+            try:
+                if action == "press":
+                    self.backend.press(keys)
+                    run.held.add(keys)
+                elif action == "release":
+                    self.backend.release(keys)
+                    run.held.discard(keys)
+            except Exception as e:
+                self.log(f"Error en secuencia {run.name} ({action} {keys}): {e}")
+
+            if index + 1 < len(run.actions):
+                with self._cond:
+                    next_deadline = run.started + run.actions[index + 1][0]
+                    heapq.heappush(self._heap, (next_deadline, next(self._seq), run, index + 1))
+            else:
+                self._finish(run)
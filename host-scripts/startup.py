@@ -0,0 +1,92 @@
+"""
+Startup timeline of the daemon.
+
+`Startup()` is created before anything else is imported. `importing(group)`
+times a block of imports: the cumulative time, as in `-X importtime`'s
+cumulative column, and the number of modules it loaded. `mark(step)` stamps
+a milestone the first time it is reached (first focus detection, first
+config on the pad, tray up...). `report()` gives everything in ms since the
+daemon's first line ran, plus the interpreter's own start-up before that,
+taken from the OS process start time when psutil is available.
+
+For per-module detail run the daemon with `python -X importtime`.
+
+    STARTUP = Startup()
+    with STARTUP.importing("win32"):
+        import win32gui
+    STARTUP.mark("config.acked")
+    STARTUP.wait("config.acked", timeout=10)
+"""
+
+import contextlib
+import sys
+import threading
+import time
+
+
+class Startup:
+
+    def __init__(self, clock=time.perf_counter_ns):
+        self.clock = clock
+        self.started = clock()
+        self.started_wall = time.time()
+        self.imports = []       # (group, ns, modules loaded)
+        self.marks = {}         # step -> ns since started
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def elapsed_ms(self):
+        return (self.clock() - self.started) / 1e6
+
+    @contextlib.contextmanager
+    def importing(self, group):
+        """Time the imports in the block as `group`."""
+        modules = len(sys.modules)
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.imports.append((group, self.clock() - start, len(sys.modules) - modules))
+
+    def mark(self, step):
+        """Stamp `step` the first time it is reached; returns False afterwards."""
+        with self._lock:
+            if step in self.marks:
+                return False
+            self.marks[step] = self.clock() - self.started
+            event = self._events.pop(step, None)
+        if event is not None:
+            event.set()
+        return True
+
+    def wait(self, step, timeout=None):
+        """Block until `step` is marked; False on timeout."""
+        with self._lock:
+            if step in self.marks:
+                return True
+            event = self._events.setdefault(step, threading.Event())
+        return event.wait(timeout)
+
+    def interpreter_ms(self):
+        """Process start to the first line of the daemon, None if unknown."""
+        try:
+            import psutil
+            return round(max(0.0, self.started_wall - psutil.Process().create_time()) * 1000, 1)
+        except Exception:
+            return None
+
+    def import_lines(self):
+        """The import groups as `-X importtime` style lines."""
+        lines = ["import time: cumulative [us] | modules | group"]
+        for group, ns, modules in self.imports:
+            lines.append(f"import time: {ns // 1000:>16} | {modules:>7} | {group}")
+        return lines
+
+    def report(self):
+        with self._lock:
+            marks = sorted(self.marks.items(), key=lambda entry: entry[1])
+        return {
+            "interpreter_ms": self.interpreter_ms(),
+            "imports_ms": {group: round(ns / 1e6, 3) for group, ns, _ in self.imports},
+            "steps_ms": {step: round(ns / 1e6, 3) for step, ns in marks},
+        }
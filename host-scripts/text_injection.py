@@ -0,0 +1,326 @@
+"""
+Text injection for MSG:TYPE.
+
+Text is turned into Unicode key events (KEYEVENTF_UNICODE on Windows), so
+the active keyboard layout does not matter, and submitted in a few large
+batches instead of one synthetic event per character. Long strings are
+pasted through the clipboard instead, restoring the previous clipboard
+contents afterwards; when the clipboard holds anything but text (an image,
+files, rich text) the string is typed instead, since only text could be
+put back.
+
+Backends only see ready-made event batches; `RecordingBackend` stands in
+for SendInput so strategies and throughput can be measured off Windows.
+"""
+
+import threading
+import time
+
+UNICODE = "unicode"
+VK = "vk"
+
+VK_RETURN = 0x0D
+VK_TAB = 0x09
+VK_CONTROL = 0x11
+VK_V = 0x56
+
+## Characters sent as virtual keys: apps treat Unicode CR/TAB inconsistently
+SPECIAL_KEYS = {"\n": VK_RETURN, "\t": VK_TAB}
+
+
+def text_events(text):
+    """Key down/up events for `text`, as (kind, code, key_up) tuples."""
+    events = []
+    for char in text:
+        if char == "\r":
+            continue
+        vk = SPECIAL_KEYS.get(char)
+        if vk is not None:
+            events.append((VK, vk, False))
+            events.append((VK, vk, True))
+            continue
+        encoded = char.encode("utf-16-le")
+        units = [int.from_bytes(encoded[i:i + 2], "little") for i in range(0, len(encoded), 2)]
+        ## Surrogate pairs: both downs, then both ups
+        for unit in units:
+            events.append((UNICODE, unit, False))
+        for unit in units:
+            events.append((UNICODE, unit, True))
+    return events
+
+
+def batches(events, batch_size):
+    for i in range(0, len(events), batch_size):
+        yield events[i:i + batch_size]
+
+
+class SendInputBackend:
+    """Submits event batches with one SendInput call each."""
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+
+        ULONG_PTR = ctypes.c_size_t
+
+        class KEYBDINPUT(ctypes.Structure):
+            _fields_ = [("wVk", wintypes.WORD), ("wScan", wintypes.WORD),
+                        ("dwFlags", wintypes.DWORD), ("time", wintypes.DWORD),
+                        ("dwExtraInfo", ULONG_PTR)]
+
+        class MOUSEINPUT(ctypes.Structure):
+            _fields_ = [("dx", wintypes.LONG), ("dy", wintypes.LONG),
+                        ("mouseData", wintypes.DWORD), ("dwFlags", wintypes.DWORD),
+                        ("time", wintypes.DWORD), ("dwExtraInfo", ULONG_PTR)]
+
+        class _INPUTUNION(ctypes.Union):
+            _fields_ = [("ki", KEYBDINPUT), ("mi", MOUSEINPUT)]
+
+        class INPUT(ctypes.Structure):
+            _fields_ = [("type", wintypes.DWORD), ("u", _INPUTUNION)]
+
+        self.ctypes = ctypes
+        self.INPUT = INPUT
+        self.user32 = ctypes.windll.user32
+
+    INPUT_KEYBOARD = 1
+    KEYEVENTF_KEYUP = 0x0002
+    KEYEVENTF_UNICODE = 0x0004
+
+    def submit(self, batch):
+        inputs = (self.INPUT * len(batch))()
+        for i, (kind, code, key_up) in enumerate(batch):
+            ki = inputs[i].u.ki
+            inputs[i].type = self.INPUT_KEYBOARD
+            flags = self.KEYEVENTF_KEYUP if key_up else 0
+            if kind == UNICODE:
+                ki.wScan = code
+                flags |= self.KEYEVENTF_UNICODE
+            else:
+                ki.wVk = code
+            ki.dwFlags = flags
+        sent = self.user32.SendInput(len(batch), inputs, self.ctypes.sizeof(self.INPUT))
+        return sent == len(batch)
+
+
+class Win32Clipboard:
+    """Unicode text access to the Windows clipboard; win32clipboard is imported on first use or `load()`."""
+
+    def __init__(self):
+        self.cb = None
+
+    def load(self):
+        if self.cb is None:
+            import win32clipboard
+            import win32con
+            self.format = win32con.CF_UNICODETEXT
+            ## Windows synthesizes the other text formats (and the locale) from any one of them
+            self.text_formats = {win32con.CF_UNICODETEXT, win32con.CF_TEXT, win32con.CF_OEMTEXT, win32con.CF_LOCALE}
+            self.cb = win32clipboard
+        return self.cb
+
+    def text_only(self):
+        """True if the clipboard is empty or holds nothing but plain text."""
+        self.load()
+        self.cb.OpenClipboard()
+        try:
+            clipboard_format = self.cb.EnumClipboardFormats(0)
+            while clipboard_format:
+                if clipboard_format not in self.text_formats:
+                    return False
+                clipboard_format = self.cb.EnumClipboardFormats(clipboard_format)
+            return True
+        finally:
+            self.cb.CloseClipboard()
+
+    def get(self):
+        self.load()
+        self.cb.OpenClipboard()
+        try:
+            if self.cb.IsClipboardFormatAvailable(self.format):
+                return self.cb.GetClipboardData(self.format)
+            return None
+        finally:
+            self.cb.CloseClipboard()
+
+    def set(self, text):
+        self.load()
+        self.cb.OpenClipboard()
+        try:
+            self.cb.EmptyClipboard()
+            if text is not None:
+                self.cb.SetClipboardData(self.format, text)
+        finally:
+            self.cb.CloseClipboard()
+
+
+class RecordingBackend:
+    """Stand-in for SendInput: keeps every batch, optional cost per call."""
+
+    def __init__(self, call_cost=0.0, event_cost=0.0):
+        self.call_cost = call_cost
+        self.event_cost = event_cost
+        self.batches = []
+
+    def submit(self, batch):
+        self.batches.append(list(batch))
+        cost = self.call_cost + self.event_cost * len(batch)
+        if cost:
+            time.sleep(cost)
+        return True
+
+    def typed(self):
+        """Text reconstructed from the recorded key downs."""
+        units = bytearray()
+        out = []
+        for batch in self.batches:
+            for kind, code, key_up in batch:
+                if key_up:
+                    continue
+                if kind == UNICODE:
+                    units += code.to_bytes(2, "little")
+                    continue
+                if units:
+                    out.append(units.decode("utf-16-le"))
+                    units = bytearray()
+                out.append({VK_RETURN: "\n", VK_TAB: "\t"}.get(code, ""))
+        if units:
+            out.append(units.decode("utf-16-le"))
+        return "".join(out)
+
+
+class MemoryClipboard:
+    """Stand-in clipboard; `other` stands for non-text contents (an image...)."""
+
+    def __init__(self, text=None, other=None):
+        self.text = text
+        self.other = other
+
+    def text_only(self):
+        return self.other is None
+
+    def get(self):
+        return self.text
+
+    def set(self, text):
+        self.text = text
+        self.other = None
+
+
+class TextInjector:
+    """
+    Picks the injection strategy by length.
+
+    :param backend: object with submit(batch) -> bool
+    :param clipboard: object with text_only()/get()/set(text), or None to never paste
+    :param paste_threshold: strings at least this long are pasted
+    :param batch_size: events per submission (2 per character)
+    :param restore_delay: seconds before the old clipboard is put back,
+                          the target app reads the clipboard asynchronously
+    """
+
+    def __init__(self, backend, clipboard=None, paste_threshold=200, batch_size=512, restore_delay=0.3, log=print):
+        self.backend = backend
+        self.clipboard = clipboard
+        self.paste_threshold = paste_threshold
+        self.batch_size = batch_size
+        self.restore_delay = restore_delay
+        self.log = log
+        self._lock = threading.Lock()
+        self._restore_timer = None
+        self._saved_clipboard = None
+
+    def strategy(self, text):
+        if self.clipboard is not None and len(text) >= self.paste_threshold:
+            return "paste"
+        return "unicode"
+
+    def inject(self, text):
+        """Type `text`; returns (strategy, submissions)."""
+        if not text:
+            return None, 0
+        strategy = self.strategy(text)
+        if strategy == "paste":
+            try:
+                if self._paste(text):
+                    return strategy, 1
+            except Exception as e:
+                self.log(f"Clipboard paste failed, typing instead: {e}")
+            strategy = "unicode"
+        submissions = 0
+        for batch in batches(text_events(text), self.batch_size):
+            self.backend.submit(batch)
+            submissions += 1
+        return strategy, submissions
+
+    def _paste(self, text):
+        """Paste `text`; False, with nothing touched, if the clipboard can't be restored after."""
+        with self._lock:
+            ## Keep the user's clipboard from before a run of pastes, not ours
+            if self._restore_timer is not None:
+                self._restore_timer.cancel()
+            elif not self.clipboard.text_only():
+                return False
+            else:
+                self._saved_clipboard = self.clipboard.get()
+            self.clipboard.set(text)
+            self.backend.submit([
+                (VK, VK_CONTROL, False), (VK, VK_V, False),
+                (VK, VK_V, True), (VK, VK_CONTROL, True),
+            ])
+            ## A timer that already fired and waits on the lock sees it was replaced
+            timer = threading.Timer(self.restore_delay, self._restore)
+            timer.args = (timer,)
+            timer.daemon = True
+            self._restore_timer = timer
+            timer.start()
+        return True
+
+    def _restore(self, timer):
+        with self._lock:
+            if self._restore_timer is not timer:
+                return
+            self._restore_timer = None
+            try:
+                self.clipboard.set(self._saved_clipboard)
+            except Exception as e:
+                self.log(f"Could not restore clipboard: {e}")
+            self._saved_clipboard = None
+
+
+def benchmark(lengths=(16, 64, 256, 1024, 4096), call_cost=0.0005, event_cost=0.00001, paste_threshold=200):
+    """
+    Throughput of per-character submission vs batched Unicode vs paste,
+    against `RecordingBackend` with the given per-call/per-event costs.
+    Returns rows of (length, strategy, submissions, seconds, chars/s).
+    """
+    rows = []
+    for length in lengths:
+        text = ("Hola, qué tal? 0123456789 ñandú €\n" * (length // 32 + 1))[:length]
+
+        ## Baseline: what keyboard.write() does, one submission per event
+        backend = RecordingBackend(call_cost, event_cost)
+        start = time.perf_counter()
+        for event in text_events(text):
+            backend.submit([event])
+        elapsed = time.perf_counter() - start
+        rows.append((length, "per-event", len(backend.batches), elapsed, length / elapsed))
+
+        for clipboard in (None, MemoryClipboard("previous")):
+            backend = RecordingBackend(call_cost, event_cost)
+            injector = TextInjector(backend, clipboard, paste_threshold, restore_delay=0)
+            start = time.perf_counter()
+            strategy, submissions = injector.inject(text)
+            elapsed = time.perf_counter() - start
+            if clipboard is None:
+                assert backend.typed() == text.replace("\r", "")
+            elif strategy != "paste":
+                continue
+            rows.append((length, strategy, submissions, elapsed, length / elapsed))
+    return rows
+
+
+if __name__ == "__main__":
+    print(f"{'chars':>6} {'strategy':>10} {'calls':>6} {'ms':>9} {'chars/s':>12}")
+    for length, strategy, submissions, elapsed, rate in benchmark():
+        print(f"{length:>6} {strategy:>10} {submissions:>6} {elapsed * 1000:>9.2f} {rate:>12.0f}")
@@ -0,0 +1,179 @@
+"""
+Zone resolution for MSG:SCREEN snaps.
+
+Turns the percentage `areas` of zones.json into final pixel rectangles for
+a given monitor topology in one pass, so a snap is a dictionary lookup plus
+an optional per-app delta. Nothing in here touches Win32: monitors are plain
+(device_id, (left, top, right, bottom)) work rects, which keeps the engine
+usable with synthetic layouts on any platform.
+"""
+
+import json
+import os
+
+
+def resolve_monitor_alias(target_alias, monitors, hardware_map, log=print):
+    """Work rect for `target_alias`, falling back to any unknown monitor."""
+
+    # Lookup the monitor rectangle by its alias
+    target_hw_id_part = None
+    active_ids = {dev_id for dev_id, _ in monitors}
+    for hw_id, alias in hardware_map.items():
+        # Allow same monitor with multiple indices
+        hw_id = hw_id.split('_')[0]
+
+        # Discard monitors that are not currently active
+        if hw_id not in active_ids:
+            continue
+        # Look for the target
+        if alias == target_alias:
+            target_hw_id_part = hw_id
+            break
+
+    ## Try to find the monitor by its hardware ID part
+    if target_hw_id_part:
+        for dev_id, work_rect in monitors:
+            if target_hw_id_part in dev_id:
+                return tuple(work_rect)
+
+    # If not found, try to fallback to any unknown monitor
+    if target_alias:
+        log(f"Monitor oficial para '{target_alias}' no encontrado. Buscando monitor extraño...")
+
+        known_ids = list(hardware_map.keys())
+        for dev_id, work_rect in monitors:
+            is_known = any(kid in dev_id for kid in known_ids)
+            if not is_known:
+                log(f"FALLBACK: Asignando monitor desconocido ({dev_id}) a '{target_alias}'")
+                return tuple(work_rect)
+
+    log(f"Monitor para '{target_alias}' no encontrado ni reemplazable.")
+    return None
+
+
+def zone_canvas(start_rect, end_rect):
+    """Union of both monitors, or just the start one when the end is missing."""
+    if not end_rect:
+        return start_rect
+    s_left, s_top, s_right, s_bottom = start_rect
+    e_left, e_top, e_right, e_bottom = end_rect
+    return (min(s_left, e_left), min(s_top, e_top), max(s_right, e_right), max(s_bottom, e_bottom))
+
+
+def zone_rect(zone, canvas, border_offset):
+    """Pixel (x, y, w, h) for a zone on `canvas`, border offset included."""
+    canvas_left, canvas_top, canvas_right, canvas_bottom = canvas
+    canvas_width = canvas_right - canvas_left
+    canvas_height = canvas_bottom - canvas_top
+
+    raw_x = canvas_left + int(canvas_width * (zone['min_x'] / 100))
+    raw_y = canvas_top + int(canvas_height * (zone['min_y'] / 100))
+    raw_x2 = canvas_left + int(canvas_width * (zone['max_x'] / 100))
+    raw_y2 = canvas_top + int(canvas_height * (zone['max_y'] / 100))
+
+    return (
+        raw_x + border_offset.get("x", 0),
+        raw_y + border_offset.get("y", 0),
+        raw_x2 - raw_x + border_offset.get("w", 0),
+        raw_y2 - raw_y + border_offset.get("h", 0)
+    )
+
+
+class ZoneTable:
+    """
+    Final rectangles for every zone of one zones.json under one topology.
+
+    :param data: parsed zones.json
+    :param monitors: list of (device_id, work_rect) for the active monitors
+    :param hostname: selects `offsets-<hostname>` over `offsets-default`
+    """
+
+    def __init__(self, data, monitors, hostname, log=print):
+        self.areas = data.get("areas", {})
+        self.hardware_map = data.get("hardware_mapping", {})
+        self.app_overrides = data.get("app_overrides", {})
+        self.border_offset = data.get(f"offsets-{hostname}", data.get("offsets-default", {}))
+        self.monitors = tuple((dev_id, tuple(rect)) for dev_id, rect in monitors)
+
+        aliases = set()
+        for zone in self.areas.values():
+            aliases.add(zone.get('monitor'))
+            aliases.add(zone.get('monitor_end', zone.get('monitor')))
+        aliases.discard(None)
+        self.alias_rects = {
+            alias: resolve_monitor_alias(alias, self.monitors, self.hardware_map, log)
+            for alias in sorted(aliases)
+        }
+
+        self.rects = {}
+        self.teams_zones = set()
+        for zone_key, zone in self.areas.items():
+            start_rect = self.alias_rects.get(zone.get('monitor'))
+            if not start_rect:
+                log(f"Monitor de inicio '{zone.get('monitor')}' no encontrado para zona {zone_key}.")
+                continue
+            end_alias = zone.get('monitor_end', zone['monitor'])
+            end_rect = self.alias_rects.get(end_alias)
+            if not end_rect:
+                log(f"Single Monitor Fallback: '{end_alias}' no detectado. Zona {zone_key} usa solo '{zone['monitor']}'.")
+            self.rects[zone_key] = zone_rect(zone, zone_canvas(start_rect, end_rect), self.border_offset)
+            if zone.get("is_teams_zone", False):
+                self.teams_zones.add(zone_key)
+
+        self._deltas = {}
+
+    def app_delta(self, app_name):
+        """Cached (dx, dy, dw, dh) from app_overrides for `app_name`."""
+        delta = self._deltas.get(app_name)
+        if delta is None:
+            adj = self.app_overrides.get(app_name, {})
+            delta = (adj.get("x", 0), adj.get("y", 0), adj.get("w", 0), adj.get("h", 0))
+            self._deltas[app_name] = delta
+        return delta
+
+    def lookup(self, zone_key, app_name=None):
+        """Final (x, y, w, h) for `zone_key` and the given executable, or None."""
+        rect = self.rects.get(zone_key)
+        if rect is None or not app_name:
+            return rect
+        dx, dy, dw, dh = self.app_delta(app_name)
+        if not (dx or dy or dw or dh):
+            return rect
+        return (rect[0] + dx, rect[1] + dy, rect[2] + dw, rect[3] + dh)
+
+
+class ZoneEngine:
+    """
+    Holds the ZoneTable for the current topology and rebuilds it only when
+    the monitor list or the zones file changes.
+    """
+
+    def __init__(self, path="zones.json", hostname="", log=print):
+        self.path = path
+        self.hostname = hostname
+        self.log = log
+        self.data = {}
+        self._mtime = None
+        self._table = None
+
+    def reload(self):
+        """Re-read the zones file; returns True if it changed."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime == self._mtime and self._mtime is not None:
+            return False
+        with open(self.path, "r") as f:
+            self.data = json.load(f)
+        self._mtime = mtime
+        self._table = None
+        return True
+
+    def table(self, monitors):
+        """ZoneTable for `monitors`, reusing the cached one when nothing changed."""
+        self.reload()
+        monitors = tuple((dev_id, tuple(rect)) for dev_id, rect in monitors)
+        if self._table is None or self._table.monitors != monitors:
+            self._table = ZoneTable(self.data, monitors, self.hostname, self.log)
+        return self._table
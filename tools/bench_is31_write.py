@@ -0,0 +1,81 @@
+"""
+IS31FL3743.write(mapping, buffer), the IS31FL3743_PixelBuf refresh path.
+
+Builds a PixelBuf style mapping for the pad's keys (3 bytes per key, blue,
+green and red registers, plus an unmapped pixel) and refreshes all LEDs:
+
+    per-channel  the previous write(): self[mapping[pos]] = data for every
+                 entry, then show()
+    compiled     write() with the mapping compiled into register runs
+
+both buffered and unbuffered, checking the PWM registers end up the same,
+and prints I2C transactions, bytes, modelled bus time and CPython time per
+refresh.
+
+    python tools/bench_is31_write.py
+"""
+
+import time
+
+import fake_hw
+
+fake_hw.install()
+
+import framework_is31fl3743  # noqa: E402
+import led_matrix  # noqa: E402
+
+REPEAT = 200
+
+
+def pixel_mapping():
+    mapping = []
+    for key in sorted(led_matrix.MATRIX_LED_MAP):
+        blue = led_matrix.MATRIX_LED_MAP[key]
+        mapping += [blue, blue + 1, blue + 2]
+    mapping += [framework_is31fl3743.UNMAPPED] * 3
+    return tuple(mapping)
+
+
+def per_channel(is31, mapping, buffer):
+    for pos, data in enumerate(buffer):
+        if mapping[pos] != 65535:
+            is31[mapping[pos]] = data
+    is31.show()
+
+
+def compiled(is31, mapping, buffer):
+    is31.write(mapping, buffer)
+
+
+def run(allocate, method, mapping, buffer):
+    bus = fake_hw.FakeI2C()
+    is31 = framework_is31fl3743.IS31FL3743(bus, allocate=allocate)
+    method(is31, mapping, buffer)  # page select, mapping compile
+    bus.reset_stats()
+    method(is31, mapping, buffer)
+    transactions, size, bus_time = len(bus.transactions), bus.bytes, bus.bus_time
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        method(is31, mapping, buffer)
+    cpu = (time.perf_counter() - start) / REPEAT
+    return transactions, size, bus_time, cpu, bytes(bus.pwm)
+
+
+def main():
+    mapping = pixel_mapping()
+    buffer = bytes((7 * pos + 11) & 0xFF for pos in range(len(mapping)))
+    segments, blocks = framework_is31fl3743.compile_mapping(mapping)
+    print(f"{len(mapping)} entries -> {len(segments)} segments, {len(blocks)} blocks")
+    print(f"{'buffering':<11} {'write':<12} {'xfers':>6} {'bytes':>6} {'bus ms':>7} {'cpu us':>7}")
+    for label, allocate in (("buffered", framework_is31fl3743.PREFER_BUFFER),
+                            ("unbuffered", framework_is31fl3743.NO_BUFFER)):
+        frames = set()
+        for name, method in (("per-channel", per_channel), ("compiled", compiled)):
+            transactions, size, bus_time, cpu, pwm = run(allocate, method, mapping, buffer)
+            frames.add(pwm)
+            print(f"{label:<11} {name:<12} {transactions:>6} {size:>6} {bus_time * 1000:>7.2f} {cpu * 1e6:>7.0f}")
+        assert len(frames) == 1, f"{label}: PWM registers differ"
+
+
+if __name__ == "__main__":
+    main()
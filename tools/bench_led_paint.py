@@ -0,0 +1,74 @@
+"""
+Repaint cost of led_matrix.LedMatrix on the emulated IS31FL3743.
+
+Walks through the profiles in host-scripts/config.json (after default.json,
+as after boot), then toggles a single key color, painting each step three
+ways:
+
+    unbuffered  every mapped channel written with its own transaction
+    full        buffered, whole frame pushed with one show()
+    diff        buffered, only changed channels, merged block writes
+
+checks all three leave the same PWM registers, and prints I2C transactions,
+bytes and modelled bus time per step.
+
+    python tools/bench_led_paint.py
+"""
+
+import json
+import os
+
+import fake_hw
+
+fake_hw.install()
+
+import framework_is31fl3743  # noqa: E402
+import led_matrix  # noqa: E402
+
+
+def steps():
+    with open(os.path.join(fake_hw.BOARD, "default.json")) as file:
+        yield "default.json", json.load(file).get("colors", {})
+    with open(os.path.join(fake_hw.ROOT, "host-scripts", "config.json")) as file:
+        configs = json.load(file)
+    colors = {}
+    for name, profile in configs.items():
+        colors = profile.get("colors", {})
+        yield name, colors
+    toggled = dict(colors)
+    toggled["a2"] = "00ff00" if toggled.get("a2") != "00ff00" else "ffff00"
+    yield "toggle a2", toggled
+
+
+def run(allocate, diff):
+    bus = fake_hw.FakeI2C()
+    is31 = framework_is31fl3743.IS31FL3743(bus, allocate=allocate)
+    matrix = led_matrix.LedMatrix(is31, led_matrix.MATRIX_LED_MAP)
+    rows = []
+    for name, colors in steps():
+        if not diff:
+            matrix.synced = False
+        bus.reset_stats()
+        matrix.paint(colors)
+        rows.append((name, len(bus.transactions), bus.bytes, bus.bus_time, bytes(bus.pwm)))
+    return rows
+
+
+def main():
+    modes = (
+        ("unbuffered", framework_is31fl3743.NO_BUFFER, False),
+        ("full", framework_is31fl3743.PREFER_BUFFER, False),
+        ("diff", framework_is31fl3743.PREFER_BUFFER, True),
+    )
+    results = {label: run(allocate, diff) for label, allocate, diff in modes}
+    print(f"{'step':<32} {'mode':<11} {'xfers':>6} {'bytes':>6} {'bus ms':>8}")
+    for index, (name, *_) in enumerate(results["unbuffered"]):
+        for label, *_ in modes:
+            _, transactions, size, bus_time, _ = results[label][index]
+            print(f"{name[:32]:<32} {label:<11} {transactions:>6} {size:>6} {bus_time * 1000:>8.2f}")
+        frames = {results[label][index][4] for label, *_ in modes}
+        assert len(frames) == 1, f"{name}: frames differ"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Replug-to-usable time of a macropad, with a pty standing in for its port.
+
+The daemon side is the real PadManager opening the pty's slave end with
+pyserial; the pad side is a thread on the master end that answers every
+config with ACK:<seq>, like code.py. A replug closes the pty (the daemon's
+reads fail, as when the cable is pulled), waits a random time and creates
+a new one under the same USB serial number. Measured from the new port
+showing up to the pad receiving its config, for:
+
+    poll      the previous behaviour: a scan every scan_interval, nothing
+              cached, so the config is looked up again and toggle states
+              are lost
+    backoff   a dropped pad starts a hunt (retry_min doubling), the cached
+              config and toggles are replayed on open
+    notify    as backoff, plus a port-change notification when the port
+              appears (WM_DEVICECHANGE on Windows)
+
+Linux/macOS only (os.openpty); needs pyserial.
+
+    python tools/bench_pad_reconnect.py [replugs]
+"""
+
+import json
+import os
+import random
+import select
+import statistics
+import sys
+import threading
+import time
+import tty
+import types
+
+import serial
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "host-scripts"))
+
+import metrics  # noqa: E402
+import pad_devices  # noqa: E402
+
+PROGRAM = "code.exe"
+TOGGLE_ON = "00FF00"
+TOGGLE_OFF = "FF0000"
+SCAN_INTERVAL = 2.0
+
+
+class PtyPad:
+    """Pad end of a pty: answers every config line with its ACK."""
+
+    def __init__(self):
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.device = os.ttyname(self.slave)
+        self.configs = []           # (perf_counter, config)
+        self.received = threading.Event()
+        self._unplugged = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        partial = b''
+        while not self._unplugged:
+            if not select.select([self.master], [], [], 0.01)[0]:
+                continue
+            try:
+                chunk = os.read(self.master, 4096)
+            except OSError:
+                return
+            if not chunk:
+                return
+            partial += chunk
+            while b'\n' in partial:
+                line, partial = partial.split(b'\n', 1)
+                config = json.loads(line)
+                self.configs.append((time.perf_counter(), config))
+                self.received.set()
+                os.write(self.master, (json.dumps({"code": f"ACK:{config['seq']}", "apply_us": 900}) + '\n').encode())
+
+    def unplug(self):
+        ## A read blocked on the master would keep it open: stop the thread first
+        self._unplugged = True
+        self._thread.join()
+        os.close(self.slave)
+        os.close(self.master)
+
+
+class NoReplayManager(pad_devices.PadManager):
+    def _closed(self, pad, error):
+        super()._closed(pad, error)
+        self._cache.clear()
+
+
+def lookup(pad):
+    colors = {"b1": TOGGLE_ON if pad.toggles.get("b1") else TOGGLE_OFF, "b2": "0000FF"}
+    return {"colors": colors}
+
+
+def run(mode, replugs):
+    state = types.SimpleNamespace(port=None)
+    pad_end = PtyPad()
+
+    def list_ports():
+        if state.port is None:
+            return []
+        return [state.port]
+
+    def plug(pad_end):
+        state.port = types.SimpleNamespace(
+            device=pad_end.device, serial_number="BENCH", vid=0x32AC, pid=0x0012,
+            interface="CircuitPython CDC2 data", location=None)
+
+    def on_connect(pad):
+        if pad.program != PROGRAM:
+            pad.config = lookup(pad)
+            pad.program = PROGRAM
+            pad.send(pad.config)
+
+    settings = {"scan_interval": SCAN_INTERVAL, "retry_min": None if mode == "poll" else 0.05}
+    manager_class = NoReplayManager if mode == "poll" else pad_devices.PadManager
+    manager = manager_class(
+        settings,
+        lambda device, baudrate: serial.Serial(device, baudrate, timeout=0.5),
+        list_ports,
+        lambda pad, data: None,
+        on_connect,
+        metrics.Metrics(),
+        log=lambda message: None,
+    )
+    plug(pad_end)
+    manager.start()
+    if not pad_end.received.wait(5):
+        raise RuntimeError("pad never configured")
+    ## The user toggles b1 on: the daemon updates the pad's state and resends
+    pad = manager.pads()[0]
+    pad.toggles["b1"] = True
+    pad.config = lookup(pad)
+    pad.send(pad.config)
+    time.sleep(0.1)
+
+    times = []
+    kept = 0
+    for _ in range(replugs):
+        state.port = None
+        pad_end.unplug()
+        while manager.pads():
+            time.sleep(0.005)
+        time.sleep(random.uniform(0.2, 1.5))
+
+        pad_end = PtyPad()
+        plug(pad_end)
+        appeared = time.perf_counter()
+        if mode == "notify":
+            manager.notify()
+        if not pad_end.received.wait(SCAN_INTERVAL * 3):
+            raise RuntimeError("pad not configured after replug")
+        received, config = pad_end.configs[0]
+        times.append(received - appeared)
+        kept += config["colors"]["b1"] == TOGGLE_ON
+        time.sleep(0.05)
+
+    manager.close()
+    pad_end.unplug()
+    return times, kept
+
+
+def main():
+    replugs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    print(f"{replugs} replugs per mode, scan_interval {SCAN_INTERVAL:g} s")
+    for mode in ("poll", "backoff", "notify"):
+        times, kept = run(mode, replugs)
+        ms = sorted(t * 1000 for t in times)
+        print(f"{mode:<8} replug to config p50 {statistics.median(ms):7.1f} ms  max {ms[-1]:7.1f} ms  "
+              f"toggle state kept {kept}/{replugs}")
+
+
+if __name__ == "__main__":
+    main()
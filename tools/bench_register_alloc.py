@@ -0,0 +1,133 @@
+"""
+Allocations per register access, adafruit_register vs adafruit_register.i2c_prealloc.
+
+Each register kind is declared on a device over the emulated bus, once from
+the upstream modules and once from the preallocated variants, and accessed
+repeatedly after a warm-up access. The objects the register code creates
+per access (bytearray / memoryview buffers, range / reversed iterators,
+struct.calcsize calls) are counted by swapping those names in the register
+modules for counting wrappers; the value returned (an int or a tuple) is not
+counted. StructArray is also read and written as a 16 element block, element
+by element upstream and with readinto() / write() in the variant.
+
+On the pad itself the same comparison is `gc.mem_alloc()` before and after
+a loop of accesses.
+
+    python tools/bench_register_alloc.py
+"""
+
+import builtins
+import collections
+import struct
+import types
+
+import fake_hw
+
+fake_hw.install()
+
+from adafruit_register import i2c_bit, i2c_bits, i2c_prealloc, i2c_struct, i2c_struct_array  # noqa: E402
+
+ACCESSES = 1000
+BLOCK = 16
+COUNTED = ("bytearray", "memoryview", "range", "reversed")
+
+counts = collections.Counter()
+
+
+def counting(name, function):
+    def wrapper(*args, **kwargs):
+        counts[name] += 1
+        return function(*args, **kwargs)
+    return wrapper
+
+
+def instrument(module):
+    for name in COUNTED:
+        setattr(module, name, counting(name, getattr(builtins, name)))
+    if hasattr(module, "struct"):
+        proxy = types.ModuleType("struct")
+        proxy.__dict__.update(vars(struct))
+        proxy.calcsize = counting("calcsize", struct.calcsize)
+        module.struct = proxy
+
+
+for module in (i2c_bit, i2c_bits, i2c_prealloc, i2c_struct, i2c_struct_array):
+    instrument(module)
+
+
+def device(struct_module, array_module, bit_module, bits_module):
+    class Device:
+        byte = struct_module.UnaryStruct(0x10, "<B")
+        word = struct_module.UnaryStruct(0x12, "<H")
+        pair = struct_module.Struct(0x14, "<BB")
+        array = array_module.StructArray(0x20, "<B", 64)
+        flag = bit_module.RWBit(0x16, 3)
+        field = bits_module.RWBits(4, 0x18, 6, register_width=2)
+
+        def __init__(self):
+            self.bus = fake_hw.FakeI2C()
+            self.i2c_device = fake_hw.I2CDevice(self.bus, 0x20)
+    return Device()
+
+
+def upstream_block(dev, values):
+    for index, value in enumerate(values):
+        dev.array[index] = (value,)
+    return [dev.array[index][0] for index in range(len(values))]
+
+
+BLOCK_OUT = bytearray(1 + BLOCK)   # [0] is the register address slot
+BLOCK_IN = bytearray(BLOCK)
+
+
+def prealloc_block(dev, values):
+    BLOCK_OUT[1:] = bytes(values)
+    dev.array.write(BLOCK_OUT)
+    dev.array.readinto(BLOCK_IN)
+    return list(BLOCK_IN)
+
+
+OPERATIONS = (
+    ("UnaryStruct <B get", lambda dev: dev.byte),
+    ("UnaryStruct <B set", lambda dev: setattr(dev, "byte", 0x5A)),
+    ("UnaryStruct <H get", lambda dev: dev.word),
+    ("UnaryStruct <H set", lambda dev: setattr(dev, "word", 0x1234)),
+    ("Struct <BB get", lambda dev: dev.pair),
+    ("Struct <BB set", lambda dev: setattr(dev, "pair", (1, 2))),
+    ("StructArray item get", lambda dev: dev.array[5]),
+    ("StructArray item set", lambda dev: dev.array.__setitem__(5, (7,))),
+    ("RWBit get", lambda dev: dev.flag),
+    ("RWBit set", lambda dev: setattr(dev, "flag", True)),
+    ("RWBits 16-bit get", lambda dev: dev.field),
+    ("RWBits 16-bit set", lambda dev: setattr(dev, "field", 9)),
+)
+
+
+def measure(dev, operation):
+    operation(dev)  # first access allocates the per-instance buffers
+    counts.clear()
+    dev.bus.reset_stats()
+    for _ in range(ACCESSES):
+        operation(dev)
+    return sum(counts.values()) / ACCESSES, len(dev.bus.transactions) / ACCESSES
+
+
+def main():
+    upstream = device(i2c_struct, i2c_struct_array, i2c_bit, i2c_bits)
+    prealloc = device(i2c_prealloc, i2c_prealloc, i2c_prealloc, i2c_prealloc)
+    print(f"{'register access':<24} {'upstream allocs':>15} {'prealloc allocs':>15} {'xfers':>6}")
+    for label, operation in OPERATIONS:
+        before, _ = measure(upstream, operation)
+        after, transactions = measure(prealloc, operation)
+        print(f"{label:<24} {before:>15.1f} {after:>15.1f} {transactions:>6.0f}")
+
+    values = list(range(100, 100 + BLOCK))
+    assert upstream_block(upstream, values) == prealloc_block(prealloc, values) == values
+    before, before_xfers = measure(upstream, lambda dev: upstream_block(dev, values))
+    after, after_xfers = measure(prealloc, lambda dev: prealloc_block(dev, values))
+    print(f"{f'StructArray {BLOCK} set+get':<24} {before:>15.1f} {after:>15.1f} "
+          f"{before_xfers:>3.0f} -> {after_xfers:.0f} xfers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Host-side stand-ins for the pad's I2C hardware.
+
+Lets firmware modules from board-ssd/ (led_matrix, framework_is31fl3743, ...)
+run under CPython: `install()` puts board-ssd/ and board-ssd/lib/ on the path
+and registers an `adafruit_bus_device.i2c_device` (frozen into CircuitPython,
+so not in lib/) backed by `FakeI2C`, which emulates the IS31FL3743 register
+pages and records every transaction. It also provides `micropython.const`
+and placeholders for the modules the libraries import only for annotations
+(`TYPING_ONLY`), since CPython evaluates annotations CircuitPython ignores.
+
+Bus time is modelled rather than measured: each transaction costs a fixed
+call overhead plus 9 bit times per byte (address byte included) at the
+configured clock, which is what dominates on the RP2040.
+"""
+
+import os
+import sys
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOARD = os.path.join(ROOT, "board-ssd")
+
+IS31_PAGE_REGISTER = 0xFD
+IS31_LOCK_REGISTER = 0xFE
+IS31_ID_REGISTER = 0xFC
+
+TYPING_ONLY = (
+    "circuitpython_typing",
+    "circuitpython_typing.device_drivers",
+    "circuitpython_typing.pil",
+    "adafruit_framebuf",
+    "busio",
+)
+
+
+class FakeI2C:
+    """
+    Emulated bus with one IS31FL3743 at `address`.
+
+    :param frequency: bus clock used for the time model, in Hz
+    :param overhead: seconds per transaction (busio call + start/stop)
+    :param realtime: block for the modelled time of each transaction, so
+                     wall-clock measurements include the bus
+    """
+
+    def __init__(self, address=0x20, frequency=400_000, overhead=60e-6, realtime=False):
+        self.address = address
+        self.frequency = frequency
+        self.overhead = overhead
+        self.realtime = realtime
+        self.pages = {page: bytearray(256) for page in range(3)}
+        self.page = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.transactions = []      # ("w"|"wr", page, register, payload length)
+        self.bytes = 0
+        self.bus_time = 0.0
+
+    def _account(self, kind, register, length):
+        self.transactions.append((kind, self.page, register, length))
+        total = 1 + 1 + length      # device address + register + payload
+        cost = self.overhead + total * 9 / self.frequency
+        self.bytes += total
+        self.bus_time += cost
+        if self.realtime:
+            end = time.perf_counter() + cost
+            while time.perf_counter() < end:
+                pass
+
+    def write(self, data):
+        data = bytes(data)
+        register, payload = data[0], data[1:]
+        self._account("w", register, len(payload))
+        if register == IS31_PAGE_REGISTER and payload:
+            self.page = payload[0]
+        elif register in (IS31_LOCK_REGISTER, IS31_ID_REGISTER):
+            pass
+        else:
+            page = self.pages[self.page]
+            page[register:register + len(payload)] = payload
+
+    def read(self, register, length):
+        self._account("wr", register, length)
+        if register == IS31_ID_REGISTER:
+            return bytes([2 * self.address] * length)
+        return bytes(self.pages[self.page][register:register + length])
+
+    @property
+    def pwm(self):
+        """Page 0: the PWM registers."""
+        return self.pages[0]
+
+
+class I2CDevice:
+    """Subset of adafruit_bus_device.i2c_device.I2CDevice used by the drivers."""
+
+    def __init__(self, i2c, device_address, probe=True):
+        self.i2c = i2c
+        self.device_address = device_address
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def write(self, buf, *, start=0, end=None):
+        self.i2c.write(memoryview(buf)[start:end])
+
+    def write_then_readinto(self, out_buffer, in_buffer, *, out_start=0, out_end=None, in_start=0, in_end=None):
+        out = bytes(memoryview(out_buffer)[out_start:out_end])
+        if in_end is None:
+            in_end = len(in_buffer)
+        data = self.i2c.read(out[0], in_end - in_start)
+        in_buffer[in_start:in_end] = data
+
+
+class _AnyName(types.ModuleType):
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return object
+
+
+def install():
+    """Make board-ssd modules importable against the fake bus."""
+    for path in (os.path.join(BOARD, "lib"), BOARD):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    if "micropython" not in sys.modules:
+        micropython = types.ModuleType("micropython")
+        micropython.const = lambda value: value
+        sys.modules["micropython"] = micropython
+    for name in TYPING_ONLY:
+        if name not in sys.modules:
+            sys.modules[name] = _AnyName(name)
+    if "adafruit_bus_device" not in sys.modules:
+        package = types.ModuleType("adafruit_bus_device")
+        module = types.ModuleType("adafruit_bus_device.i2c_device")
+        module.I2CDevice = I2CDevice
+        package.i2c_device = module
+        sys.modules["adafruit_bus_device"] = package
+        sys.modules["adafruit_bus_device.i2c_device"] = module
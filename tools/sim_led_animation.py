@@ -0,0 +1,133 @@
+"""
+Frame time and scan jitter of led_animation.Animator.
+
+Runs the firmware main loop shape on the emulated bus (realtime, so I2C
+writes take their modelled time): a matrix scan, animator.tick(), then the
+idle sleep that tops the loop up to 10 ms. The scenario switches profiles
+(cross-fade), pulses two toggle keys and presses keys every 150 ms, and is
+compared with the same loop with animations idle and with a budget too
+tight for a whole frame (rendering and flushing spread over several ticks).
+The "fade" scenario cross-fades every key between black and a full profile
+with a budget smaller than one MAX_RUN block write, which must still flush.
+
+Render time is CPython's, a fraction of the RP2040's; bus time is the
+400 kHz model. The budget logic is what is being checked: tick() must stay
+within its budget and the scan period must not move.
+
+    python tools/sim_led_animation.py [seconds]
+"""
+
+import json
+import os
+import statistics
+import sys
+import time
+
+import fake_hw
+
+fake_hw.install()
+
+import framework_is31fl3743  # noqa: E402
+import led_animation  # noqa: E402
+import led_matrix  # noqa: E402
+
+SCAN_S = 0.0025       # 32 row/column selects with 50 us settle + ADC reads
+LOOP_S = 0.01
+
+
+def profiles():
+    with open(os.path.join(fake_hw.ROOT, "host-scripts", "config.json")) as file:
+        configs = json.load(file)
+    return [profile.get("colors", {}) for profile in configs.values() if profile.get("colors")]
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def simulate(duration, scenario, budget_ns):
+    bus = fake_hw.FakeI2C(realtime=True)
+    is31 = framework_is31fl3743.IS31FL3743(bus, allocate=framework_is31fl3743.PREFER_BUFFER)
+    leds = led_matrix.LedMatrix(is31, led_matrix.MATRIX_LED_MAP)
+    colors = profiles()
+    keys = list(led_matrix.MATRIX_LED_MAP)
+    if scenario == "fade":
+        full = {key: "ffffff" for key in keys}
+        colors = [full, {}]
+    animate = scenario != "idle"
+    pulse = ("b1", "b2") if scenario == "mixed" else ()
+
+    is31.enable = True
+    leds.paint(colors[0])
+    animator = led_animation.Animator(leds, budget_ns=budget_ns)
+    leds.writes = 0
+    bus.reset_stats()
+
+    scan_starts = []
+    ticks = []
+    start = time.perf_counter()
+    next_switch = next_press = start
+    profile = 0
+    while time.perf_counter() - start < duration:
+        now = time.perf_counter()
+        scan_starts.append(now)
+        is31.enable = True  # the firmware rewrites enable from the sleep pin every pass
+        busy(SCAN_S)
+        if animate and now >= next_switch:
+            profile = (profile + 1) % len(colors)
+            animator.set_target(colors[profile], pulse=pulse)
+            next_switch = now + 1.0
+        if scenario == "mixed" and now >= next_press:
+            animator.flash(keys[int(now * 1000) % len(keys)])
+            next_press = now + 0.15
+        ## Same as the firmware: the idle time ends LOOP_S after the tick starts
+        idle_until = time.perf_counter() + LOOP_S
+        if animator.tick() or animator.render_index:
+            ticks.append(animator.last_tick_ns)
+        time.sleep(max(0, idle_until - time.perf_counter()))
+    elapsed = time.perf_counter() - start
+
+    periods = [b - a for a, b in zip(scan_starts, scan_starts[1:])]
+    busy_ticks = sorted(ticks) or [0]
+    periods.sort()
+    return {
+        "fps": animator.frames / elapsed,
+        "deferred": animator.deferred,
+        "tick_p50_ms": busy_ticks[len(busy_ticks) // 2] / 1e6,
+        "tick_p99_ms": busy_ticks[int(len(busy_ticks) * 0.99)] / 1e6,
+        "tick_max_ms": animator.max_tick_ns / 1e6,
+        "period_ms": statistics.mean(periods) * 1000,
+        "jitter_ms": statistics.pstdev(periods) * 1000,
+        "period_p99_ms": periods[int(len(periods) * 0.99)] * 1000,
+        "period_max_ms": periods[-1] * 1000,
+        "writes": leds.writes,
+        "stalled": animator.flush_pending and not leds.writes,
+        "bus_ms_per_s": bus.bus_time * 1000 / elapsed,
+    }
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    print(f"target {led_animation.FPS} fps, loop {LOOP_S * 1000:.0f} ms + {SCAN_S * 1000:.1f} ms scan")
+    scenarios = (
+        ("idle", "idle", led_animation.FRAME_BUDGET_NS),
+        ("animating", "mixed", led_animation.FRAME_BUDGET_NS),
+        ("tight", "mixed", 1_000_000),
+        ("fade", "fade", 1_500_000),
+    )
+    for label, scenario, budget_ns in scenarios:
+        budget = budget_ns / 1e6
+        r = simulate(duration, scenario, budget_ns)
+        print(f"{label:<10} budget {budget:.1f} ms  fps {r['fps']:5.1f}  tick p50/p99/max {r['tick_p50_ms']:.2f}/{r['tick_p99_ms']:.2f}/"
+              f"{r['tick_max_ms']:.2f} ms  deferred {r['deferred']}  writes {r['writes']}  scan period {r['period_ms']:.2f} ms "
+              f"(jitter {r['jitter_ms']:.3f}, p99 {r['period_p99_ms']:.2f}, max {r['period_max_ms']:.2f})  bus {r['bus_ms_per_s']:.0f} ms/s")
+        if r["tick_max_ms"] > budget * 1.25:
+            print(f"  tick exceeded the frame budget ({r['tick_max_ms']:.2f} ms)")
+        if r["stalled"]:
+            print("  flush stalled: nothing written")
+
+
+if __name__ == "__main__":
+    main()